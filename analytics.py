@@ -0,0 +1,362 @@
+"""정산 분석 계산
+
+조회한 행을 매출·처방 정수 배열(array('q'))로 옮겨 담은 뒤 합계·평균·최대/최소·
+중앙값·백분위수·표준편차·요일별 평균·이동평균을 순수 파이썬 반복문으로 계산한다.
+배열은 행 튜플보다 메모리를 덜 쓰게 하려는 것일 뿐 벡터 연산은 아니다 - 한 번에
+다루는 값이 많아야 수천 개(일 단위 몇 년치)라 반복문으로 충분하다.
+일/주/월 단위 모두 같은 함수를 사용한다.
+"""
+import datetime
+import math
+import statistics
+from array import array
+
+WEEKDAY_NAMES = ["월", "화", "수", "목", "금", "토", "일"]
+
+# 단위별 이동평균 구간 (일: 1주, 주: 4주, 월: 3개월)
+MOVING_AVERAGE_WINDOW = {'day': 7, 'week': 4, 'month': 3}
+
+PERCENTILES = (25, 75, 90)
+
+
+class Columns:
+    """분석 대상 시계열 (라벨 목록 + 정수 배열, 계산은 반복문으로 함)"""
+    __slots__ = ('labels', 'sales', 'prescriptions', 'weekdays')
+
+    def __init__(self):
+        self.labels = []
+        self.sales = array('q')
+        self.prescriptions = array('q')
+        self.weekdays = array('b')
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def from_days(cls, rows):
+        """(date, total_sales, prescription_count, ...) 행 → 일 단위 열"""
+        columns = cls()
+        for row in rows:
+            day = row[0]
+            columns.labels.append(str(day))
+            columns.sales.append(int(row[1] or 0))
+            columns.prescriptions.append(int(row[2] or 0))
+            columns.weekdays.append(day.weekday() if hasattr(day, 'weekday') else -1)
+        return columns
+
+    @classmethod
+    def from_buckets(cls, rows):
+        """(period, sales, prescriptions) 행 → 주/월 단위 열"""
+        columns = cls()
+        for period, sales, prescriptions in rows:
+            columns.labels.append(period)
+            columns.sales.append(int(sales or 0))
+            columns.prescriptions.append(int(prescriptions or 0))
+        return columns
+
+
+def percentile(ordered, pct):
+    """정렬된 값에서 선형 보간 백분위수"""
+    if not ordered:
+        return 0
+    position = (len(ordered) - 1) * pct / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def moving_average(values, window):
+    """끝점 기준 이동평균 (앞부분은 가능한 만큼의 평균)"""
+    result = []
+    running = 0
+    for index, value in enumerate(values):
+        running += value
+        if index >= window:
+            running -= values[index - window]
+        result.append(round(running / min(index + 1, window), 2))
+    return result
+
+
+def describe(values, labels):
+    if not values:
+        return {'total': 0, 'average': 0, 'min': 0, 'max': 0, 'min_date': '', 'max_date': '',
+                'median': 0, 'stdev': 0, **{f'p{pct}': 0 for pct in PERCENTILES}}
+    ordered = sorted(values)
+    high = ordered[-1]
+    low = ordered[0]
+    total = sum(values)
+    result = {
+        'total': total,
+        'average': round(total / len(values), 2),
+        'min': low,
+        'max': high,
+        'min_date': labels[values.index(low)],
+        'max_date': labels[values.index(high)],
+        'median': round(percentile(ordered, 50), 2),
+        'stdev': round(statistics.pstdev(values), 2),
+    }
+    for pct in PERCENTILES:
+        result[f'p{pct}'] = round(percentile(ordered, pct), 2)
+    return result
+
+
+def weekday_profile(columns):
+    """요일별 영업일 수와 평균 매출/처방 (일 단위에서만 의미 있음)"""
+    count = [0] * 7
+    sales = [0] * 7
+    prescriptions = [0] * 7
+    for weekday, s, p in zip(columns.weekdays, columns.sales, columns.prescriptions):
+        if weekday < 0:
+            continue
+        count[weekday] += 1
+        sales[weekday] += s
+        prescriptions[weekday] += p
+    return [
+        {
+            'weekday': WEEKDAY_NAMES[weekday],
+            'days': count[weekday],
+            'average_sales': round(sales[weekday] / count[weekday], 2),
+            'average_prescriptions': round(prescriptions[weekday] / count[weekday], 2),
+        }
+        for weekday in range(7) if count[weekday]
+    ]
+
+
+def analyze(columns, unit):
+    """/report/analyze 응답 본문"""
+    sales = describe(columns.sales, columns.labels)
+    prescriptions = describe(columns.prescriptions, columns.labels)
+
+    window = MOVING_AVERAGE_WINDOW.get(unit, 7)
+    sales_ma = moving_average(columns.sales, window)
+    prescriptions_ma = moving_average(columns.prescriptions, window)
+    trend = [
+        {'date': label, 'sales': s, 'prescriptions': p, 'sales_ma': s_ma, 'prescriptions_ma': p_ma}
+        for label, s, p, s_ma, p_ma in zip(columns.labels, columns.sales, columns.prescriptions,
+                                           sales_ma, prescriptions_ma)
+    ]
+
+    result = {
+        'summary': {
+            'total_sales': sales['total'],
+            'total_prescriptions': prescriptions['total'],
+            'average_sales': sales['average'],
+            'average_prescriptions': prescriptions['average'],
+            'max_sales_date': sales['max_date'],
+            'min_sales_date': sales['min_date'],
+            'max_prescriptions_date': prescriptions['max_date'],
+            'min_prescriptions_date': prescriptions['min_date'],
+        },
+        'statistics': {
+            'count': len(columns),
+            'moving_average_window': window,
+            'sales': sales,
+            'prescriptions': prescriptions,
+        },
+        'trend': trend,
+    }
+    if unit == 'day':
+        result['weekday_profile'] = weekday_profile(columns)
+    return result
+
+
+# ---------------------------------------------------------------- 전년 비교
+
+# 52주 전: 같은 요일끼리 맞춤
+COMPARE_OFFSET_DAYS = 364
+
+
+def _period_summary(days):
+    """[(date, sales, prescriptions, working)] → 기간 합계와 영업일 평균"""
+    working = [day for day in days if day[3]]
+    sales = sum(day[1] for day in days)
+    prescriptions = sum(day[2] for day in days)
+    return {
+        'start': str(days[0][0]) if days else '',
+        'end': str(days[-1][0]) if days else '',
+        'working_days': len(working),
+        'total_sales': sales,
+        'total_prescriptions': prescriptions,
+        'average_sales_per_working_day': round(sum(day[1] for day in working) / len(working), 2) if working else 0,
+        'average_prescriptions_per_working_day':
+            round(sum(day[2] for day in working) / len(working), 2) if working else 0,
+    }
+
+
+def _change(current, previous):
+    """증감률(%) - 전년 값이 0이면 None"""
+    return round((current - previous) / previous * 100, 2) if previous else None
+
+
+def compare(rows, start, end, offset=COMPARE_OFFSET_DAYS):
+    """COMPARE_DAYS 행 → 이번 기간 [start, end]과 offset일 전 기간 비교
+
+    daily: 날짜별로 같은 요일(offset일 전)과 나란히
+    working_days: n번째 영업일끼리 나란히 (공휴일이 다른 요일에 걸려도 영업일 수 기준으로 비교)
+    입력이 없는 날은 매출 0, 영업일 아님으로 본다.
+    """
+    by_date = {row[0]: (int(row[1] or 0), int(row[2] or 0), bool(row[3])) for row in rows}
+    shift = datetime.timedelta(days=offset)
+    current, previous = [], []
+    day = start
+    while day <= end:
+        for target, when in ((current, day), (previous, day - shift)):
+            sales, prescriptions, working = by_date.get(when, (0, 0, False))
+            target.append((when, sales, prescriptions, working))
+        day += datetime.timedelta(days=1)
+
+    daily = [
+        {
+            'date': str(cur[0]), 'weekday': WEEKDAY_NAMES[cur[0].weekday()],
+            'sales': cur[1], 'prescriptions': cur[2], 'working': cur[3],
+            'previous_date': str(prev[0]), 'previous_sales': prev[1],
+            'previous_prescriptions': prev[2], 'previous_working': prev[3],
+        }
+        for cur, prev in zip(current, previous)
+    ]
+    current_working = [day for day in current if day[3]]
+    previous_working = [day for day in previous if day[3]]
+    working_days = [
+        {
+            'index': index + 1, 'date': str(cur[0]), 'sales': cur[1], 'prescriptions': cur[2],
+            'previous_date': str(prev[0]), 'previous_sales': prev[1], 'previous_prescriptions': prev[2],
+        }
+        for index, (cur, prev) in enumerate(zip(current_working, previous_working))
+    ]
+
+    this_period = _period_summary(current)
+    last_period = _period_summary(previous)
+    return {
+        'offset_days': offset,
+        'current': this_period,
+        'previous': last_period,
+        'change': {
+            'sales_pct': _change(this_period['total_sales'], last_period['total_sales']),
+            'prescriptions_pct': _change(this_period['total_prescriptions'], last_period['total_prescriptions']),
+            'working_days': this_period['working_days'] - last_period['working_days'],
+            'average_sales_per_working_day_pct': _change(this_period['average_sales_per_working_day'],
+                                                         last_period['average_sales_per_working_day']),
+            'average_prescriptions_per_working_day_pct':
+                _change(this_period['average_prescriptions_per_working_day'],
+                        last_period['average_prescriptions_per_working_day']),
+        },
+        'daily': daily,
+        'working_days': working_days,
+    }
+
+
+# ---------------------------------------------------------------- 예측
+
+SEASON = 7                 # 주간 계절성
+# Holt-Winters 평활 계수 후보 (과거 구간 한 단계 앞 예측 오차가 가장 작은 조합 선택)
+ALPHAS = (0.1, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.0, 0.05, 0.15)
+GAMMAS = (0.05, 0.2, 0.4)
+DAMPING = 0.9              # 추세 감쇠 - 월말까지 몇 주를 내다볼 때 추세가 끝없이 이어지지 않게
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _holt_winters(values, alpha, beta, gamma, horizon, season=SEASON):
+    """감쇠 추세 가법 Holt-Winters - (제곱오차 합, 이후 horizon일 예측)
+
+    None(휴무·미입력)은 관측이 없는 날로 보고 상태를 갱신하지 않는다.
+    """
+    first = _mean(values[:season])
+    second = _mean(values[season:2 * season])
+    level = first
+    trend = (second - first) / season
+    seasonal = []
+    for position in range(season):
+        seen = _mean(values[position:2 * season:season])
+        seasonal.append(seen - _mean([first, second]) if seen is not None else 0.0)
+
+    sse = 0.0
+    for index, value in enumerate(values):
+        position = index % season
+        if value is None:
+            level += DAMPING * trend
+            trend *= DAMPING
+            continue
+        predicted = level + DAMPING * trend + seasonal[position]
+        sse += (value - predicted) ** 2
+        previous_level = level
+        level = alpha * (value - seasonal[position]) + (1 - alpha) * (level + DAMPING * trend)
+        trend = beta * (level - previous_level) + (1 - beta) * DAMPING * trend
+        seasonal[position] = gamma * (value - level) + (1 - gamma) * seasonal[position]
+
+    forecast = []
+    damped = 0.0
+    for step in range(1, horizon + 1):
+        damped += DAMPING ** step
+        forecast.append(level + damped * trend + seasonal[(len(values) + step - 1) % season])
+    return sse, forecast
+
+
+def _seasonal_average(values, horizon, season=SEASON):
+    """요일(위치)별 평균 - 기록이 2주 미만일 때"""
+    overall = _mean(values) or 0
+    averages = [_mean(values[position::season]) for position in range(season)]
+    return [averages[(len(values) + step - 1) % season] if averages[(len(values) + step - 1) % season] is not None
+            else overall for step in range(1, horizon + 1)]
+
+
+def forecast_series(values, horizon):
+    """영업일 값 목록(휴무는 None) → (방법, 계수, horizon일 예측)"""
+    if horizon <= 0:
+        return 'none', None, []
+    if _mean(values[:SEASON]) is None or _mean(values[SEASON:2 * SEASON]) is None:
+        return 'seasonal_average', None, _seasonal_average(values, horizon)
+    best = None
+    for alpha in ALPHAS:
+        for beta in BETAS:
+            for gamma in GAMMAS:
+                sse, forecast = _holt_winters(values, alpha, beta, gamma, horizon)
+                if best is None or sse < best[0]:
+                    best = (sse, {'alpha': alpha, 'beta': beta, 'gamma': gamma}, forecast)
+    return 'holt_winters', best[1], best[2]
+
+
+def forecast(rows, history_start, as_of, last_day, closed_days=()):
+    """FORECAST_DAYS 행 → as_of 다음 날부터 last_day까지 날짜별 매출·처방 예측
+
+    rows는 history_start 이후 last_day까지. as_of까지는 실제 값으로 모형을 맞추고, 이후 날짜 중
+    휴무(일요일·공휴일·미리 입력한 휴무, closed_days)는 0으로 예측한다.
+    """
+    by_date = {row[0]: row for row in rows}
+    history_sales, history_prescriptions = [], []
+    day = history_start
+    while day <= as_of:
+        row = by_date.get(day)
+        working = row is not None and row[3]
+        history_sales.append(int(row[1] or 0) if working else None)
+        history_prescriptions.append(int(row[2] or 0) if working else None)
+        day += datetime.timedelta(days=1)
+
+    horizon = (last_day - as_of).days
+    method, sales_params, sales = forecast_series(history_sales, horizon)
+    _, prescriptions_params, prescriptions = forecast_series(history_prescriptions, horizon)
+
+    days = []
+    for step in range(horizon):
+        day = as_of + datetime.timedelta(days=step + 1)
+        row = by_date.get(day)
+        closed = day.weekday() == 6 or day in closed_days or (row is not None and not row[3])
+        days.append({
+            'date': str(day),
+            'weekday': WEEKDAY_NAMES[day.weekday()],
+            'closed': closed,
+            'sales': 0 if closed else max(round(sales[step]), 0),
+            'prescriptions': 0 if closed else max(round(prescriptions[step]), 0),
+        })
+    return {
+        'method': method,
+        'params': {'sales': sales_params, 'prescriptions': prescriptions_params},
+        'history_days': len(history_sales),
+        'days': days,
+    }
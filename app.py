@@ -1,37 +1,38 @@
-from flask import Flask, request, Response, render_template, redirect, url_for, session, flash, jsonify
-from collections import OrderedDict
+import startup  # 가장 먼저 import해야 시작 시간 측정이 정확함
+from flask import Flask, request, Response, render_template, redirect, url_for, session, flash, jsonify, stream_with_context, send_from_directory
+import io
 import json
 import datetime
-from dateutil.relativedelta import relativedelta
-from db import get_connection
-from passlib.hash import pbkdf2_sha256
+import sqlite3
+from db import connection, get_reports_version, DEFAULT_STORE_ID
+import rollups
+import queries
+import search
+import archive
+import bulk
+import analytics
+from cache import report_cache
+from changefeed import feed as change_feed
+import auth
+import backup
+import metrics
+import stores
+import writequeue
+import responses
 from functools import wraps
+from urllib.parse import urlsplit
 import sys
 import os
-import socket
+import server
+import netinfo
 
 def get_server_info():
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(('8.8.8.8', 80))  # 외부로 연결 시도 (실제 전송 없음)
-        ip = s.getsockname()[0]
-        s.close()
-    except:
-        ip = '127.0.0.1'
-
-    port = 5000  # 현재 하단 run_server에서 고정값이므로 하드코딩
+    # 주소는 netinfo가 시작 시 계산해 두고 백그라운드에서 갱신 (요청마다 소켓 작업 없음)
+    ip = netinfo.primary_address()
+    port = app.config.get('SERVER_PORT', server.DEFAULT_PORT)
     return ip, port
 
 
-def is_port_in_use(port=5000):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(('localhost', port)) == 0
-
-if is_port_in_use():
-    print("이미 실행 중입니다.")
-    sys.exit()
-
-
 if getattr(sys, 'frozen', False):  # PyInstaller로 빌드된 경우
     BASE_DIR = sys._MEIPASS
 else:
@@ -39,6 +40,8 @@ else:
 
 app = Flask(__name__, template_folder=os.path.join(BASE_DIR, 'templates'))
 app.secret_key = 'your-secret-key-here'  # 실제 운영 환경에서는 안전한 키로 변경 필요
+metrics.init_app(app)
+responses.init_app(app, os.path.join(BASE_DIR, 'favicon.ico'))
 
 def login_required(f):
     @wraps(f)
@@ -48,6 +51,13 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def current_store():
+    """로그인한 계정의 지점 번호 (본사 계정은 선택한 지점, 예전 세션은 본점)"""
+    return session.get('store_id') or DEFAULT_STORE_ID
+
+def is_hq():
+    return bool(session.get('is_hq'))
+
 
 @app.route('/')
 def index():
@@ -70,22 +80,43 @@ def login():
     server_ip, server_port = get_server_info()
 
     if request.method == 'POST':
-        username = request.form.get('username')
+        username = request.form.get('username') or ''
         password = request.form.get('password')
-        
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM users WHERE username = ?', (username,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if user and pbkdf2_sha256.verify(password, user['password_hash']):
+
+        # 해시 계산 전에 시도 횟수부터 확인
+        allowed, retry_after = auth.check_throttle(request.remote_addr, username)
+        if not allowed:
+            flash(f'로그인 시도가 너무 많습니다. {retry_after}초 후 다시 시도해주세요.')
+            response = app.make_response((render_template('login.html', server_ip=server_ip, server_port=server_port), 429))
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT id, username, password_hash, store_id FROM users WHERE username = ?', (username,))
+            user = cur.fetchone()
+            cur.close()
+
+        try:
+            verified, new_hash = auth.verify_password(password, user['password_hash'] if user else None)
+        except auth.AuthBusy:
+            flash('로그인 요청이 많습니다. 잠시 후 다시 시도해주세요.')
+            return render_template('login.html', server_ip=server_ip, server_port=server_port), 503
+
+        if verified:
+            if new_hash:
+                # 반복 횟수 설정이 바뀌었으면 새 설정으로 다시 저장
+                with connection() as conn:
+                    conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user['id']))
+            auth.login_succeeded(request.remote_addr, username)
             session['user_id'] = user['id']
             session['username'] = user['username']
+            # store_id가 NULL인 본사 계정은 본점에서 시작해 /stores/current로 지점을 바꿀 수 있음
+            session['is_hq'] = user['store_id'] is None
+            session['store_id'] = user['store_id'] or DEFAULT_STORE_ID
             next_page = request.args.get('next')
             return redirect(next_page or url_for('index'))
-        
+
         flash('아이디 또는 비밀번호가 잘못되었습니다.')
     return render_template('login.html', server_ip=server_ip, server_port=server_port)
 
@@ -115,56 +146,84 @@ def change_password():
         if not new_password and not new_username:
             flash('아이디 또는 비밀번호 중 하나는 변경해야 합니다.', 'danger')
             return redirect(url_for('change_password'))
+
+        allowed, retry_after = auth.check_throttle(request.remote_addr, session.get('username'))
+        if not allowed:
+            flash(f'시도가 너무 많습니다. {retry_after}초 후 다시 시도해주세요.', 'danger')
+            return redirect(url_for('change_password'))
+
+        with connection() as conn:
+            cur = conn.cursor()
         
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        # 현재 비밀번호 확인
-        cur.execute('SELECT password_hash FROM users WHERE id = ?', (session['user_id'],))
-        user = cur.fetchone()
+            # 현재 비밀번호 확인
+            cur.execute('SELECT password_hash FROM users WHERE id = ?', (session['user_id'],))
+            user = cur.fetchone()
         
-        if not user or not pbkdf2_sha256.verify(current_password, user['password_hash']):
-            flash('현재 비밀번호가 잘못되었습니다.', 'danger')
-            cur.close()
-            conn.close()
-            return redirect(url_for('change_password'))
+            try:
+                verified, _ = auth.verify_password(current_password, user['password_hash'] if user else None)
+            except auth.AuthBusy:
+                flash('요청이 많습니다. 잠시 후 다시 시도해주세요.', 'danger')
+                cur.close()
+                return redirect(url_for('change_password'))
+
+            if not verified:
+                flash('현재 비밀번호가 잘못되었습니다.', 'danger')
+                cur.close()
+                return redirect(url_for('change_password'))
         
-        try:
-            if new_username:
-                # 아이디 중복 확인
-                cur.execute('SELECT id FROM users WHERE username = ? AND id != ?', 
-                           (new_username, session['user_id']))
-                if cur.fetchone():
-                    flash('이미 사용 중인 아이디입니다.', 'danger')
-                    return redirect(url_for('change_password'))
+            try:
+                if new_username:
+                    # 아이디 중복 확인
+                    cur.execute('SELECT id FROM users WHERE username = ? AND id != ?', 
+                               (new_username, session['user_id']))
+                    if cur.fetchone():
+                        flash('이미 사용 중인 아이디입니다.', 'danger')
+                        return redirect(url_for('change_password'))
                 
-                # 아이디 변경
-                cur.execute('UPDATE users SET username = ? WHERE id = ?',
-                            (new_username, session['user_id']))
-                session['username'] = new_username
-                flash('아이디가 변경되었습니다.', 'success')
+                    # 아이디 변경
+                    cur.execute('UPDATE users SET username = ? WHERE id = ?',
+                                (new_username, session['user_id']))
+                    session['username'] = new_username
+                    flash('아이디가 변경되었습니다.', 'success')
             
-            if new_password:
-                # 비밀번호 변경
-                new_password_hash = pbkdf2_sha256.hash(new_password)
-                cur.execute('UPDATE users SET password_hash = ? WHERE id = ?',
-                            (new_password_hash, session['user_id']))
-                flash('비밀번호가 변경되었습니다.', 'success')
+                if new_password:
+                    # 비밀번호 변경
+                    new_password_hash = auth.hash_password(new_password)
+                    cur.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                                (new_password_hash, session['user_id']))
+                    flash('비밀번호가 변경되었습니다.', 'success')
             
-            conn.commit()
-            return redirect(url_for('index'))
+                conn.commit()
+                return redirect(url_for('index'))
             
-        except Exception as e:
-            conn.rollback()
-            flash('오류가 발생했습니다. 다시 시도해주세요.', 'danger')
-            return redirect(url_for('change_password'))
+            except Exception as e:
+                conn.rollback()
+                flash('오류가 발생했습니다. 다시 시도해주세요.', 'danger')
+                return redirect(url_for('change_password'))
         
-        finally:
-            cur.close()
-            conn.close()
+            finally:
+                cur.close()
     
     return render_template('change_password.html')
 
+@app.route('/shutdown', methods=['POST'])
+def shutdown():
+    # 같은 PC(서버종료.bat / --stop)에서 온 요청만 허용
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "서버가 실행 중인 PC에서만 종료할 수 있습니다."}), 403
+    # 브라우저에 열린 다른 사이트가 보낸 요청(Origin이 다름)과 종료 비밀값이 없는 요청은 거부
+    origin = request.headers.get('Origin')
+    if origin and urlsplit(origin).netloc != request.host:
+        return jsonify({"error": "다른 사이트에서 보낸 종료 요청입니다."}), 403
+    if not server.check_shutdown_token(request.headers.get(server.SHUTDOWN_HEADER)):
+        return jsonify({"error": "종료 비밀값이 없거나 다릅니다."}), 403
+    server.request_shutdown()
+    return jsonify({"message": "서버를 종료합니다."})
+
+@app.route('/favicon.ico')
+def favicon():
+    return send_from_directory(BASE_DIR, 'favicon.ico', mimetype='image/x-icon')
+
 @app.route('/credits')
 def credits():
     return """
@@ -187,113 +246,433 @@ def home():
 def create_report():
     data = request.get_json()
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO daily_reports (date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            data['date'],
-            data['total_sales'],
-            data.get('prescription_count', 0),
-            data.get('notes', ''),
-            data.get('is_holiday', False),
-            data.get('is_manual_holiday', False)
-        ))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with connection(current_store()) as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO main.daily_reports (date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                data['date'],
+                data['total_sales'],
+                data.get('prescription_count', 0),
+                data.get('notes', ''),
+                data.get('is_holiday', False),
+                data.get('is_manual_holiday', False)
+            ))
+            cur.execute(queries.REPORT_BY_DATE, (data['date'],))
+            row = cur.fetchone()
+            cur.close()
+        try:
+            date_obj = parse_date_param(str(data['date']))
+        except ValueError:
+            reports_changed(None)
+        else:
+            reports_changed(date_obj, events={date_obj: calendar_event(row) if row else None})
         return jsonify({"message": "정산 등록 완료!"}), 201
+    except sqlite3.IntegrityError as e:
+        return archived_conflict(e) or (jsonify({"error": str(e)}), 500)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def archived_conflict(error):
+    """보관된 연도로의 쓰기를 트리거가 막은 오류면 409 응답, 아니면 None"""
+    if archive.ARCHIVED_MESSAGE in str(error):
+        return jsonify({"error": archive.ARCHIVED_MESSAGE}), 409
+    return None
+
+REPORT_PAGE_MAX = 1000
+STREAM_CHUNK_ROWS = 500
+
+def report_dict(row):
+    return {
+        "id": row['id'],
+        "date": str(row['date']),
+        "total_sales": row['total_sales'],
+        "prescription_count": row['prescription_count'],
+        "notes": row['notes'],
+        "is_holiday": bool(row['is_holiday']),
+        "is_manual_holiday": bool(row['is_manual_holiday']),
+    }
+
 @app.route('/report', methods=['GET'])
 @login_required
 def get_reports():
+    # 최신 날짜부터. limit을 주면 after(이 날짜보다 이전) 기준 키셋 페이지 단위로 응답
     try:
-        conn = get_connection()
+        after = parse_date_param(request.args.get('after')) or datetime.date.max
+    except ValueError:
+        return Response(json.dumps({"error": "날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다."}, ensure_ascii=False),
+                        status=400, mimetype='application/json')
+    limit = request.args.get('limit')
+    if limit is not None:
+        limit = int(limit) if limit.isdigit() else 0
+    if limit is not None and not 1 <= limit <= REPORT_PAGE_MAX:
+        return Response(json.dumps({"error": f"limit은 1~{REPORT_PAGE_MAX} 사이여야 합니다."}, ensure_ascii=False),
+                        status=400, mimetype='application/json')
+
+    if limit is None:
+        # 전체 목록은 메모리에 모으지 않고 조각 단위로 전송
+        return Response(stream_with_context(_stream_reports(after)), mimetype='application/json')
+
+    try:
+        with connection(current_store()) as conn:
+            cur = conn.cursor()
+            cur.execute(queries.REPORTS_PAGE, (after, limit))
+            rows = cur.fetchall()
+            cur.close()
+
+        reports = [report_dict(row) for row in rows]
+        response = Response(responses.dumps(reports), mimetype='application/json')
+        if len(rows) == limit:
+            next_after = str(rows[-1]['date'])
+            response.headers['X-Next-After'] = next_after
+            response.headers['Link'] = f'<{url_for("get_reports", limit=limit, after=next_after)}>; rel="next"'
+        return response
+
+    except Exception as e:
+        return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')    
+
+def _stream_reports(after):
+    with connection(current_store()) as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM daily_reports ORDER BY date DESC")
-        rows = cur.fetchall()
+        cur.execute(queries.REPORTS_PAGE, (after, -1))
+        separator = b'['
+        try:
+            while True:
+                rows = cur.fetchmany(STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                # 묶음을 배열 하나로 직렬화한 뒤 대괄호만 떼어 이어 붙임
+                yield separator + responses.dumps([report_dict(row) for row in rows])[1:-1]
+                separator = b','
+        finally:
+            cur.close()
+        yield b'[]' if separator == b'[' else b']'
+
+@app.route('/report/changes', methods=['GET'])
+@login_required
+def get_report_changes():
+    # since 버전 이후 바뀐 날짜만 응답 (로컬에 저장해 두는 단말의 증분 동기화용)
+    since = request.args.get('since', '0')
+    limit = request.args.get('limit', str(REPORT_PAGE_MAX))
+    if not since.isdigit() or not limit.isdigit() or not 1 <= int(limit) <= REPORT_PAGE_MAX:
+        return jsonify({"error": f"since는 0 이상의 정수, limit은 1~{REPORT_PAGE_MAX} 사이여야 합니다."}), 400
+    since, limit = int(since), int(limit)
+
+    with connection(current_store()) as conn:
+        cur = conn.cursor()
+        version, _ = get_reports_version(cur)
+        rows = []
+        if since <= version:
+            cur.execute(queries.REPORT_CHANGES, (since, limit))
+            rows = cur.fetchall()
         cur.close()
-        conn.close()
-
-        reports = []
-        for row in rows:
-            reports.append(OrderedDict([
-                ("id", row['id']),
-                ("date", str(row['date'])),
-                ("total_sales", row['total_sales']),
-                ("prescription_count", row['prescription_count']),
-                ("notes", row['notes']),
-                ("is_holiday", bool(row['is_holiday'])),
-                ("is_manual_holiday", bool(row['is_manual_holiday'])),
-            ]))
-
-        return Response(
-            json.dumps(reports, ensure_ascii=False),
-            mimetype='application/json'
-        )
 
+    changes = []
+    for row in rows:
+        change = {"date": str(row['date']), "version": row['version'], "deleted": bool(row['deleted'])}
+        if not row['deleted']:
+            change.update({
+                "total_sales": row['total_sales'],
+                "prescription_count": row['prescription_count'],
+                "notes": row['notes'],
+                "is_holiday": bool(row['is_holiday']),
+                "is_manual_holiday": bool(row['is_manual_holiday']),
+            })
+        changes.append(change)
+
+    return jsonify({
+        "version": version,
+        # 단말의 버전이 서버보다 앞서면(DB 교체·복원) 로컬 데이터를 버리고 since=0부터 다시 받아야 함
+        "reset": since > version,
+        "changes": changes,
+        "next_since": rows[-1]['version'] if rows else min(since, version),
+        "has_more": len(rows) == limit,
+    })
+
+SEARCH_LIMIT_MAX = 200
+
+@app.route('/report/search', methods=['GET'])
+@login_required
+def search_reports():
+    # 메모 전문 검색: 관련도순, 날짜 구간 [start, end] (생략하면 전체)
+    query = search.match_query(request.args.get('q', ''))
+    if query is None:
+        return jsonify({"error": "검색어(q)를 입력하세요."}), 400
+    limit = request.args.get('limit', '50')
+    if not limit.isdigit() or not 1 <= int(limit) <= SEARCH_LIMIT_MAX:
+        return jsonify({"error": f"limit은 1~{SEARCH_LIMIT_MAX} 사이여야 합니다."}), 400
+    try:
+        start = parse_date_param(request.args.get('start')) or datetime.date.min
+        end = parse_date_param(request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다."}), 400
+    following = end + datetime.timedelta(days=1) if end and end < datetime.date.max else datetime.date.max
+
+    try:
+        with connection(current_store()) as conn:
+            cur = conn.cursor()
+            cur.execute(search.SEARCH_SQL, (query, start, following, int(limit)))
+            rows = cur.fetchall()
+            cur.close()
     except Exception as e:
-        return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')    
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "query": request.args.get('q', ''),
+        "results": [{
+            "date": str(row['date']),
+            "total_sales": row['total_sales'],
+            "prescription_count": row['prescription_count'],
+            "notes": row['notes'],
+            "snippet": search.snippet_html(row['snippet']),
+            "rank": round(row['rank'], 4),
+        } for row in rows],
+    })
+
+@app.route('/report/bulk', methods=['POST'])
+@login_required
+def import_reports():
+    fmt = request.args.get('format') or bulk.guess_format(None, request.content_type)
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": "CSV(text/csv) 또는 NDJSON(application/x-ndjson) 형식만 지원합니다."}), 415
+
+    # 요청 본문을 메모리에 모으지 않고 한 줄씩 읽어 묶음 단위로 반영
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    try:
+        with connection(current_store()) as conn:
+            result = bulk.import_records(conn, bulk.iter_records(lines, fmt))
+    except ValueError as e:
+        # 실패 전에 커밋된 묶음이 있을 수 있으므로 캐시는 모두 비움
+        reports_changed(None)
+        return jsonify({"error": str(e)}), 400
+    except sqlite3.IntegrityError as e:
+        reports_changed(None)
+        return archived_conflict(e) or (jsonify({"error": str(e)}), 500)
+    except Exception as e:
+        reports_changed(None)
+        return jsonify({"error": str(e)}), 500
+    if result['imported']:
+        reports_changed(result['first_date'], result['last_date'])
+
+    return jsonify({
+        "message": f"{result['imported']}건의 정산 정보를 가져왔습니다.",
+        "imported": result['imported'],
+        "batches": result['batches'],
+        "first_date": str(result['first_date'] or ''),
+        "last_date": str(result['last_date'] or ''),
+    })
+
+@app.route('/report/export', methods=['GET'])
+@login_required
+def export_reports():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": "format은 csv 또는 ndjson이어야 합니다."}), 400
+    try:
+        start = parse_date_param(request.args.get('start'))
+        end = parse_date_param(request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다."}), 400
+
+    def generate():
+        with connection(current_store()) as conn:
+            for chunk in bulk.export_chunks(conn, fmt, start, end):
+                yield chunk.encode('utf-8')
+
+    filename = f"pharmaday-{datetime.date.today():%Y%m%d}.{fmt}"
+    return Response(stream_with_context(generate()), mimetype=bulk.MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+def reports_versions(store_ids):
+    """지점별 정산 데이터 버전 (report_meta - 어느 프로세스가 쓰든 트리거가 올림)"""
+    versions = []
+    for store_id in store_ids:
+        with connection(store_id) as conn:
+            cur = conn.cursor()
+            versions.append(get_reports_version(cur)[0])
+            cur.close()
+    return tuple(versions)
+
+def cached_json(key, date_range, build, store_id=None, snapshot=False):
+    """캐시에 있으면 저장된 JSON 바이트를, 없으면 build() 결과를 직렬화해 저장 후 응답
+
+    키 앞에는 지점 번호(기본: 현재 지점)가 붙는다. 항목은 대상 지점들의 데이터 버전과 함께
+    저장되어 다른 프로세스가 쓴 뒤에는 다시 계산된다. snapshot이면 build()가 분석 스냅샷을
+    읽으므로 사본 시각도 키에 넣는다 (사본이 새로 떠지면 다시 계산).
+    """
+    key = (store_id or current_store(),) + key
+    store_ids = [store['id'] for store in stores.all_stores()] if key[0] == 'all' else [key[0]]
+    if snapshot:
+        key += (backup.snapshot_version(store_ids),)
+    version = reports_versions(store_ids)
+    body = report_cache.get(key, version)
+    if body is None:
+        generation = report_cache.generation()
+        result = build()
+        with metrics.phase('json'):
+            body = responses.dumps(result)
+        report_cache.put(key, body, date_range, generation, version)
+    return Response(body, mimetype='application/json')
+
+def reports_changed(first, last=None, events=None):
+    """현재 지점의 정산 정보가 바뀐 날짜 구간 [first, last]에 걸린 캐시 무효화 후 달력에 알림 (first가 None이면 전체)
+
+    events는 {날짜: 달력 이벤트 또는 None(삭제)} - 주면 날짜별로, 없으면 구간 다시 불러오기로 알린다.
+    캐시는 구간 기준으로 모든 지점 항목을 지우므로 전 지점 합산 결과도 함께 무효화된다.
+    """
+    store_id = current_store()
+    if first is None:
+        report_cache.clear()
+    else:
+        report_cache.invalidate(first, last or first)
+    if events is None:
+        change_feed.publish_range(first, last or first, store_id)
+    else:
+        for day, event in events.items():
+            change_feed.publish_date(day, event, store_id)
+
+def parse_date_param(value):
+    """'YYYY-MM-DD' 또는 ISO 8601 일시 문자열에서 날짜만 추출 (없으면 None)"""
+    if not value:
+        return None
+    return datetime.datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+def _set_calendar_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # 브라우저가 매번 재검증하도록 (변경이 없으면 304)
+    response.headers['Cache-Control'] = 'private, no-cache'
+
+def _calendar_not_modified(etag, last_modified):
+    response = Response(status=304)
+    _set_calendar_validators(response, etag, last_modified)
+    return response
 
 @app.route('/calendar-data', methods=['GET'])
 @login_required
 def get_calendar_data():
+    # FullCalendar는 화면에 보이는 구간을 start/end(ISO 8601, end는 미포함)로 전달
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday FROM daily_reports")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        start = parse_date_param(request.args.get('start'))
+        end = parse_date_param(request.args.get('end'))
+    except ValueError:
+        return Response(json.dumps({"error": "날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다."}, ensure_ascii=False),
+                        status=400, mimetype='application/json')
 
-        data = []
-        for row in rows:
-            date_str = row['date']
-            if isinstance(date_str, datetime.date):
-                date_obj = date_str
-            else:
-                date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-            
-            weekday_num = date_obj.weekday()
-            weekday_str = ["월", "화", "수", "목", "금", "토", "일"][weekday_num]
-            
-            # SQLite에서는 boolean이 0 또는 1로 저장되므로 명시적 변환 필요
-            is_holiday = bool(row['is_holiday'])
-            is_manual_holiday = bool(row['is_manual_holiday'])
-            
-            if is_holiday:
-                holiday_type = "holiday"
-            elif is_manual_holiday:
-                holiday_type = "manual"
-            else:
-                holiday_type = "none"
+    try:
+        store_id = current_store()
+        generation = report_cache.generation()
+        with connection(store_id) as conn:
+            cur = conn.cursor()
+
+            # 데이터가 바뀌지 않았다면 다시 만들지 않고 304 응답 (압축 응답은 약한 ETag로 나가므로 약한 비교)
+            version, modified_at = get_reports_version(cur)
+            etag = f"cal-{store_id}-{start or ''}-{end or ''}-{version}"
+            last_modified = modified_at.replace(tzinfo=datetime.timezone.utc) if modified_at else None
+            if request.if_none_match.contains_weak(etag) or (
+                    not request.if_none_match and last_modified and request.if_modified_since
+                    and last_modified.replace(microsecond=0) <= request.if_modified_since):
+                cur.close()
+                return _calendar_not_modified(etag, last_modified)
+
+            # 같은 버전으로 만들어 둔 응답이 있으면 그대로 사용
+            cache_key = (store_id, 'calendar-data', start, end)
+            body = report_cache.get(cache_key, version)
+            if body is None:
+                if start or end:
+                    cur.execute(queries.CALENDAR_RANGE, (start or datetime.date.min, end or datetime.date.max))
+                else:
+                    cur.execute(queries.CALENDAR_ALL)
+                rows = cur.fetchall()
+                events = [calendar_event(row) for row in rows]
+                with metrics.phase('json'):
+                    body = responses.dumps(events)
+                report_cache.put(cache_key, body, (start, end - datetime.timedelta(days=1) if end else None),
+                                 generation, version)
+            cur.close()
 
-            # 매출과 처방건수가 None이면 0으로 처리
-            total_sales = row['total_sales'] if row['total_sales'] is not None else 0
-            prescription_count = row['prescription_count'] if row['prescription_count'] is not None else 0
-            
-            data.append(OrderedDict([
-                ("start", str(date_obj)),
-                ("title", f"₩{total_sales:,} / 처방 {prescription_count}건"),
-                ("notes", row['notes'] or ''),
-                ("is_holiday", is_holiday),
-                ("is_manual_holiday", is_manual_holiday),
-                ("holiday_type", holiday_type),
-                ("weekday", weekday_str),
-                ("is_saturday", weekday_num == 5),
-                ("is_sunday", weekday_num == 6),
-                ("allDay", True),
-                ("backgroundColor", "#ffebee" if is_holiday or is_manual_holiday else None)
-            ]))
-
-        return Response(json.dumps(data, ensure_ascii=False), mimetype='application/json')
+        response = Response(body, mimetype='application/json')
+        _set_calendar_validators(response, etag, last_modified)
+        return response
 
     except Exception as e:
         return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
 
+WEEKDAY_NAMES = ["월", "화", "수", "목", "금", "토", "일"]
+
+def calendar_event(row):
+    """daily_reports 행 → FullCalendar 이벤트"""
+    date_str = row['date']
+    if isinstance(date_str, datetime.date):
+        date_obj = date_str
+    else:
+        date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+    
+    weekday_num = date_obj.weekday()
+
+    # SQLite에서는 boolean이 0 또는 1로 저장되므로 명시적 변환 필요
+    is_holiday = bool(row['is_holiday'])
+    is_manual_holiday = bool(row['is_manual_holiday'])
+    holiday_name = row['holiday_name']
+
+    if is_holiday or holiday_name:
+        holiday_type = "holiday"
+    elif is_manual_holiday:
+        holiday_type = "manual"
+    else:
+        holiday_type = "none"
+
+    # 매출과 처방건수가 None이면 0으로 처리
+    total_sales = row['total_sales'] if row['total_sales'] is not None else 0
+    prescription_count = row['prescription_count'] if row['prescription_count'] is not None else 0
+
+    return {
+        "start": str(date_obj),
+        "title": f"₩{total_sales:,} / 처방 {prescription_count}건",
+        "notes": row['notes'] or '',
+        "is_holiday": is_holiday,
+        "is_manual_holiday": is_manual_holiday,
+        "holiday_type": holiday_type,
+        "holiday_name": holiday_name,
+        "weekday": WEEKDAY_NAMES[weekday_num],
+        "is_saturday": weekday_num == 5,
+        "is_sunday": weekday_num == 6,
+        "allDay": True,
+        "backgroundColor": "#ffebee" if holiday_type != "none" else None,
+    }
+
+@app.route('/holidays', methods=['GET'])
+@login_required
+def get_holidays():
+    """달력 음영용 법정 공휴일 (FullCalendar 배경 이벤트, start/end는 /calendar-data와 같음)"""
+    try:
+        start = parse_date_param(request.args.get('start')) or datetime.date.min
+        end = parse_date_param(request.args.get('end')) or datetime.date.max
+    except ValueError:
+        return jsonify({'error': '날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다.'}), 400
+
+    try:
+        with connection(current_store()) as conn:
+            cur = conn.cursor()
+            cur.execute(queries.HOLIDAYS_RANGE, (start, end))
+            rows = cur.fetchall()
+            cur.close()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    # 기본키 구간 조회라 가벼우므로 캐시하지 않음 (manage.py holidays 결과가 바로 보임)
+    return jsonify([{
+            "start": str(row['date']),
+            "title": row['name'],
+            "display": "background",
+            "allDay": True,
+            "backgroundColor": "#ffebee",
+            "is_public_holiday": True,
+            "holiday_kind": row['kind'],
+        } for row in rows])
+
 @app.route('/report/<date_str>', methods=['GET'])
 @login_required
 def get_report_by_date(date_str):
@@ -304,31 +683,27 @@ def get_report_by_date(date_str):
             return Response(json.dumps({"error": "날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다."}, ensure_ascii=False),
                             status=400, mimetype='application/json')
 
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
-            FROM daily_reports
-            WHERE date = ?
-        """, (date_obj,))
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+        with connection(current_store()) as conn:
+            cur = conn.cursor()
+            cur.execute(queries.REPORT_BY_DATE, (date_obj,))
+            row = cur.fetchone()
+            cur.close()
 
         if row is None:
             return Response(json.dumps({"error": "해당 날짜의 정산 정보가 없습니다."}, ensure_ascii=False),
                             status=404, mimetype='application/json')
 
-        result = OrderedDict([
-            ("date", str(row['date'])),
-            ("total_sales", row['total_sales']),
-            ("prescription_count", row['prescription_count']),
-            ("notes", row['notes']),
-            ("is_holiday", bool(row['is_holiday'])),
-            ("is_manual_holiday", bool(row['is_manual_holiday']))
-        ])
+        result = {
+            "date": str(row['date']),
+            "total_sales": row['total_sales'],
+            "prescription_count": row['prescription_count'],
+            "notes": row['notes'],
+            "is_holiday": bool(row['is_holiday']),
+            "is_manual_holiday": bool(row['is_manual_holiday']),
+            "holiday_name": row['holiday_name'],
+        }
 
-        return Response(json.dumps(result, ensure_ascii=False), mimetype='application/json')
+        return Response(responses.dumps(result), mimetype='application/json')
 
     except Exception as e:
         return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
@@ -348,44 +723,144 @@ def upsert_report_by_date(date_str):
         # date_str parsed earlier; parse again to ensure a date object
         date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
 
-        conn = get_connection()
-        cur = conn.cursor()
-        try:
-            cur.execute("""
-                INSERT INTO daily_reports (
-                  date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
-                )
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(date) DO UPDATE SET
-                  total_sales = excluded.total_sales,
-                  prescription_count = excluded.prescription_count,
-                  notes = excluded.notes,
-                  is_holiday = excluded.is_holiday,
-                  is_manual_holiday = excluded.is_manual_holiday
-            """, (
-                date_obj,
-                int(data['total_sales']),
-                int(data.get('prescription_count', 0)),
-                data.get('notes', ''),
-                bool(data.get('is_holiday', False)),
-                bool(data.get('is_manual_holiday', False))
-            ))
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            cur.close()
-            conn.close()
-
-        return Response(json.dumps({"message": "정산 정보가 저장되었습니다 (등록 또는 수정됨)."}, ensure_ascii=False),
+        params = (
+            date_obj,
+            int(data['total_sales']),
+            int(data.get('prescription_count', 0)),
+            data.get('notes', ''),
+            bool(data.get('is_holiday', False)),
+            bool(data.get('is_manual_holiday', False))
+        )
+        if writequeue.ENABLED:
+            row = writequeue.upsert(current_store(), date_obj, params)
+            event = calendar_event(row) if row is not None else None
+        else:
+            with connection(current_store()) as conn:
+                cur = conn.cursor()
+                try:
+                    cur.execute(queries.UPSERT_REPORT, params)
+                    cur.execute(queries.REPORT_BY_DATE, (date_obj,))
+                    event = calendar_event(cur.fetchone())
+                finally:
+                    cur.close()
+        reports_changed(date_obj, events={date_obj: event})
+
+        # 저장한 화면은 응답의 event로, 다른 단말은 /report/events로 해당 날짜만 갱신
+        return Response(json.dumps({"message": "정산 정보가 저장되었습니다 (등록 또는 수정됨).", "event": event},
+                                   ensure_ascii=False),
                         status=200, mimetype='application/json')
 
+    except sqlite3.IntegrityError as e:
+        return archived_conflict(e) or Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
     except Exception as e:
         return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
 
 
 
+MAX_PATCH_DAYS = 366
+
+def _parse_patch(data):
+    """PATCH /report/range 본문 → ({날짜: {필드: 값}}, 오류 목록) - 한 번에 모두 검사
+
+    {"start", "end", "set"}: start~end(포함) 모든 날짜에 set 적용
+    {"changes": [{"date", 필드...}]}: 날짜별 수정 (둘 다 주면 changes가 set보다 우선)
+    """
+    updates, errors = {}, []
+    if not isinstance(data, dict):
+        return updates, [{"error": "JSON 객체여야 합니다."}]
+
+    if 'start' in data or 'end' in data or 'set' in data:
+        try:
+            start = datetime.datetime.strptime(str(data.get('start')), '%Y-%m-%d').date()
+            end = datetime.datetime.strptime(str(data.get('end')), '%Y-%m-%d').date()
+        except ValueError:
+            errors.append({"error": "start, end는 YYYY-MM-DD 형식이어야 합니다."})
+        else:
+            fields = None
+            if end < start:
+                errors.append({"error": "end는 start 이후여야 합니다."})
+            elif (end - start).days >= MAX_PATCH_DAYS:
+                errors.append({"error": f"한 번에 {MAX_PATCH_DAYS}일까지 수정할 수 있습니다."})
+            elif not isinstance(data.get('set'), dict) or not data['set']:
+                errors.append({"error": "set에 바꿀 항목이 없습니다."})
+            else:
+                try:
+                    fields = bulk.to_fields(data['set'], 'set')
+                except ValueError as e:
+                    errors.append({"error": str(e)})
+                if 'date' in data['set']:
+                    errors.append({"error": "set에는 date를 넣을 수 없습니다."})
+                    fields = None
+            if fields:
+                for offset in range((end - start).days + 1):
+                    updates[start + datetime.timedelta(days=offset)] = dict(fields)
+
+    changes = data.get('changes', [])
+    if not isinstance(changes, list):
+        errors.append({"error": "changes는 목록이어야 합니다."})
+        changes = []
+    for index, change in enumerate(changes):
+        label = f'changes[{index}]'
+        try:
+            if not isinstance(change, dict):
+                raise ValueError(f'{label}: JSON 객체여야 합니다.')
+            try:
+                date_obj = datetime.datetime.strptime(str(change.get('date')), '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f'{label}: 날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다.')
+            fields = bulk.to_fields(change, f'{label} ({date_obj})')
+            if not fields:
+                raise ValueError(f'{label} ({date_obj}): 바꿀 항목이 없습니다.')
+        except ValueError as e:
+            errors.append({"index": index, "date": change.get('date') if isinstance(change, dict) else None,
+                           "error": str(e)})
+            continue
+        updates.setdefault(date_obj, {}).update(fields)
+
+    if not updates and not errors:
+        errors.append({"error": "바꿀 날짜가 없습니다."})
+    elif len(updates) > MAX_PATCH_DAYS:
+        errors.append({"error": f"한 번에 {MAX_PATCH_DAYS}일까지 수정할 수 있습니다."})
+    return updates, errors
+
+@app.route('/report/range', methods=['PATCH'])
+@login_required
+def patch_report_range():
+    """여러 날짜를 한 트랜잭션으로 수정 (주간 입력, 휴무 구간 지정) - 날짜별 결과 반환"""
+    updates, errors = _parse_patch(request.get_json(silent=True))
+    if errors:
+        # 하나라도 잘못되면 아무것도 반영하지 않음
+        return jsonify({"error": "잘못된 항목이 있어 저장하지 않았습니다.", "errors": errors}), 400
+
+    first, last = min(updates), max(updates)
+    # 바꾸는 항목 조합별로 묶어 executemany
+    groups = {}
+    for date_obj, fields in sorted(updates.items()):
+        values = dict(queries.PATCH_DEFAULTS, **fields)
+        groups.setdefault(tuple(name for name in queries.PATCH_DEFAULTS if name in fields), []).append(
+            (date_obj, *values.values()))
+    try:
+        with connection(current_store()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            existing = {row['date'] for row in conn.execute(
+                'SELECT date FROM daily_reports WHERE date >= ? AND date <= ?', (first, last))}
+            for fields, rows in groups.items():
+                conn.executemany(queries.patch_report_sql(fields), rows)
+            saved = {row['date']: row for row in conn.execute(
+                queries.CALENDAR_RANGE, (first, last + datetime.timedelta(days=1)))}
+    except sqlite3.IntegrityError as e:
+        return archived_conflict(e) or (jsonify({"error": str(e)}), 500)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    events = {date_obj: calendar_event(saved[date_obj]) for date_obj in sorted(updates)}
+    reports_changed(first, last, events=events)
+    return jsonify({
+        "message": f"{len(events)}일의 정산 정보가 저장되었습니다.",
+        "results": [{"date": str(date_obj), "status": "updated" if date_obj in existing else "created",
+                     "event": event} for date_obj, event in events.items()],
+    })
+
 @app.route('/report/monthly')
 @login_required
 def get_monthly_reports():
@@ -396,18 +871,19 @@ def get_monthly_reports():
         return jsonify({"error": "year and month are required"}), 400
 
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
-            FROM daily_reports
-            WHERE strftime('%Y', date) = ? AND strftime('%m', date) = ?
-        """, (year, month))
+        first, following = queries.month_bounds(int(year), int(month))
+    except ValueError:
+        return jsonify({"error": "year and month must be a valid month"}), 400
+
+    def build():
+        with connection(current_store()) as conn:
+            cur = conn.cursor()
+            cur.execute(queries.MONTHLY_REPORTS, (first, following))
+            rows = cur.fetchall()
+            cur.close()
 
-        rows = cur.fetchall()
-        result = {
-            row['date']: {
+        return {
+            str(row['date']): {
                 'total_sales': row['total_sales'],
                 'prescription_count': row['prescription_count'],
                 'notes': row['notes'],
@@ -417,10 +893,8 @@ def get_monthly_reports():
             for row in rows
         }
 
-        cur.close()
-        conn.close()
-
-        return jsonify(result)
+    try:
+        return cached_json(('monthly', first), (first, following - datetime.timedelta(days=1)), build)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -435,17 +909,84 @@ def delete_report_by_date(date_str):
         except ValueError:
             return jsonify({"error": "날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다."}), 400
 
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM daily_reports WHERE date = ?", (date_str,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        # 보관된 날짜는 지점 DB에 행이 없어 DELETE가 조용히 0건이 되므로 먼저 확인
+        with connection(current_store()) as conn:
+            if archive.is_archived(conn, date_obj):
+                return jsonify({"error": archive.ARCHIVED_MESSAGE}), 409
+
+        if writequeue.ENABLED:
+            writequeue.delete(current_store(), date_obj)
+        else:
+            with connection(current_store()) as conn:
+                cur = conn.cursor()
+                cur.execute(queries.DELETE_REPORT, (date_obj,))
+                cur.close()
+        reports_changed(date_obj, events={date_obj: None})
 
         return jsonify({"message": f"{date_str}의 정산 정보가 삭제되었습니다."})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+@app.route('/cache/stats')
+@login_required
+def cache_stats():
+    return jsonify(report_cache.stats())
+
+@app.route('/stores', methods=['GET'])
+@login_required
+def list_stores():
+    # 본사 계정은 전체 지점, 지점 계정은 자기 지점만
+    store_list = stores.all_stores() if is_hq() else [stores.get_store(current_store())]
+    return jsonify({"current": current_store(), "is_hq": is_hq(), "stores": [store for store in store_list if store]})
+
+@app.route('/stores/current', methods=['POST'])
+@login_required
+def select_store():
+    if not is_hq():
+        return jsonify({"error": "지점 변경은 본사 계정만 할 수 있습니다."}), 403
+    data = request.get_json(silent=True) or {}
+    store = stores.get_store(data.get('store_id'))
+    if store is None:
+        return jsonify({"error": "없는 지점입니다."}), 404
+    session['store_id'] = store['id']
+    return jsonify({"message": f"{store['name']}(으)로 전환했습니다.", "current": store['id']})
+
+@app.route('/admin/backup', methods=['GET', 'POST'])
+@login_required
+def admin_backup():
+    # 본사 계정은 전 지점, 지점 계정은 자기 지점만
+    store_ids = None if is_hq() else [current_store()]
+    if request.method == 'GET':
+        return jsonify({"backups": backup.list_backups(store_ids), "last_run": backup.last_run()})
+    try:
+        results = backup.run(store_ids)
+    except backup.BackupBusy:
+        return jsonify({"error": "백업이 이미 진행 중입니다. 잠시 후 다시 시도하세요."}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"message": f"{len(results)}개 지점을 백업했습니다.", "backups": results})
+
+@app.route('/report/events')
+@login_required
+def report_events():
+    # 달력 변경 알림 (SSE). 연결이 가득 차면 503 - 브라우저는 잠시 후 다시 시도
+    store_id = current_store()
+    if not change_feed.open_stream(store_id):
+        return jsonify({"error": "실시간 연결 수가 가득 찼습니다."}), 503
+    last_id = request.headers.get('Last-Event-ID', '')
+    after = int(last_id) if last_id.isdigit() else change_feed.last_id()
+    response = Response(change_feed.stream(after, store_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/metrics')
+@login_required
+def metrics_report():
+    if not metrics.ENABLED:
+        return jsonify({'error': '계측이 꺼져 있습니다. PHARMADAY_METRICS=1로 실행하세요.'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/analyze', methods=['GET'])
 @login_required
 def analyze_data():
@@ -458,177 +999,143 @@ def analyze_report():
     end_date = request.args.get('end')
     include_saturday = request.args.get('include_saturday', 'true') == 'true'
     unit = request.args.get('unit', 'day')
+    scope = request.args.get('scope', 'store')
 
     if not start_date or not end_date:
         return jsonify({'error': 'start and end required'}), 400
-
+    if unit not in analytics.MOVING_AVERAGE_WINDOW:
+        return jsonify({'error': 'unit은 day, week, month 중 하나여야 합니다.'}), 400
+    if scope not in ('store', 'all'):
+        return jsonify({'error': 'scope는 store 또는 all이어야 합니다.'}), 400
+    if scope == 'all' and not is_hq():
+        return jsonify({'error': '전 지점 합산은 본사 계정만 볼 수 있습니다.'}), 403
     try:
-        conn = get_connection()
-        cur = conn.cursor()
+        start = parse_date_param(start_date)
+        end = parse_date_param(end_date)
+    except ValueError:
+        return jsonify({'error': '날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다.'}), 400
+
+    def fetch(store_id):
+        # (날짜 또는 기간, 매출, 처방건수) 행 목록 - 전 지점 합산 시 지점별 스레드에서 실행
+        # PHARMADAY_ANALYTICS_SNAPSHOT이 켜져 있으면 원본 대신 주기적으로 뜬 읽기 사본을 읽음
+        with backup.analytics_connection(store_id) as conn:
+            cur = conn.cursor()
+            if unit == 'day':
+                # 일요일·휴일(및 선택 시 토요일)은 SQL에서 인덱스로 제외
+                cur.execute(queries.ANALYZE_DAY,
+                            (start, end + datetime.timedelta(days=1), 0 if include_saturday else 6))
+                rows = cur.fetchall()
+            else:
+                # 월/주별 집계는 요약 테이블 사용 (휴일·일요일 제외, 토요일은 선택)
+                day_classes = ('weekday', 'saturday') if include_saturday else ('weekday',)
+                rows = rollups.bucket_totals(cur, unit, start, end, day_classes)
+            cur.close()
+        return rows
 
-        if unit == 'month':
-            # 월별 집계 시 토요일 포함 여부 처리
-            include_saturday_sql = '' if include_saturday else "AND strftime('%w', date) != '6'"
-            
-            cur.execute(f"""
-                SELECT strftime('%Y-%m', date) as month,
-                       SUM(total_sales) as sales,
-                       SUM(prescription_count) as prescriptions
-                FROM daily_reports
-                WHERE date >= ? AND date <= ?
-                  AND NOT is_holiday AND NOT is_manual_holiday
-                  AND strftime('%w', date) != '0'
-                  {include_saturday_sql}
-                GROUP BY strftime('%Y-%m', date)
-                ORDER BY month
-            """, (start_date, end_date))
+    def build():
+        if scope == 'all':
+            rows = stores.merge_totals(stores.fan_out(fetch).values())
+        else:
+            rows = fetch(current_store())
+        if unit == 'day':
+            columns = analytics.Columns.from_days(rows)
+        else:
+            columns = analytics.Columns.from_buckets(rows)
+        return analytics.analyze(columns, unit)
 
-            rows = cur.fetchall()
+    try:
+        return cached_json(('analyze', start, end, include_saturday, unit), (start, end), build,
+                           store_id='all' if scope == 'all' else None, snapshot=True)
 
-            total_sales = 0
-            total_prescriptions = 0
-            trend = []
-            max_pres = -1
-            min_pres = float('inf')
-            max_pres_date = ''
-            min_pres_date = ''
-            max_sales = -1
-            min_sales = float('inf')
-            max_month = ""
-            min_month = ""
-
-            for row in rows:
-                month = row['month']
-                sales = int(row['sales'] or 0)
-                prescriptions = int(row['prescriptions'] or 0)
-
-                trend.append({'date': month, 'sales': sales, 'prescriptions': prescriptions})
-                total_sales += sales
-                total_prescriptions += prescriptions
-
-                if sales > max_sales:
-                    max_sales = sales
-                    max_month = month
-                if sales < min_sales:
-                    min_sales = sales
-                    min_month = month
-
-                if prescriptions > max_pres:
-                    max_pres = prescriptions
-                    max_pres_date = month
-                if prescriptions < min_pres:
-                    min_pres = prescriptions
-                    min_pres_date = month
-
-            avg_sales = round(total_sales / len(trend), 2) if trend else 0
-
-            return jsonify({
-                'summary': {
-                    'total_sales': total_sales,
-                    'total_prescriptions': total_prescriptions,
-                    'average_sales': avg_sales,
-                    'average_prescriptions': round(total_prescriptions / len(trend), 2) if trend else 0,
-                    'max_sales_date': max_month,
-                    'min_sales_date': min_month,
-                    'max_prescriptions_date': max_pres_date,
-                    'min_prescriptions_date': min_pres_date
-                },
-                'trend': trend
-            })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        else:
-            cur.execute("""
-                SELECT date, total_sales, prescription_count, is_holiday, is_manual_holiday
-                FROM daily_reports
-                WHERE date BETWEEN ? AND ?
-            """, (start_date, end_date))
+@app.route('/report/compare')
+@login_required
+def compare_report():
+    """이번 기간과 52주 전 같은 요일 기간을 한 번의 조회로 비교 (날짜별·n번째 영업일별)"""
+    include_saturday = request.args.get('include_saturday', 'true') == 'true'
+    try:
+        start = parse_date_param(request.args.get('start'))
+        end = parse_date_param(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': '날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다.'}), 400
+    if not start or not end:
+        return jsonify({'error': 'start and end required'}), 400
+    if end < start:
+        return jsonify({'error': 'end는 start 이후여야 합니다.'}), 400
+    # 두 기간이 겹치지 않도록 52주 이내만
+    if (end - start).days >= analytics.COMPARE_OFFSET_DAYS:
+        return jsonify({'error': f'비교 기간은 {analytics.COMPARE_OFFSET_DAYS}일 이내여야 합니다.'}), 400
 
-            rows = cur.fetchall()
+    shift = datetime.timedelta(days=analytics.COMPARE_OFFSET_DAYS)
+    following = end + datetime.timedelta(days=1)
 
-            total_sales = 0
-            total_prescriptions = 0
-            trend = []
-            max_pres = -1
-            min_pres = float('inf')
-            max_pres_date = ''
-            min_pres_date = ''
-            max_sales = -1
-            min_sales = float('inf')
-            max_date = ""
-            min_date = ""
-
-            for row in rows:
-                date_str = row['date']
-                if isinstance(date_str, datetime.date):
-                    date_obj = date_str
-                else:
-                    date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                
-                weekday = date_obj.weekday()
-                is_holiday = bool(row['is_holiday'])
-                is_manual_holiday = bool(row['is_manual_holiday'])
-
-                if weekday == 6 or is_holiday or is_manual_holiday:
-                    continue
-                if not include_saturday and weekday == 5:
-                    continue
-
-                sales = int(row['total_sales'] or 0)
-                count = int(row['prescription_count'] or 0)
-                date_str = date_obj.strftime('%Y-%m-%d')
-                trend.append({'date': date_str, 'sales': sales, 'prescriptions': count})
-
-                total_sales += sales
-                total_prescriptions += count
-
-                if sales > max_sales:
-                    max_sales = sales
-                    max_date = date_str
-                if sales < min_sales:
-                    min_sales = sales
-                    min_date = date_str
-
-                if count > max_pres:
-                    max_pres = count
-                    max_pres_date = date_str
-                if count < min_pres:
-                    min_pres = count
-                    min_pres_date = date_str
-
-            trend.sort(key=lambda x: x['date'])
-            avg_sales = round(total_sales / len(trend), 2) if trend else 0
-
-            return jsonify({
-                'summary': {
-                    'total_sales': total_sales,
-                    'total_prescriptions': total_prescriptions,
-                    'average_sales': avg_sales,
-                    'average_prescriptions': round(total_prescriptions / len(trend), 2) if trend else 0,
-                    'max_sales_date': max_date,
-                    'min_sales_date': min_date,
-                    'max_prescriptions_date': max_pres_date,
-                    'min_prescriptions_date': min_pres_date
-                },
-                'trend': trend
-            })
+    def build():
+        with backup.analytics_connection(current_store()) as conn:
+            rows = conn.execute(queries.COMPARE_DAYS, (0 if include_saturday else 6, start, following,
+                                                       start - shift, following - shift)).fetchall()
+        return analytics.compare(rows, start, end)
 
+    try:
+        return cached_json(('compare', start, end, include_saturday), (start - shift, end), build,
+                           snapshot=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-if __name__ == '__main__':
-    import webbrowser
-    import threading
-    import time
-
-    # 서버 실행 (새 스레드)
-    def run_server():
-        app.run(host='0.0.0.0', port=5000, debug=False)
+# 예측 모형을 맞추는 과거 구간 (16주)
+FORECAST_HISTORY_DAYS = 16 * 7
 
-    threading.Thread(target=run_server).start()
-
-    # 서버가 뜨길 잠깐 기다렸다가 브라우저 자동 실행
-    time.sleep(3)
-    webbrowser.open("http://127.0.0.1:5000")
+@app.route('/report/forecast')
+@login_required
+def forecast_report():
+    """이번 달(month=YYYY-MM) 남은 날의 매출·처방 예측 (주간 계절성 Holt-Winters)
 
+    as_of(기본 오늘)까지는 실제 값, 그 다음 날부터 월말까지 예측. 모형은 캐시되어
+    해당 구간에 저장이 있을 때까지 다시 계산하지 않는다.
+    """
+    try:
+        today = parse_date_param(request.args.get('as_of')) or datetime.date.today()
+        month = request.args.get('month')
+        if month:
+            first, following = queries.month_bounds(*map(int, month.split('-')))
+        else:
+            first, following = queries.month_bounds(today.year, today.month)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'month는 YYYY-MM, as_of는 YYYY-MM-DD 형식이어야 합니다.'}), 400
+
+    last_day = following - datetime.timedelta(days=1)
+    as_of = min(today, last_day)
+    history_start = as_of - datetime.timedelta(days=FORECAST_HISTORY_DAYS - 1)
+
+    def build():
+        with backup.analytics_connection(current_store()) as conn:
+            rows = conn.execute(queries.FORECAST_DAYS, (0, history_start, following)).fetchall()
+            closed = {row['date'] for row in conn.execute(
+                queries.HOLIDAYS_RANGE, (as_of + datetime.timedelta(days=1), following))}
+        result = analytics.forecast(rows, history_start, as_of, last_day, closed)
+        result['days'] = [day for day in result['days'] if day['date'] >= str(first)]
+
+        actual = [row for row in rows if first <= row['date'] <= as_of]
+        actual_sales = sum(int(row['total_sales'] or 0) for row in actual)
+        actual_prescriptions = sum(int(row['prescription_count'] or 0) for row in actual)
+        forecast_sales = sum(day['sales'] for day in result['days'])
+        forecast_prescriptions = sum(day['prescriptions'] for day in result['days'])
+        result.update({
+            'month': f'{first:%Y-%m}',
+            'as_of': str(as_of),
+            'actual': {'sales': actual_sales, 'prescriptions': actual_prescriptions},
+            'forecast': {'sales': forecast_sales, 'prescriptions': forecast_prescriptions},
+            'projected_total': {'sales': actual_sales + forecast_sales,
+                                'prescriptions': actual_prescriptions + forecast_prescriptions},
+        })
+        return result
 
+    try:
+        return cached_json(('forecast', first, as_of), (history_start, last_day), build,
+                           snapshot=True)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+if __name__ == '__main__':
+    sys.exit(server.main(app))
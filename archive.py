@@ -0,0 +1,403 @@
+"""지난 연도 정산 보관 (연도별 읽기 전용 DB 파일)
+
+다 끝난 연도의 daily_reports 행을 ARCHIVE_DIR/<지점 코드>/<지점 코드>-<연도>.db 로 옮겨
+지점 DB(자주 쓰는 파일)를 작게 유지한다. 보관 파일은 만든 뒤로 바뀌지 않으므로
+SHA-256을 기록해 두고 검사할 수 있고, 백업도 파일당 한 번만 복사하면 된다.
+
+커넥션을 빌릴 때(db.connection) 보관 파일을 읽기 전용으로 ATTACH하고, 같은 이름의
+TEMP VIEW daily_reports(지점 DB + 보관 파일 UNION ALL)를 만든다. TEMP 스키마가 먼저
+검색되므로 기존 조회 SQL은 그대로 보관분까지 읽고, 날짜 조건은 각 파일의 인덱스로 내려간다.
+쓰기 SQL은 main.daily_reports를 직접 가리키며, 보관된 연도로의 쓰기는 트리거가 막는다.
+보관된 메모는 전문 검색(/report/search) 대상이 아니다.
+
+    python manage.py archive run                # 올해·작년을 뺀 지난 연도를 보관
+    python manage.py archive run --before 2020  # 2019년까지 보관
+    python manage.py archive list
+    python manage.py archive verify             # 파일 해시·행 수·무결성 검사
+    python manage.py archive attach 파일경로     # 백업에서 복원한 보관 파일을 다시 연결
+    python manage.py archive restore 2019       # 보관을 풀고 지점 DB로 되돌림
+"""
+import datetime
+import hashlib
+import os
+import pathlib
+import shutil
+import sqlite3
+import sys
+
+import rollups
+
+# db가 이 모듈을 import하므로 경로는 여기서 따로 계산 (PyInstaller 대응)
+if getattr(sys, 'frozen', False):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.environ.get('PHARMADAY_ARCHIVE_DIR') or os.path.join(BASE_DIR, 'archive')
+# 보관하지 않고 남겨 둘 최근 연도 수 (기본: 올해와 작년)
+KEEP_YEARS = int(os.environ.get('PHARMADAY_ARCHIVE_KEEP_YEARS', '2'))
+
+COLUMNS = 'id, date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday'
+ARCHIVED_MESSAGE = '보관된 연도의 정산 정보는 수정할 수 없습니다.'
+
+_ARCHIVE_SCHEMA = (
+    '''CREATE TABLE daily_reports (
+        id INTEGER PRIMARY KEY,
+        date DATE UNIQUE NOT NULL,
+        total_sales INTEGER,
+        prescription_count INTEGER,
+        notes TEXT,
+        is_holiday BOOLEAN,
+        is_manual_holiday BOOLEAN,
+        weekday INTEGER GENERATED ALWAYS AS (CAST(strftime('%w', date) AS INTEGER)) VIRTUAL
+    )''',
+    'CREATE INDEX idx_daily_reports_date_weekday ON daily_reports(date, weekday)',
+    'CREATE TABLE archive_info (store TEXT NOT NULL, year INTEGER NOT NULL, rows INTEGER NOT NULL)',
+)
+
+
+class ArchiveError(Exception):
+    """보관 작업을 할 수 없거나 보관 파일이 기록과 다름"""
+
+
+def ensure_schema(cur):
+    """지점 DB의 보관 파일 목록"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS archives (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def archive_path(file):
+    """archives.file(ARCHIVE_DIR 기준 상대 경로 또는 절대 경로) → 파일 경로"""
+    return file if os.path.isabs(file) else os.path.join(ARCHIVE_DIR, file)
+
+
+def _uri(path):
+    # 바뀌지 않는 파일이므로 immutable: 잠금·변경 확인 없이 읽음
+    return pathlib.Path(os.path.abspath(path)).as_uri() + '?mode=ro&immutable=1'
+
+
+def _alias(year):
+    return f'archive_{int(year)}'
+
+
+def registered(conn):
+    """[{year, file, rows, sha256, archived_at}] 연도순 (목록 테이블이 없으면 빈 목록)"""
+    try:
+        rows = conn.execute('SELECT year, file, rows, sha256, archived_at FROM main.archives ORDER BY year').fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [dict(row) for row in rows]
+
+
+def is_archived(conn, day):
+    return conn.execute('SELECT 1 FROM main.archives WHERE year = ?', (day.year,)).fetchone() is not None
+
+
+def _create_view(conn, years):
+    conn.execute('DROP VIEW IF EXISTS temp.daily_reports')
+    if not years:
+        return
+    arms = [f'SELECT {COLUMNS}, weekday FROM main.daily_reports']
+    arms += [f'SELECT {COLUMNS}, weekday FROM {_alias(year)}.daily_reports' for year in sorted(years)]
+    conn.execute('CREATE TEMP VIEW daily_reports AS\n' + '\nUNION ALL\n'.join(arms))
+
+
+def missing(conn):
+    """등록은 되어 있지만 파일이 없는 보관 연도 목록"""
+    return [item['year'] for item in registered(conn) if not os.path.exists(archive_path(item['file']))]
+
+
+def _require_files(conn):
+    # 요약 재계산은 모든 보관분을 읽어야 하므로 빠진 파일이 있으면 먼저 복구
+    years = missing(conn)
+    if years:
+        raise ArchiveError(f"보관 파일이 없는 연도가 있습니다: {', '.join(map(str, years))} "
+                           f"(manage.py archive attach로 먼저 다시 연결하세요)")
+
+
+def attach(conn, missing_ok=False):
+    """conn에 등록된 보관 파일을 ATTACH하고 TEMP VIEW를 다시 만듦 (트랜잭션 밖에서 호출)
+
+    파일이 없으면 ArchiveError - missing_ok면 그 연도만 빼고 연결 (관리 명령에서 복구할 때)
+    """
+    for row in conn.execute('PRAGMA database_list').fetchall():
+        if row['name'].startswith('archive_'):
+            conn.execute(f"DETACH DATABASE {row['name']}")
+    years = []
+    for item in registered(conn):
+        path = archive_path(item['file'])
+        if not os.path.exists(path):
+            if missing_ok:
+                continue
+            raise ArchiveError(f"{item['year']}년 보관 파일이 없습니다: {path} "
+                               f"(백업에서 복원한 뒤 manage.py archive attach로 다시 연결하세요)")
+        conn.execute('ATTACH DATABASE ? AS ' + _alias(item['year']), (_uri(path),))
+        years.append(item['year'])
+    _create_view(conn, years)
+
+
+def _sync_trigger(conn, years):
+    """보관된 연도로의 INSERT/날짜 변경을 막는 트리거 (연도 목록을 바꾸면 스키마 버전이 올라 다른 커넥션도 다시 ATTACH)"""
+    for event in ('insert', 'update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS main.daily_reports_archived_{event}')
+    if not years:
+        return
+    year_list = ', '.join(f"'{int(year):04d}'" for year in sorted(years))
+    for event, timing in (('insert', 'BEFORE INSERT'), ('update', 'BEFORE UPDATE OF date')):
+        conn.execute(f'''
+            CREATE TRIGGER main.daily_reports_archived_{event}
+            {timing} ON daily_reports
+            WHEN substr(NEW.date, 1, 4) IN ({year_list})
+            BEGIN
+                SELECT RAISE(ABORT, '{ARCHIVED_MESSAGE}');
+            END
+        ''')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_info(path):
+    """보관 파일의 (지점 코드, 연도, 기록된 행 수, 실제 행 수) - 무결성 검사 실패 시 ArchiveError"""
+    conn = sqlite3.connect(_uri(path), uri=True)
+    try:
+        if conn.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+            raise ArchiveError(f'보관 파일 무결성 검사 실패: {path}')
+        store, year, rows = conn.execute('SELECT store, year, rows FROM archive_info').fetchone()
+        actual = conn.execute('SELECT COUNT(*) FROM daily_reports').fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise ArchiveError(f'보관 파일을 읽을 수 없습니다: {path} ({e})')
+    finally:
+        conn.close()
+    return store, year, rows, actual
+
+
+def _check_slots(conn, archives):
+    # ATTACH 개수 제한(SQLite 기본 10개) 안에서만 보관 - 작업 중 임시로 하나를 더 씀
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(archives) + 1 >= limit:
+        raise ArchiveError(f'보관 파일은 {limit - 1}개까지 연결할 수 있습니다. '
+                           f'(현재 {len(archives)}개)')
+
+
+def _swap_in(conn, year, file, rows, digest, moved):
+    """보관 파일을 연결하고 한 트랜잭션으로 목록 등록·원본 행 삭제·요약 재계산
+
+    moved가 참이면(archive run) 지점 DB의 그 연도 행이 보관 파일과 같은지 확인한 뒤 지우고,
+    거짓이면(attach) 지점 DB에 그 연도 행이 없어야 한다. 다른 커넥션은 커밋 후에만 바뀐 상태를 본다.
+    """
+    _require_files(conn)
+    years = [item['year'] for item in registered(conn)]
+    conn.execute('ATTACH DATABASE ? AS ' + _alias(year), (_uri(archive_path(file)),))
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        first, following = datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+        if moved:
+            # 복사 후 그 사이 바뀐 행이 있으면 중단 (다시 실행하면 새로 복사)
+            differs = conn.execute(f'''
+                SELECT COUNT(*) FROM (
+                    SELECT {COLUMNS} FROM main.daily_reports WHERE date >= ? AND date < ?
+                    EXCEPT SELECT {COLUMNS} FROM {_alias(year)}.daily_reports
+                )''', (first, following)).fetchone()[0]
+            remaining = conn.execute('SELECT COUNT(*) FROM main.daily_reports WHERE date >= ? AND date < ?',
+                                     (first, following)).fetchone()[0]
+            if differs or remaining != rows:
+                raise ArchiveError(f'{year}년 정산 정보가 보관 중에 바뀌었습니다. 다시 실행하세요.')
+            conn.execute('DELETE FROM main.daily_reports WHERE date >= ? AND date < ?', (first, following))
+            # 옮긴 날짜는 삭제가 아니므로 방금 생긴 삭제 기록(툼스톤)은 지움 - 증분 동기화 단말이 지우지 않게
+            conn.execute('DELETE FROM main.report_changes WHERE date >= ? AND date < ? AND deleted',
+                         (first, following))
+        elif conn.execute('SELECT 1 FROM main.daily_reports WHERE date >= ? AND date < ? LIMIT 1',
+                          (first, following)).fetchone():
+            raise ArchiveError(f'지점 DB에 {year}년 정산 정보가 있어 보관 파일을 연결할 수 없습니다.')
+        else:
+            # 조회 결과에 그 연도가 새로 나타나므로 데이터 버전을 올려 캐시·ETag가 새로 만들어지게 함
+            conn.execute('UPDATE main.report_meta SET version = version + 1, modified_at = CURRENT_TIMESTAMP '
+                         'WHERE id = 1')
+        conn.execute('INSERT INTO main.archives (year, file, rows, sha256) VALUES (?, ?, ?, ?)',
+                     (year, file, rows, digest))
+        _sync_trigger(conn, years + [year])
+        _create_view(conn, years + [year])
+        rollups.rebuild(conn.cursor())
+        conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute('DETACH DATABASE ' + _alias(year))
+        _create_view(conn, years)
+        raise
+
+
+def archive_year(conn, store, year):
+    """store의 year년 행을 보관 파일로 옮기고 결과 dict 반환 (옮길 행이 없으면 None)"""
+    archives = registered(conn)
+    if any(item['year'] == year for item in archives):
+        return None
+    first, following = datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+    rows = conn.execute('SELECT COUNT(*) FROM main.daily_reports WHERE date >= ? AND date < ?',
+                        (first, following)).fetchone()[0]
+    if not rows:
+        return None
+    _check_slots(conn, archives)
+
+    file = os.path.join(store['code'], f"{store['code']}-{year}.db")
+    path = archive_path(file)
+    temp = path + '.tmp'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(temp):
+        os.remove(temp)
+
+    try:
+        dest = sqlite3.connect(temp)
+        try:
+            for sql in _ARCHIVE_SCHEMA:
+                dest.execute(sql)
+            dest.execute('INSERT INTO archive_info (store, year, rows) VALUES (?, ?, ?)', (store['code'], year, rows))
+            dest.commit()
+        finally:
+            dest.close()
+
+        conn.execute('ATTACH DATABASE ? AS archive_new', (temp,))
+        try:
+            conn.execute(f'''
+                INSERT INTO archive_new.daily_reports ({COLUMNS})
+                SELECT {COLUMNS} FROM main.daily_reports WHERE date >= ? AND date < ? ORDER BY date
+            ''', (first, following))
+            copied = conn.execute('SELECT COUNT(*) FROM archive_new.daily_reports').fetchone()[0]
+            conn.execute('UPDATE archive_new.archive_info SET rows = ?', (copied,))
+            conn.commit()
+        finally:
+            conn.execute('DETACH DATABASE archive_new')
+
+        # 빈 페이지 없이 압축하고, 저널 없이 파일 하나로 열리게 둠
+        dest = sqlite3.connect(temp)
+        try:
+            dest.execute('VACUUM')
+            dest.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dest.close()
+        _read_info(temp)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+    digest = file_sha256(path)
+    try:
+        _swap_in(conn, year, file, copied, digest, moved=True)
+    except BaseException:
+        os.remove(path)
+        raise
+    return {'year': year, 'file': file, 'rows': copied, 'bytes': os.path.getsize(path), 'sha256': digest}
+
+
+def closed_years(conn, before=None):
+    """보관 대상 연도 목록 (before 미만, 기본은 최근 KEEP_YEARS년을 뺀 연도)"""
+    if before is None:
+        before = datetime.date.today().year - KEEP_YEARS + 1
+    first = conn.execute('SELECT MIN(date) FROM main.daily_reports').fetchone()[0]
+    if first is None:
+        return []
+    first_year = first.year if isinstance(first, datetime.date) else int(str(first)[:4])
+    return list(range(first_year, before))
+
+
+def attach_file(conn, store, source):
+    """백업 등에서 가져온 보관 파일을 확인 후 ARCHIVE_DIR로 복사해 다시 연결 - 결과 dict"""
+    code, year, rows, actual = _read_info(source)
+    if code != store['code']:
+        raise ArchiveError(f"다른 지점({code})의 보관 파일입니다.")
+    if rows != actual:
+        raise ArchiveError(f'보관 파일의 행 수가 기록과 다릅니다: {actual} / {rows}')
+    archives = registered(conn)
+    existing = next((item for item in archives if item['year'] == year), None)
+    if existing is not None:
+        # 등록은 되어 있는데 파일만 없어진 경우: 같은 파일(해시 일치)이면 제자리에 복사
+        path = archive_path(existing['file'])
+        if os.path.exists(path):
+            raise ArchiveError(f'{year}년은 이미 보관 파일이 연결되어 있습니다.')
+        if file_sha256(source) != existing['sha256']:
+            raise ArchiveError(f'{year}년 보관 기록과 해시가 다른 파일입니다.')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy2(source, path)
+        attach(conn, missing_ok=True)
+        return {'year': year, 'file': existing['file'], 'rows': rows, 'sha256': existing['sha256']}
+    _check_slots(conn, archives)
+
+    file = os.path.join(store['code'], f"{store['code']}-{year}.db")
+    path = archive_path(file)
+    copied = False
+    if os.path.abspath(source) != os.path.abspath(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy2(source, path)
+        copied = True
+    digest = file_sha256(path)
+    try:
+        _swap_in(conn, year, file, rows, digest, moved=False)
+    except BaseException:
+        if copied:
+            os.remove(path)
+        raise
+    return {'year': year, 'file': file, 'rows': rows, 'sha256': digest}
+
+
+def restore_year(conn, year):
+    """보관을 풀고 행을 지점 DB로 되돌림 (보관 파일은 지우지 않음) - 되돌린 행 수"""
+    archives = registered(conn)
+    item = next((item for item in archives if item['year'] == year), None)
+    if item is None:
+        raise ArchiveError(f'{year}년은 보관되어 있지 않습니다.')
+    _require_files(conn)
+    years = [item['year'] for item in archives if item['year'] != year]
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM main.archives WHERE year = ?', (year,))
+        _sync_trigger(conn, years)
+        cur = conn.execute(f'INSERT INTO main.daily_reports ({COLUMNS}) '
+                           f'SELECT {COLUMNS} FROM {_alias(year)}.daily_reports', ())
+        restored = cur.rowcount
+        _create_view(conn, years)
+        rollups.rebuild(conn.cursor())
+        conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        attach(conn, missing_ok=True)
+    return restored
+
+
+def verify(conn):
+    """등록된 보관 파일마다 (연도, 문제 목록) - 문제가 없으면 빈 목록"""
+    results = []
+    for item in registered(conn):
+        path = archive_path(item['file'])
+        problems = []
+        if not os.path.exists(path):
+            problems.append(f'파일 없음: {path}')
+        else:
+            if file_sha256(path) != item['sha256']:
+                problems.append('SHA-256이 기록과 다름')
+            try:
+                _, year, _, actual = _read_info(path)
+                if year != item['year']:
+                    problems.append(f'다른 연도({year})의 파일')
+                if actual != item['rows']:
+                    problems.append(f"행 수가 기록과 다름 ({actual} / {item['rows']})")
+            except ArchiveError as e:
+                problems.append(str(e))
+        results.append((item['year'], problems))
+    return results
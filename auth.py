@@ -0,0 +1,136 @@
+"""로그인 비밀번호 확인
+
+pbkdf2 해시 확인은 한 번에 수십 ms의 CPU를 쓰므로
+ - 해시 계산 전에 IP별, (아이디, IP)별 토큰 버킷으로 시도 횟수를 제한하고
+   (아이디만으로 묶으면 같은 LAN의 다른 PC가 약사 계정을 잠글 수 있으므로 IP와 함께 묶음)
+ - 해시 계산은 작은 전용 스레드 풀에서만 돌려 정산 요청이 밀리지 않게 하며
+ - 설정한 반복 횟수(rounds)와 다른 해시는 로그인 성공 시 새 설정으로 다시 저장한다.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import metrics
+
+PBKDF2_ROUNDS = int(os.environ.get('PHARMADAY_PBKDF2_ROUNDS', '29000'))
+HASH_WORKERS = int(os.environ.get('PHARMADAY_HASH_WORKERS', '2'))
+HASH_QUEUE_LIMIT = HASH_WORKERS * 4
+HASH_TIMEOUT = 10
+
+# (버킷 크기, 초당 충전량): IP당 분당 10회, 같은 IP에서 아이디당 분당 5회
+IP_LIMIT = (10, 10 / 60)
+USERNAME_LIMIT = (5, 5 / 60)
+
+_password_context = None
+_context_lock = threading.Lock()
+
+
+def get_password_context():
+    """passlib CryptContext (passlib은 import가 무거워 첫 로그인 때 불러옴)"""
+    global _password_context
+    with _context_lock:
+        if _password_context is None:
+            from passlib.context import CryptContext
+
+            # min/max를 기본값과 같게 두어야 설정과 다른 해시를 verify_and_update가 갱신 대상으로 본다
+            _password_context = CryptContext(
+                schemes=['pbkdf2_sha256'],
+                pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+                pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+                pbkdf2_sha256__max_rounds=PBKDF2_ROUNDS,
+            )
+        return _password_context
+
+
+class AuthBusy(Exception):
+    """해시 확인 대기열이 가득 찼거나 제한 시간 안에 끝나지 않음"""
+
+
+class TokenBucket:
+    """키별 토큰 버킷 (capacity개까지 쌓이고 초당 rate개씩 충전)"""
+
+    def __init__(self, capacity, rate, max_keys=10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """토큰 하나를 사용 - (허용 여부, 다시 시도까지 남은 초)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False, int((1 - tokens) / self.rate) + 1
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return True, 0
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def _prune(self, now):
+        # 이미 가득 찼을 버킷은 지워도 동작이 같음
+        full_after = self.capacity / self.rate
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[key]
+
+
+ip_throttle = TokenBucket(*IP_LIMIT)
+username_throttle = TokenBucket(*USERNAME_LIMIT)
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='pharmaday-hash')
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+def check_throttle(ip, username):
+    """해시 계산 전에 호출 - (허용 여부, 다시 시도까지 남은 초)"""
+    allowed, retry_after = ip_throttle.take(ip)
+    if allowed and username:
+        allowed, retry_after = username_throttle.take((username.lower(), ip))
+    return allowed, retry_after
+
+
+def login_succeeded(ip, username):
+    username_throttle.reset((username.lower(), ip))
+
+
+def _run(func, *args):
+    if not _slots.acquire(blocking=False):
+        raise AuthBusy()
+    try:
+        future = _executor.submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeout:
+        raise AuthBusy()
+
+
+def verify_password(password, password_hash):
+    """(일치 여부, 새 해시 또는 None)
+
+    새 해시가 있으면 rounds 설정이 바뀐 것이므로 호출한 쪽에서 저장한다.
+    계정이 없을 때(password_hash=None)도 같은 시간이 걸리도록 더미 확인을 한다.
+    """
+    with metrics.phase('password_hash'):
+        context = get_password_context()
+        if password_hash is None:
+            _run(context.dummy_verify)
+            return False, None
+        return _run(context.verify_and_update, password or '', password_hash)
+
+
+def hash_password(password):
+    with metrics.phase('password_hash'):
+        return _run(get_password_context().hash, password)
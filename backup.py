@@ -0,0 +1,285 @@
+"""온라인 백업과 분석용 읽기 스냅샷
+
+서버가 돌고 있는 중에 pharmaday.db를 파일 복사하면 쓰기 도중의 페이지가 섞인
+깨진 사본이 나올 수 있다. 여기서는 SQLite 온라인 백업 API로 페이지를 조금씩
+(PAGES_PER_STEP) 복사하고, 단계 사이에 잠금을 풀어 카운터의 저장이 기다리지 않게 한다.
+도중에 원본이 바뀌면 SQLite가 알아서 다시 복사하므로 결과는 항상 한 시점의 일관된 사본이다.
+
+ - 예약 백업: PHARMADAY_BACKUP_HOURS 간격(기본 24시간, 0이면 끔)으로 백그라운드 스레드가 실행
+ - 보관: 지점마다 최근 PHARMADAY_BACKUP_KEEP개(기본 14개)만 남김
+ - 수동 백업: POST /admin/backup
+ - 보관 파일(archive.py)은 바뀌지 않으므로 백업 폴더의 archive/ 아래에 없거나 다를 때만 복사
+ - 분석 스냅샷: PHARMADAY_ANALYTICS_SNAPSHOT=초 를 주면 /report/analyze는 원본 대신
+   그 주기로 새로 뜬 읽기 전용 사본을 읽는다. 긴 분석 조회가 원본 WAL 체크포인트를
+   붙잡지 않는 대신 결과가 최대 그 시간만큼 늦을 수 있다.
+"""
+import datetime
+import glob
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import archive
+import db
+import metrics
+import stores
+
+BACKUP_DIR = os.environ.get('PHARMADAY_BACKUP_DIR') or os.path.join(db.BASE_DIR, 'backups')
+SNAPSHOT_DIR = os.environ.get('PHARMADAY_SNAPSHOT_DIR') or os.path.join(db.BASE_DIR, 'snapshots')
+BACKUP_HOURS = float(os.environ.get('PHARMADAY_BACKUP_HOURS', '24'))
+BACKUP_KEEP = int(os.environ.get('PHARMADAY_BACKUP_KEEP', '14'))
+ANALYTICS_SNAPSHOT_SECONDS = float(os.environ.get('PHARMADAY_ANALYTICS_SNAPSHOT', '0'))
+
+PAGES_PER_STEP = 256      # 기본 4KB 페이지 기준 1MB씩 복사
+STEP_SLEEP = 0.005        # 단계 사이 쉬는 시간(초) - 이 사이 쓰기가 끼어들 수 있음
+
+logger = logging.getLogger(__name__)
+
+
+class BackupBusy(Exception):
+    """다른 백업이 이미 진행 중"""
+
+
+_backup_lock = threading.Lock()
+_last_run = None
+
+
+def _copy(store_id, target):
+    """store_id DB를 target 파일로 온라인 백업하고 복사한 페이지 수를 반환
+
+    사본은 WAL 없이 파일 하나로 열리도록 DELETE 저널 모드로 바꿔 둔다.
+    """
+    pages = 0
+
+    def progress(status, remaining, total):
+        nonlocal pages
+        pages = total
+
+    source = db.get_connection(store_id)
+    try:
+        dest = sqlite3.connect(target)
+        try:
+            source.backup(dest, pages=PAGES_PER_STEP, progress=progress, sleep=STEP_SLEEP)
+            dest.execute('PRAGMA journal_mode=DELETE')
+            if dest.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+                raise sqlite3.DatabaseError(f'백업 사본 검사 실패: {target}')
+        finally:
+            dest.close()
+    finally:
+        source.close()
+    return pages
+
+
+def _store_dir(code):
+    return os.path.join(BACKUP_DIR, code)
+
+
+def backup_store(store):
+    """지점 하나를 백업하고 보관 개수를 넘는 오래된 백업을 지움 - 결과 dict"""
+    directory = _store_dir(store['code'])
+    os.makedirs(directory, exist_ok=True)
+    name = f"{store['code']}-{datetime.datetime.now():%Y%m%d-%H%M%S}.db"
+    path = os.path.join(directory, name)
+    temp = path + '.tmp'
+
+    started = time.perf_counter()
+    db.init_db(store['id'])
+    try:
+        pages = _copy(store['id'], temp)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    seconds = time.perf_counter() - started
+
+    for old in _backup_files(store['code'])[BACKUP_KEEP:]:
+        os.remove(old)
+    return {
+        'store': store['code'],
+        'file': name,
+        'bytes': os.path.getsize(path),
+        'pages': pages,
+        'seconds': round(seconds, 3),
+        'archives_copied': _copy_archives(store),
+    }
+
+
+def _copy_archives(store):
+    """백업 폴더에 없거나 해시가 다른 보관 파일만 복사하고 복사한 개수를 반환"""
+    with db.connection(store['id']) as conn:
+        archives = archive.registered(conn)
+    directory = os.path.join(_store_dir(store['code']), 'archive')
+    copied = 0
+    for item in archives:
+        target = os.path.join(directory, os.path.basename(item['file']))
+        if os.path.exists(target) and archive.file_sha256(target) == item['sha256']:
+            continue
+        os.makedirs(directory, exist_ok=True)
+        shutil.copy2(archive.archive_path(item['file']), target + '.tmp')
+        os.replace(target + '.tmp', target)
+        copied += 1
+    return copied
+
+
+def _backup_files(code):
+    """백업 파일 경로 (최신순, 이름에 시각이 들어 있어 이름순 = 시간순)"""
+    return sorted(glob.glob(os.path.join(_store_dir(code), f'{glob.escape(code)}-*.db')), reverse=True)
+
+
+def run(store_ids=None):
+    """지정한 지점(기본: 전체)을 차례로 백업 - 이미 진행 중이면 BackupBusy"""
+    global _last_run
+    if not _backup_lock.acquire(blocking=False):
+        raise BackupBusy()
+    try:
+        targets = [store for store in stores.all_stores() if store_ids is None or store['id'] in store_ids]
+        results = [backup_store(store) for store in targets]
+        _last_run = {'finished_at': datetime.datetime.now().isoformat(timespec='seconds'), 'backups': results}
+        return results
+    finally:
+        _backup_lock.release()
+
+
+def last_run():
+    return _last_run
+
+
+def list_backups(store_ids=None):
+    """{지점 코드: [{file, bytes}]} (최신순)"""
+    result = {}
+    for store in stores.all_stores():
+        if store_ids is not None and store['id'] not in store_ids:
+            continue
+        result[store['code']] = [{'file': os.path.basename(path), 'bytes': os.path.getsize(path)}
+                                 for path in _backup_files(store['code'])]
+    return result
+
+
+# ---------------------------------------------------------------- 예약 백업
+
+_scheduler = None
+_stop = threading.Event()
+
+
+def _latest_backup_time():
+    """지점별 최신 백업 시각 중 가장 오래된 것 (백업이 없는 지점이 있으면 0)"""
+    times = []
+    for store in stores.all_stores():
+        files = _backup_files(store['code'])
+        if not files:
+            return 0
+        times.append(os.path.getmtime(files[0]))
+    return min(times) if times else 0
+
+
+def _schedule_loop(interval):
+    # 서버를 매일 껐다 켜도 백업이 밀리지 않도록 마지막 백업 파일 시각 기준으로 다음 실행을 정함
+    while not _stop.is_set():
+        try:
+            due = _latest_backup_time() + interval
+        except Exception:
+            logger.exception('백업 일정 확인 실패')
+            due = time.time() + interval
+        if _stop.wait(max(0, min(due - time.time(), 3600))):
+            break
+        if time.time() < due:
+            continue
+        try:
+            for result in run():
+                logger.info('백업 완료: %s (%d bytes, %.1fs)', result['file'], result['bytes'], result['seconds'])
+        except BackupBusy:
+            pass
+        except Exception:
+            logger.exception('예약 백업 실패')
+            _stop.wait(600)  # 디스크 가득 참 등은 잠시 뒤 재시도
+
+
+def start(hours=BACKUP_HOURS):
+    """예약 백업 스레드 시작 (hours가 0이면 시작하지 않음, 여러 번 불러도 한 번만 실행)"""
+    global _scheduler
+    if hours <= 0 or _scheduler is not None:
+        return
+    _scheduler = threading.Thread(target=_schedule_loop, args=(hours * 3600,),
+                                  name='pharmaday-backup', daemon=True)
+    _scheduler.start()
+
+
+def stop():
+    _stop.set()
+
+
+# ---------------------------------------------------------------- 분석 스냅샷
+
+class _Snapshot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.taken_at = 0.0
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def _refresh_snapshot(store_id, snapshot):
+    """새 세대 파일로 사본을 뜨고 교체 (열려 있는 예전 파일은 다음 교체 때 정리)"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    prefix = os.path.join(SNAPSHOT_DIR, f'store{store_id}-')
+    path = f'{prefix}{time.time_ns()}.db'
+    _copy(store_id, path)
+    snapshot.path = path
+    snapshot.taken_at = time.monotonic()
+    for old in glob.glob(glob.escape(prefix) + '*.db'):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass  # Windows에서 아직 읽는 중인 파일은 지워지지 않음
+
+
+def _current_snapshot(store_id):
+    """지점의 사본 (주기가 지났으면 새로 뜬 뒤 반환)"""
+    with _snapshots_lock:
+        snapshot = _snapshots.setdefault(store_id, _Snapshot())
+    with snapshot.lock:
+        # 오래된 사본은 처음 요청한 스레드 하나만 새로 뜨고 나머지는 기다렸다 새 사본을 읽음
+        if snapshot.path is None or time.monotonic() - snapshot.taken_at > ANALYTICS_SNAPSHOT_SECONDS:
+            db.init_db(store_id)
+            _refresh_snapshot(store_id, snapshot)
+        return snapshot
+
+
+def snapshot_version(store_ids):
+    """분석 캐시 키에 넣을 지점별 사본 시각 (스냅샷을 끄면 None)
+
+    사본으로 만든 결과는 쓰기 후 다시 계산해도 예전 사본 값이므로, 사본이 바뀔 때 키가 바뀌어야
+    새 사본으로 다시 계산된다. 주기가 지난 사본은 여기서 새로 뜬다.
+    """
+    if ANALYTICS_SNAPSHOT_SECONDS <= 0:
+        return None
+    return tuple(_current_snapshot(store_id).taken_at for store_id in store_ids)
+
+
+@contextmanager
+def analytics_connection(store_id):
+    """분석 조회용 커넥션 - 스냅샷이 켜져 있으면 읽기 전용 사본, 아니면 지점 DB 풀"""
+    if ANALYTICS_SNAPSHOT_SECONDS <= 0:
+        with db.connection(store_id) as conn:
+            yield conn
+        return
+
+    path = _current_snapshot(store_id).path
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, detect_types=sqlite3.PARSE_DECLTYPES,
+                           check_same_thread=False,
+                           factory=metrics.TimedConnection if metrics.ENABLED else sqlite3.Connection)
+    conn.row_factory = sqlite3.Row
+    try:
+        archive.attach(conn)
+        yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,443 @@
+"""PharmaDay 엔드포인트 벤치마크
+
+임시 DB에 1/5/20년치 합성 정산 데이터를 넣고 주요 엔드포인트를 반복 호출해
+p50/p95/p99 지연시간, 처리량, 최대 메모리(RSS)를 측정한다. 결과는 기준값
+파일(bench_baseline.json)과 비교해 느려진 항목이 있으면 종료 코드 1을 반환한다.
+실제 pharmaday.db는 건드리지 않는다.
+
+    python bench.py                          # 1/5/20년 데이터로 측정 후 기준값과 비교
+    python bench.py --years 5 --requests 500
+    python bench.py --concurrency 4          # 동시에 4개 클라이언트로 요청
+    python bench.py --server                 # 로컬 waitress 서버에 HTTP로 요청
+    python bench.py --save                   # 이번 결과를 기준값으로 저장
+"""
+import argparse
+import datetime
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BASE_DIR, 'bench_baseline.json')
+
+DATASET_YEARS = (1, 5, 20)
+LAST_DAY = datetime.date(2025, 12, 31)
+SEED = 20250101
+
+# 기준값 대비 이 배수를 넘고, 차이가 최소 허용폭(ms)보다 크면 회귀로 판단
+# (p99는 요청 수가 적으면 흔들림이 커서 출력만 하고 비교하지 않음)
+DEFAULT_TOLERANCE = 2.0
+MIN_SLACK_MS = 3.0
+GATED_METRICS = ('p50_ms', 'p95_ms')
+
+
+# ---------------------------------------------------------------- 합성 데이터
+
+def synthetic_records(years, rng):
+    """(줄 번호, 레코드) 생성 - bulk.import_records에 그대로 넘길 수 있는 형태"""
+    first = LAST_DAY.replace(year=LAST_DAY.year - years) + datetime.timedelta(days=1)
+    day = first
+    line_no = 0
+    while day <= LAST_DAY:
+        line_no += 1
+        weekday = day.weekday()
+        holiday = weekday == 6 or rng.random() < 0.02
+        if holiday:
+            sales, prescriptions = 0, 0
+        else:
+            # 토요일은 반나절 영업, 연말로 갈수록 조금씩 증가
+            scale = (0.5 if weekday == 5 else 1.0) * (1 + (day.year - first.year) * 0.03)
+            sales = int(rng.gauss(2_400_000, 450_000) * scale)
+            prescriptions = int(rng.gauss(120, 25) * scale)
+        yield line_no, {
+            'date': day.isoformat(),
+            'total_sales': max(sales, 0),
+            'prescription_count': max(prescriptions, 0),
+            'notes': '정기 휴무' if holiday and weekday == 6 else '',
+            'is_holiday': holiday,
+            'is_manual_holiday': holiday and weekday != 6,
+        }
+        day += datetime.timedelta(days=1)
+
+
+# ---------------------------------------------------------------- 요청 드라이버
+
+class TestClientDriver:
+    """Flask 테스트 클라이언트로 요청 (네트워크 없이 앱 코드만 측정)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.client = app.test_client()
+
+    def new(self):
+        return TestClientDriver(self.app)
+
+    def request(self, method, path, form=None, json_body=None, remote_addr='127.0.0.1'):
+        response = self.client.open(path, method=method, data=form, json=json_body,
+                                    environ_base={'REMOTE_ADDR': remote_addr})
+        response.get_data()  # 스트리밍 응답도 끝까지 소비
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """실행 중인 로컬 서버에 HTTP로 요청 (waitress + 소켓 비용 포함)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def new(self):
+        return HttpDriver(self.base_url)
+
+    def request(self, method, path, form=None, json_body=None, remote_addr=None):
+        data = None
+        headers = {}
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def start_local_server(app):
+    from waitress import create_server
+
+    server = create_server(app, host='127.0.0.1', port=0, threads=8, ident='PharmaDay')
+    threading.Thread(target=server.run, name='bench-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.effective_port}'
+
+
+# ---------------------------------------------------------------- 측정 항목
+
+def _random_day(rng, first, last):
+    return first + datetime.timedelta(days=rng.randrange((last - first).days + 1))
+
+
+def scenarios(first, last):
+    """(이름, 요청 생성 함수, 준비 함수 또는 None, 정상 상태 코드) 목록
+
+    요청 생성 함수는 (rng, index)를 받아 (method, path, form, json) 를 돌려준다.
+    같은 요청만 반복하면 결과 캐시만 측정하게 되므로 조회 구간은 매번 바꾼다.
+    """
+    future = last + datetime.timedelta(days=1)
+
+    def calendar_data(rng, i):
+        start = _random_day(rng, first, last)
+        return 'GET', f'/calendar-data?start={start}&end={start + datetime.timedelta(days=42)}', None, None
+
+    def report_page(rng, i):
+        return 'GET', f'/report?limit=100&after={_random_day(rng, first, last)}', None, None
+
+    def report_all(rng, i):
+        return 'GET', '/report', None, None
+
+    def monthly(rng, i):
+        day = _random_day(rng, first, last)
+        return 'GET', f'/report/monthly?year={day.year}&month={day.month}', None, None
+
+    def analyze_day(rng, i):
+        start = _random_day(rng, first, last)
+        end = min(start + datetime.timedelta(days=90), last)
+        return 'GET', f'/report/analyze?unit=day&start={start}&end={end}', None, None
+
+    def analyze_month(rng, i):
+        start = _random_day(rng, first, last)
+        return 'GET', f'/report/analyze?unit=month&start={start}&end={last}&include_saturday=false', None, None
+
+    def put_report(rng, i):
+        day = _random_day(rng, first, last)
+        body = {'total_sales': rng.randrange(1_000_000, 4_000_000), 'prescription_count': rng.randrange(50, 200),
+                'notes': '벤치마크'}
+        return 'PUT', f'/report/{day}', None, body
+
+    def delete_report(rng, i):
+        return 'DELETE', f'/report/{future + datetime.timedelta(days=i)}', None, None
+
+    def prepare_delete(driver, count):
+        # 삭제할 행은 데이터 구간 뒤쪽에 미리 만들어 둠 (측정에서 제외)
+        for i in range(count):
+            driver.request('PUT', f'/report/{future + datetime.timedelta(days=i)}',
+                           json_body={'total_sales': 1, 'prescription_count': 1})
+
+    def login(rng, i):
+        return 'POST', '/login', {'username': '1', 'password': '1'}, None
+
+    return [
+        ('GET /calendar-data', calendar_data, None, (200, 304)),
+        ('GET /report?limit=100', report_page, None, (200,)),
+        ('GET /report (전체)', report_all, None, (200,)),
+        ('GET /report/monthly', monthly, None, (200,)),
+        ('GET /report/analyze?unit=day', analyze_day, None, (200,)),
+        ('GET /report/analyze?unit=month', analyze_month, None, (200,)),
+        ('PUT /report/<date>', put_report, None, (200,)),
+        ('DELETE /report/<date>', delete_report, prepare_delete, (200,)),
+        ('POST /login', login, None, (302,)),
+    ]
+
+
+def peak_rss_mb():
+    """이 프로세스의 최대 상주 메모리(MB), 알 수 없으면 None"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return _windows_peak_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _windows_peak_rss_mb():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return round(counters.PeakWorkingSetSize / (1024 * 1024), 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def logged_in(driver):
+    client = driver.new()
+    client.request('POST', '/login', form={'username': '1', 'password': '1'})
+    return client
+
+
+def measure(driver, name, make_request, prepare, ok_statuses, count, concurrency, rng):
+    import analytics
+    from cache import report_cache
+
+    requests = [make_request(rng, i) for i in range(count)]
+    if prepare:
+        prepare(logged_in(driver), count)
+    report_cache.clear()
+
+    # 로그인 측정은 세션 없는 새 클라이언트로, 나머지는 로그인된 클라이언트로
+    fresh = name == 'POST /login'
+    local = threading.local()
+    latencies = [0.0] * count
+    errors = [0]
+    lock = threading.Lock()
+
+    def run(index):
+        if fresh:
+            client = driver.new()
+        else:
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = logged_in(driver)
+        method, path, form, body = requests[index]
+        started = time.perf_counter()
+        status = client.request(method, path, form=form, json_body=body, remote_addr=f'10.{index >> 8 & 255}.{index & 255}.1')
+        latencies[index] = (time.perf_counter() - started) * 1000
+        if status not in ok_statuses:
+            with lock:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(run, range(count)))
+    else:
+        for index in range(count):
+            run(index)
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'requests': count,
+        'errors': errors[0],
+        'p50_ms': round(analytics.percentile(ordered, 50), 3),
+        'p95_ms': round(analytics.percentile(ordered, 95), 3),
+        'p99_ms': round(analytics.percentile(ordered, 99), 3),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else 0,
+    }
+
+
+def run_worker(args):
+    """PHARMADAY_DB가 임시 파일로 지정된 하위 프로세스에서 실행"""
+    import auth
+    import bulk
+    import db
+
+    rng = random.Random(SEED + args.years)
+    started = time.perf_counter()
+    with db.connection() as conn:
+        seeded = bulk.import_records(conn, synthetic_records(args.years, rng))
+    seed_seconds = time.perf_counter() - started
+
+    # 로그인 측정이 시도 횟수 제한에 걸리지 않도록 제한을 풀어 둠 (해시 비용만 측정)
+    auth.ip_throttle = auth.TokenBucket(10 ** 9, 10 ** 9)
+    auth.username_throttle = auth.TokenBucket(10 ** 9, 10 ** 9)
+
+    from app import app
+
+    if args.server:
+        # 서버 스레드는 데몬이라 측정이 끝나면 프로세스와 함께 종료됨
+        driver = HttpDriver(start_local_server(app))
+    else:
+        driver = TestClientDriver(app)
+
+    results = {}
+    for name, make_request, prepare, ok_statuses in scenarios(seeded['first_date'], seeded['last_date']):
+        if args.only and not any(word in name for word in args.only):
+            continue
+        results[name] = measure(driver, name, make_request, prepare, ok_statuses,
+                                args.requests, args.concurrency, rng)
+
+    db.close_pool()
+    json.dump({
+        'rows': seeded['imported'],
+        'seed_seconds': round(seed_seconds, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'scenarios': results,
+    }, sys.stdout, ensure_ascii=False)
+    return 0
+
+
+# ---------------------------------------------------------------- 실행/비교
+
+def run_dataset(args, years):
+    with tempfile.TemporaryDirectory(prefix='pharmaday-bench-') as tmp:
+        env = dict(os.environ, PHARMADAY_DB=os.path.join(tmp, 'pharmaday.db'), PYTHONIOENCODING='utf-8')
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--years', str(years),
+                   '--requests', str(args.requests), '--concurrency', str(args.concurrency)]
+        if args.server:
+            command.append('--server')
+        for word in args.only or ():
+            command += ['--only', word]
+        completed = subprocess.run(command, env=env, cwd=BASE_DIR, stdout=subprocess.PIPE, check=True)
+    return json.loads(completed.stdout.decode('utf-8'))
+
+
+def mode_key(args):
+    return f"{'server' if args.server else 'client'}-c{args.concurrency}"
+
+
+def compare(current, baseline, tolerance):
+    """(항목, 기준값, 현재값) 회귀 목록"""
+    regressions = []
+    for years, dataset in current.items():
+        base = baseline.get(years)
+        if not base:
+            continue
+        for name, result in dataset['scenarios'].items():
+            old = base['scenarios'].get(name)
+            if not old:
+                continue
+            for metric in GATED_METRICS:
+                if result[metric] > max(old[metric] * tolerance, old[metric] + MIN_SLACK_MS):
+                    regressions.append((f'{years}년 {name} {metric}', old[metric], result[metric]))
+            if result['errors'] > old['errors']:
+                regressions.append((f'{years}년 {name} errors', old['errors'], result['errors']))
+        if dataset['peak_rss_mb'] and base.get('peak_rss_mb') and \
+                dataset['peak_rss_mb'] > base['peak_rss_mb'] * tolerance:
+            regressions.append((f'{years}년 peak_rss_mb', base['peak_rss_mb'], dataset['peak_rss_mb']))
+    return regressions
+
+
+def print_dataset(years, dataset):
+    print(f"\n[{years}년, {dataset['rows']}행, 적재 {dataset['seed_seconds']}초, "
+          f"최대 RSS {dataset['peak_rss_mb']}MB]")
+    print(f"  {'항목':<32}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'오류':>6}")
+    for name, r in dataset['scenarios'].items():
+        print(f"  {name:<32}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['throughput_rps']:>9.1f}{r['errors']:>6}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='PharmaDay 엔드포인트 벤치마크')
+    parser.add_argument('--years', type=int, nargs='+', default=list(DATASET_YEARS),
+                        help='합성 데이터 기간(년), 여러 개 지정 가능 (기본: 1 5 20)')
+    parser.add_argument('--requests', type=int, default=200, help='항목별 요청 수')
+    parser.add_argument('--concurrency', type=int, default=1, help='동시 클라이언트 수')
+    parser.add_argument('--server', action='store_true', help='테스트 클라이언트 대신 로컬 waitress 서버로 요청')
+    parser.add_argument('--only', action='append', help='이름에 이 문자열이 들어간 항목만 측정 (반복 가능)')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='기준값 파일')
+    parser.add_argument('--save', action='store_true', help='이번 결과를 기준값으로 저장')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='회귀로 볼 기준값 대비 배수 (기본: 2.0)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.worker:
+        args.years = args.years[0]
+        return run_worker(args)
+
+    current = {}
+    for years in args.years:
+        current[str(years)] = run_dataset(args, years)
+        print_dataset(years, current[str(years)])
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            stored = json.load(f)
+    key = mode_key(args)
+
+    if args.save:
+        stored.setdefault('modes', {}).setdefault(key, {}).update(current)
+        stored['environment'] = {'python': platform.python_version(), 'platform': platform.platform(),
+                                 'requests': args.requests}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f'\n기준값 저장: {args.baseline} ({key})')
+        return 0
+
+    baseline = stored.get('modes', {}).get(key)
+    if not baseline:
+        print(f'\n비교할 기준값이 없습니다 ({key}). --save로 먼저 저장하세요.')
+        return 0
+    regressions = compare(current, baseline, args.tolerance)
+    if not regressions:
+        print(f'\n기준값 대비 회귀 없음 ({key}, 허용 배수 {args.tolerance})')
+        return 0
+    print(f'\n기준값 대비 느려진 항목 ({key}, 허용 배수 {args.tolerance}):')
+    for name, old, new in regressions:
+        print(f'  {name}: {old} -> {new}')
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""daily_reports 대량 가져오기/내보내기
+
+CSV 또는 NDJSON(한 줄에 JSON 객체 하나)을 한 줄씩 읽어 일정 크기마다
+executemany + commit으로 반영하고, 내보내기는 행 묶음 단위로 생성(yield)한다.
+POS 이력 이전처럼 수천 일치 데이터를 한 번에 옮길 때 사용한다.
+"""
+import csv
+import datetime
+import io
+import json
+import sqlite3
+
+import queries
+
+FIELDS = ('date', 'total_sales', 'prescription_count', 'notes', 'is_holiday', 'is_manual_holiday')
+FORMATS = ('csv', 'ndjson')
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+BATCH_SIZE = 500
+
+_TRUE = ('1', 'true', 't', 'y', 'yes', 'o')
+_FALSE = ('', '0', 'false', 'f', 'n', 'no', 'x')
+
+
+def guess_format(name, content_type=None):
+    """파일 이름이나 Content-Type으로 형식 추정 (모르면 None)"""
+    if content_type:
+        content_type = content_type.split(';')[0].strip().lower()
+        for fmt, mimetype in MIMETYPES.items():
+            if content_type == mimetype:
+                return fmt
+        if content_type in ('application/jsonl', 'application/json-lines'):
+            return 'ndjson'
+    if name:
+        name = name.lower()
+        if name.endswith('.csv'):
+            return 'csv'
+        if name.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+    return None
+
+
+def iter_records(lines, fmt):
+    """(줄 번호, dict) 생성 - lines는 텍스트 줄 단위 반복자"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'ndjson':
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ValueError(f'{line_no}번째 줄: JSON 형식이 잘못되었습니다.')
+            if not isinstance(record, dict):
+                raise ValueError(f'{line_no}번째 줄: JSON 객체여야 합니다.')
+            yield line_no, record
+    else:
+        raise ValueError(f'지원하지 않는 형식입니다: {fmt}')
+
+
+def _to_int(value, default=0):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        raise ValueError
+    return int(str(value).replace(',', '')) if isinstance(value, str) else int(value)
+
+
+def _to_bool(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    if isinstance(value, (int, float)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError
+
+
+def to_params(record, line_no):
+    """가져오기 레코드 하나를 UPSERT_REPORT 파라미터로 변환 (잘못된 값이면 ValueError)"""
+    try:
+        date_obj = datetime.datetime.strptime(str(record.get('date') or '').strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{line_no}번째 줄: 날짜 형식이 잘못되었습니다. YYYY-MM-DD 형식이어야 합니다.')
+    if record.get('total_sales') in (None, ''):
+        raise ValueError(f'{line_no}번째 줄: total_sales 값이 없습니다.')
+    try:
+        return (
+            date_obj,
+            _to_int(record.get('total_sales')),
+            _to_int(record.get('prescription_count')),
+            record.get('notes') or '',
+            _to_bool(record.get('is_holiday')),
+            _to_bool(record.get('is_manual_holiday')),
+        )
+    except (TypeError, ValueError):
+        raise ValueError(f'{line_no}번째 줄: 숫자 또는 참/거짓 값이 잘못되었습니다.')
+
+
+def to_fields(record, label):
+    """부분 수정 레코드에서 들어 있는 필드만 골라 변환 ({필드: 값}, 잘못된 값이면 ValueError)"""
+    fields = {}
+    try:
+        for name in FIELDS[1:]:
+            if name not in record:
+                continue
+            value = record[name]
+            if name in ('total_sales', 'prescription_count'):
+                fields[name] = _to_int(value)
+            elif name == 'notes':
+                fields[name] = '' if value is None else str(value)
+            else:
+                fields[name] = _to_bool(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{label}: 숫자 또는 참/거짓 값이 잘못되었습니다.')
+    unknown = set(record) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"{label}: 알 수 없는 항목입니다: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def import_records(conn, records, batch_size=BATCH_SIZE):
+    """레코드를 batch_size개씩 묶어 반영하고 반영한 건수와 날짜 범위를 반환
+
+    잘못된 줄을 만나면 그 묶음은 반영하지 않고 ValueError를, 보관된 연도처럼 DB가 거부한 묶음은
+    그 묶음의 날짜 범위를 덧붙인 sqlite3.IntegrityError를 올린다
+    (앞서 커밋된 묶음은 유지되며 같은 파일을 다시 가져와도 결과는 같다).
+    """
+    result = {'imported': 0, 'batches': 0, 'first_date': None, 'last_date': None}
+    cur = conn.cursor()
+    batch = []
+
+    def flush():
+        dates = [params[0] for params in batch]
+        try:
+            cur.executemany(queries.UPSERT_REPORT, batch)
+        except sqlite3.IntegrityError as e:
+            raise sqlite3.IntegrityError(f"{e} ({result['batches'] + 1}번째 묶음, "
+                                         f"{min(dates)} ~ {max(dates)})") from e
+        conn.commit()
+        if result['first_date'] is None or min(dates) < result['first_date']:
+            result['first_date'] = min(dates)
+        if result['last_date'] is None or max(dates) > result['last_date']:
+            result['last_date'] = max(dates)
+        result['imported'] += len(batch)
+        result['batches'] += 1
+        batch.clear()
+
+    try:
+        for line_no, record in records:
+            batch.append(to_params(record, line_no))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        cur.close()
+    return result
+
+
+def export_chunks(conn, fmt, start=None, end=None, chunk_size=BATCH_SIZE):
+    """[start, end) 구간을 날짜순으로 CSV/NDJSON 텍스트 조각으로 생성"""
+    cur = conn.cursor()
+    cur.execute(queries.EXPORT_RANGE, (start or datetime.date.min, end or datetime.date.max))
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(buffer, lineterminator='\n')
+        buffer.write('\ufeff')  # 엑셀에서 한글이 깨지지 않도록 BOM
+        writer.writerow(FIELDS)
+
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                values = (str(row['date']), row['total_sales'], row['prescription_count'], row['notes'] or '',
+                          bool(row['is_holiday']), bool(row['is_manual_holiday']))
+                if writer:
+                    writer.writerow(values[:4] + tuple(int(v) for v in values[4:]))
+                else:
+                    buffer.write(json.dumps(dict(zip(FIELDS, values)), ensure_ascii=False))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        cur.close()
@@ -0,0 +1,106 @@
+"""조회 결과 캐시
+
+분석/월별/달력 응답을 직렬화된 바이트 그대로 LRU + TTL로 보관한다.
+각 항목은 결과에 영향을 주는 날짜 구간을 함께 기록하고, 정산 정보가
+바뀌면 그 날짜와 겹치는 항목만 지운다. 다른 프로세스(manage.py import 등)의
+쓰기는 이 무효화를 거치지 않으므로 항목마다 만들 때의 데이터 버전(report_meta)을
+두고, 조회 시 버전이 다르면 없는 것(miss)으로 본다.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get('PHARMADAY_CACHE_SIZE', '256'))
+CACHE_TTL = float(os.environ.get('PHARMADAY_CACHE_TTL', '600'))
+
+ALL_DATES = (datetime.date.min, datetime.date.max)
+
+
+class ResultCache:
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, lo, hi, value, version)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    def generation(self):
+        """조회 시작 전에 받아 두었다가 put()에 넘기면, 그 사이 쓰기가 있었을 때 저장을 건너뜀"""
+        return self._generation
+
+    def get(self, key, version=None):
+        """저장된 값 (없거나 만료됐거나 version이 만들 때와 다르면 None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if version is not None and entry[4] != version:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def put(self, key, value, date_range=ALL_DATES, generation=None, version=None):
+        lo, hi = date_range
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, lo or datetime.date.min, hi or datetime.date.max,
+                                  value, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, lo, hi=None):
+        """[lo, hi] 구간(양끝 포함)과 겹치는 항목 삭제"""
+        hi = hi or lo
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if entry[1] <= hi and lo <= entry[2]]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'stale': self.stale,
+            }
+
+
+report_cache = ResultCache()
@@ -0,0 +1,153 @@
+"""정산 변경 알림 (Server-Sent Events)
+
+저장/삭제가 일어나면 날짜별 변경 내용을 최근 기록에 쌓고, /report/events에
+연결된 달력들이 이를 받아 해당 날짜 이벤트만 고친다. 재연결 시 브라우저가
+보내는 Last-Event-ID 이후 기록을 다시 보내고, 기록 범위를 벗어났으면
+전체 다시 불러오기(reload)를 알린다.
+
+변경은 지점 번호와 함께 기록하고, 각 연결은 자기 지점의 변경만 받는다.
+
+SSE 연결은 서버 스레드를 하나씩 계속 차지하므로 지점마다 동시 연결 수를 제한하고
+(PHARMADAY_EVENT_STREAMS, 기본 8 - 카운터 PC·태블릿 수보다 넉넉히), 일정 시간마다
+연결을 끊어 브라우저가 다시 붙도록 한다. server.py는 일반 요청용 --threads와 별도로
+시작할 때의 지점 수 × 지점당 연결 수만큼 스레드를 더 두고 전 지점 합계를 그 수로 묶으므로,
+알림 연결이 가득 차도 일반 요청 스레드는 줄지 않는다.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+HISTORY_SIZE = 500
+STREAMS_PER_STORE = int(os.environ.get('PHARMADAY_EVENT_STREAMS', '8'))
+HEARTBEAT_SECONDS = 15
+STREAM_SECONDS = 300
+RETRY_MS = 3000
+
+
+class ChangeFeed:
+    def __init__(self, history_size=HISTORY_SIZE, streams_per_store=STREAMS_PER_STORE):
+        self.streams_per_store = streams_per_store
+        self.max_streams = None   # 전 지점 합계 상한 (reserve_threads 전에는 지점별 제한만)
+        self._history = deque(maxlen=history_size)  # (seq, kind, data json, 지점 번호)
+        self._seq = 0
+        self._streams = {}        # 지점 번호 -> 열린 연결 수
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, kind, data, store_id):
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        with self._cond:
+            self._seq += 1
+            self._history.append((self._seq, kind, payload, store_id))
+            self._cond.notify_all()
+
+    def publish_date(self, day, event, store_id):
+        """한 날짜의 변경 (event가 None이면 삭제)"""
+        self.publish('report', {'date': str(day), 'event': event}, store_id)
+
+    def publish_range(self, first=None, last=None, store_id=None):
+        """여러 날짜가 한꺼번에 바뀜 - 해당 구간을 다시 불러오도록 알림 (None이면 전체)"""
+        self.publish('reload', {'first': str(first) if first else None, 'last': str(last) if last else None},
+                     store_id)
+
+    def last_id(self):
+        with self._cond:
+            return self._seq
+
+    def reserve_threads(self, store_count):
+        """알림 연결용으로 따로 둘 서버 스레드 수를 정해 반환 (전 지점 합계 상한이 됨)
+
+        시작 뒤 추가된 지점은 이 안에서 빈 자리가 있을 때만 연결을 받는다.
+        """
+        self.max_streams = self.streams_per_store * max(store_count, 1)
+        return self.max_streams
+
+    def open_stream(self, store_id):
+        """store_id 지점의 연결 자리를 하나 차지 (지점 또는 전체가 가득 찼으면 False)"""
+        with self._cond:
+            if self._closed or self._streams.get(store_id, 0) >= self.streams_per_store:
+                return False
+            if self.max_streams is not None and self._total >= self.max_streams:
+                return False
+            self._streams[store_id] = self._streams.get(store_id, 0) + 1
+            self._total += 1
+            return True
+
+    def close_stream(self, store_id):
+        with self._cond:
+            self._streams[store_id] -= 1
+            self._total -= 1
+
+    def wait(self, after, timeout, store_id):
+        """(현재 번호, after 이후 store_id 지점의 기록 목록) - 없으면 timeout까지 대기, 종료 중이면 None
+
+        after가 기록 범위보다 오래되었거나 (서버 재시작으로) 현재 번호보다 크면
+        빠진 변경이 있으므로 reload 하나를 돌려준다.
+        """
+        reload = '{"first":null,"last":null}'
+        with self._cond:
+            if not self._closed and after > self._seq:
+                return self._seq, [(self._seq, 'reload', reload, store_id)]
+            if not self._closed and self._seq <= after:
+                self._cond.wait(timeout)
+            if self._closed:
+                return None
+            if self._seq <= after:
+                return self._seq, []
+            if after < self._history[0][0] - 1:
+                return self._seq, [(self._seq, 'reload', reload, store_id)]
+            return self._seq, [item for item in self._history if item[0] > after and item[3] == store_id]
+
+    def stream(self, after, store_id):
+        """SSE 응답 본문 (open_stream(store_id)가 True일 때만 사용, 끝나거나 닫히면 자리 반납)"""
+        return EventStream(self, after, store_id)
+
+    def _events(self, after, store_id):
+        yield f'retry: {RETRY_MS}\n\n'
+        deadline = time.monotonic() + STREAM_SECONDS
+        while time.monotonic() < deadline:
+            result = self.wait(after, HEARTBEAT_SECONDS, store_id)
+            if result is None:
+                break
+            seq, items = result
+            if seq == after:
+                # 끊어진 연결은 쓰기가 실패해야 알 수 있으므로 주기적으로 주석 전송
+                yield ': ping\n\n'
+                continue
+            for item_seq, kind, payload, _ in items:
+                yield f'id: {item_seq}\nevent: {kind}\ndata: {payload}\n\n'
+            # 다른 지점의 변경만 있었으면 보낼 것 없이 번호만 넘김
+            after = seq
+
+    def close(self):
+        """서버 종료 시 열린 연결을 모두 끝냄"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class EventStream:
+    """응답 본문이 시작되기 전에 연결이 끊겨도 close()에서 자리를 반납하도록 감싼 반복자"""
+
+    def __init__(self, feed, after, store_id):
+        self._feed = feed
+        self._after = after
+        self._store_id = store_id
+        self._released = False
+
+    def __iter__(self):
+        try:
+            yield from self._feed._events(self._after, self._store_id)
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._feed.close_stream(self._store_id)
+
+
+feed = ChangeFeed()
@@ -1,7 +1,17 @@
 import sqlite3
 import os
 import datetime
+import logging
 import sys
+import queue
+import threading
+from contextlib import contextmanager
+
+import holidays
+import rollups
+import metrics
+import search
+import archive
 
 # PyInstaller 경로 대응
 if getattr(sys, 'frozen', False):
@@ -9,7 +19,10 @@ if getattr(sys, 'frozen', False):
 else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-DB_FILE = os.path.join(BASE_DIR, 'pharmaday.db')
+# PHARMADAY_DB로 다른 파일을 지정할 수 있음 (벤치마크용 임시 DB 등)
+DB_FILE = os.environ.get('PHARMADAY_DB') or os.path.join(BASE_DIR, 'pharmaday.db')
+
+logger = logging.getLogger(__name__)
 
 def dict_factory(cursor, row):
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
@@ -32,18 +45,223 @@ def convert_datetime(val):
     except (ValueError, AttributeError):
         return val
 
-def get_connection():
-    sqlite3.register_adapter(datetime.date, adapt_date)
-    sqlite3.register_converter('DATE', convert_date)
-    sqlite3.register_adapter(datetime.datetime, adapt_datetime)
-    sqlite3.register_converter('DATETIME', convert_datetime)
-    conn = sqlite3.connect(DB_FILE, detect_types=sqlite3.PARSE_DECLTYPES)
+sqlite3.register_adapter(datetime.date, adapt_date)
+sqlite3.register_converter('DATE', convert_date)
+sqlite3.register_adapter(datetime.datetime, adapt_datetime)
+sqlite3.register_converter('DATETIME', convert_datetime)
+
+# 커넥션 풀 설정 (동시에 여러 카운터 PC가 접속해도 재사용)
+POOL_SIZE = int(os.environ.get('PHARMADAY_DB_POOL_SIZE', '8'))
+BUSY_TIMEOUT_MS = 5000
+
+PRAGMAS = (
+    ('synchronous', 'NORMAL'),    # WAL 모드에서는 NORMAL로도 충분히 안전
+    ('cache_size', -16000),       # 약 16MB 페이지 캐시
+    ('mmap_size', 64 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', BUSY_TIMEOUT_MS),
+)
+
+# _create_schema()를 바꾸면 1씩 올림 (DB의 PRAGMA user_version과 비교해 이전 여부 결정)
+SCHEMA_VERSION = 4
+
+# 지점별 DB: 1번(본점)은 DB_FILE이 중앙 DB(계정·지점 목록)를 겸하고,
+# 나머지 지점은 STORES_DIR 아래 자기 파일에 정산 데이터만 둔다.
+DEFAULT_STORE_ID = 1
+STORES_DIR = os.environ.get('PHARMADAY_STORES_DIR') or os.path.join(BASE_DIR, 'stores')
+
+
+class UnknownStore(LookupError):
+    """stores 테이블에 없는 지점"""
+
+
+class _Shard:
+    """DB 파일 하나의 커넥션 풀과 초기화 상태"""
+
+    def __init__(self, path, central):
+        self.path = path
+        self.central = central
+        self.pool = queue.LifoQueue(maxsize=POOL_SIZE)
+        self.lock = threading.RLock()  # 스키마 확인 중에 WAL 설정도 같은 락을 씀
+        self.schema_ready = False
+        self.wal_enabled = False
+        self.archive_versions = {}  # id(커넥션) -> 보관 파일을 ATTACH할 때의 schema_version
+
+
+_shards = {}
+_shards_lock = threading.Lock()
+
+
+def store_path(db_file):
+    """stores.db_file(STORES_DIR 기준 상대 경로 또는 절대 경로) → 파일 경로"""
+    return db_file if os.path.isabs(db_file) else os.path.join(STORES_DIR, db_file)
+
+
+def _shard(store_id):
+    shard = _shards.get(store_id)
+    if shard is not None:
+        return shard
+    if store_id == DEFAULT_STORE_ID:
+        path = DB_FILE
+    else:
+        # 다른 프로세스(manage.py stores add)에서 추가한 지점도 처음 쓸 때 찾음
+        with connection() as conn:
+            row = conn.execute('SELECT db_file FROM stores WHERE id = ?', (store_id,)).fetchone()
+        if row is None or not row['db_file']:
+            raise UnknownStore(store_id)
+        path = store_path(row['db_file'])
+    with _shards_lock:
+        return _shards.setdefault(store_id, _Shard(path, central=store_id == DEFAULT_STORE_ID))
+
+
+def shard_path(store_id):
+    """지점 DB 파일 경로"""
+    return _shard(store_id).path
+
+
+def _enable_wal(shard, conn):
+    # journal_mode는 DB 파일에 저장되므로 파일마다 프로세스당 한 번만 설정
+    with shard.lock:
+        if not shard.wal_enabled:
+            conn.execute('PRAGMA journal_mode=WAL')
+            shard.wal_enabled = True
+
+def get_connection(store_id=DEFAULT_STORE_ID):
+    shard = _shard(store_id)
+    if not shard.central:
+        os.makedirs(os.path.dirname(shard.path), exist_ok=True)
+    conn = sqlite3.connect(shard.path, detect_types=sqlite3.PARSE_DECLTYPES,
+                           timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, uri=True,
+                           cached_statements=256,
+                           factory=metrics.TimedConnection if metrics.ENABLED else sqlite3.Connection)
     conn.row_factory = sqlite3.Row
+    _enable_wal(shard, conn)
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name}={value}')
     return conn
 
-def init_db():
-    conn = get_connection()
-    cur = conn.cursor()
+def _release(shard, conn):
+    try:
+        shard.pool.put_nowait(conn)
+    except queue.Full:
+        shard.archive_versions.pop(id(conn), None)
+        conn.close()
+
+def _attach_archives(shard, conn):
+    # 보관 연도가 바뀌면 차단 트리거를 바꾸므로 schema_version이 오름 - 그때만 ATTACH/VIEW를 다시 만듦
+    version = conn.execute('PRAGMA schema_version').fetchone()[0]
+    if shard.archive_versions.get(id(conn)) != version:
+        try:
+            archive.attach(conn)
+        except archive.ArchiveError as e:
+            # 파일 하나가 없어도 로그인·다른 연도 조회와 복구 명령은 되도록 그 연도만 빼고 연결
+            logger.error('%s', e)
+            archive.attach(conn, missing_ok=True)
+        shard.archive_versions[id(conn)] = version
+
+@contextmanager
+def connection(store_id=DEFAULT_STORE_ID):
+    """지점 DB 풀에서 커넥션을 빌려 사용 후 반납 (정상 종료 시 commit, 예외 시 rollback)
+
+    계정·지점 목록은 중앙 DB에 있으므로 store_id 없이 부른다.
+    """
+    shard = _shard(store_id)
+    if not shard.schema_ready:
+        init_db(store_id)
+    try:
+        conn = shard.pool.get_nowait()
+    except queue.Empty:
+        conn = get_connection(store_id)
+
+    try:
+        _attach_archives(shard, conn)
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        _release(shard, conn)
+
+def close_pool():
+    with _shards_lock:
+        shards = list(_shards.values())
+    for shard in shards:
+        while True:
+            try:
+                shard.pool.get_nowait().close()
+            except queue.Empty:
+                break
+        shard.archive_versions.clear()
+
+def get_reports_version(cur):
+    """daily_reports 변경 버전과 마지막 수정 시각(UTC)을 반환"""
+    cur.execute('SELECT version, modified_at FROM report_meta WHERE id = 1')
+    row = cur.fetchone()
+    if row is None:
+        return 0, None
+    modified_at = row['modified_at']
+    if isinstance(modified_at, str):
+        modified_at = convert_datetime(modified_at.encode())
+    return row['version'], modified_at
+
+def _add_column(cur, table, name, ddl):
+    cur.execute(f'PRAGMA table_xinfo({table})')
+    if name not in [row['name'] for row in cur.fetchall()]:
+        cur.execute(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}')
+
+def init_db(store_id=DEFAULT_STORE_ID):
+    """스키마가 SCHEMA_VERSION보다 오래되었으면 생성/이전 (DB 파일마다 프로세스당 한 번) - 실행했으면 True
+
+    import 시점이 아니라 첫 connection() 또는 서버 시작 단계에서 호출된다.
+    이미 최신이면 PRAGMA user_version 하나만 읽고 DDL과 기본 계정 확인은 건너뛴다.
+    """
+    shard = _shard(store_id)
+    with shard.lock:
+        if shard.schema_ready:
+            return False
+        conn = get_connection(store_id)
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            migrated = version < SCHEMA_VERSION
+            if migrated:
+                try:
+                    _create_schema(conn.cursor(), shard.central)
+                    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                    conn.commit()
+                    # DDL은 보관 파일 없이 실행했으므로 요약 테이블은 보관분까지 포함해 다시 계산
+                    if archive.registered(conn):
+                        archive.attach(conn)
+                        rollups.rebuild(conn.cursor())
+                        conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+            shard.schema_ready = True
+        finally:
+            _release(shard, conn)
+        return migrated
+
+def _record_change_sql(ref, deleted, condition='1'):
+    return f"""
+        INSERT INTO report_changes (date, version, deleted)
+        SELECT {ref}.date, version, {deleted} FROM report_meta WHERE id = 1 AND {condition}
+        ON CONFLICT(date) DO UPDATE SET version = excluded.version, deleted = excluded.deleted;
+    """
+
+def _meta_trigger_bodies():
+    return {
+        'insert': _record_change_sql('NEW', 0),
+        # 날짜 자체가 바뀌면 예전 날짜는 삭제로 기록 (버전은 기록마다 달라야 키셋 페이지가 맞음)
+        'update': _record_change_sql('OLD', 1, 'OLD.date IS NOT NEW.date') + '''
+            UPDATE report_meta SET version = version + 1 WHERE id = 1 AND OLD.date IS NOT NEW.date;
+        ''' + _record_change_sql('NEW', 0),
+        'delete': _record_change_sql('OLD', 1),
+    }
+
+def _create_schema(cur, central=True):
 
     # Create daily_reports table
     cur.execute('''
@@ -58,6 +276,86 @@ def init_db():
         )
     ''')
 
+    # 요일(0=일요일) 가상 컬럼: 요일 제외 조건을 인덱스에서 바로 거르기 위함
+    _add_column(cur, 'daily_reports', 'weekday',
+                "INTEGER GENERATED ALWAYS AS (CAST(strftime('%w', date) AS INTEGER)) VIRTUAL")
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_daily_reports_date_weekday ON daily_reports(date, weekday)')
+
+    # 변경 추적용 메타 테이블 (달력 ETag / Last-Modified 계산용)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS report_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0,
+            modified_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('INSERT OR IGNORE INTO report_meta (id, version) VALUES (1, 0)')
+
+    # 날짜별 마지막 변경 버전과 삭제 표시 (증분 동기화 /report/changes 용)
+    cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'report_changes'")
+    changes_created = cur.fetchone()[0] == 0
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS report_changes (
+            date DATE PRIMARY KEY,
+            version INTEGER NOT NULL,
+            deleted BOOLEAN NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_report_changes_version ON report_changes(version)')
+    if changes_created:
+        # 버전 증가와 변경 기록은 한 트리거 안에서 순서대로 처리해야 하므로 예전 트리거를 교체
+        for event in ('insert', 'update', 'delete'):
+            cur.execute(f'DROP TRIGGER IF EXISTS daily_reports_meta_{event}')
+        # 기존 행에도 서로 다른 버전을 매겨 둠
+        cur.execute('''
+            INSERT INTO report_changes (date, version, deleted)
+            SELECT date, (SELECT version FROM report_meta WHERE id = 1) + ROW_NUMBER() OVER (ORDER BY date), 0
+            FROM daily_reports
+        ''')
+        cur.execute('''
+            UPDATE report_meta SET version = version + (SELECT COUNT(*) FROM daily_reports) WHERE id = 1
+        ''')
+    for event, body in _meta_trigger_bodies().items():
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS daily_reports_meta_{event}
+            AFTER {event.upper()} ON daily_reports
+            BEGIN
+                UPDATE report_meta
+                SET version = version + 1, modified_at = CURRENT_TIMESTAMP
+                WHERE id = 1;
+                {body}
+            END
+        ''')
+
+    # 법정 공휴일 표 (요약 테이블 트리거가 참조하므로 먼저 생성)
+    holidays.ensure_schema(cur)
+
+    # 월/주 단위 요약 테이블 (분석 화면용)
+    rollups.ensure_schema(cur)
+
+    # 메모 전문 검색 색인 (/report/search)
+    search.ensure_schema(cur)
+
+    # 지난 연도 보관 파일 목록
+    archive.ensure_schema(cur)
+
+    if not central:
+        cur.close()
+        return
+
+    # 지점 목록 (1번 본점은 중앙 DB 자체, 나머지는 STORES_DIR 아래 파일)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS stores (
+            id INTEGER PRIMARY KEY,
+            code TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            db_file TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute("INSERT OR IGNORE INTO stores (id, code, name, db_file) VALUES (?, 'main', '본점', NULL)",
+                (DEFAULT_STORE_ID,))
+
     # Create users table
     cur.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -68,21 +366,20 @@ def init_db():
         )
     ''')
 
-    # 기본 계정 삽입
+    # 소속 지점 (NULL이면 모든 지점을 보는 본사 계정, 기존 계정은 본점)
+    _add_column(cur, 'users', 'store_id', f'INTEGER DEFAULT {DEFAULT_STORE_ID}')
+
+    # 기본 계정 삽입 (users가 비어 있는 첫 실행에만 해시 계산)
     cur.execute('SELECT COUNT(*) FROM users')
     if cur.fetchone()[0] == 0:
-        from passlib.hash import pbkdf2_sha256
+        from auth import get_password_context
+        password_context = get_password_context()
         accounts = [
-            ('1', pbkdf2_sha256.hash('1')),
-            ('pharmmaker', pbkdf2_sha256.hash('pharmmaker123'))
+            ('1', password_context.hash('1')),
+            ('pharmmaker', password_context.hash('pharmmaker123'))
         ]
         for username, hashval in accounts:
             cur.execute('SELECT * FROM users WHERE username = ?', (username,))
             if not cur.fetchone():
                 cur.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)', (username, hashval))
-
-    conn.commit()
-    conn.close()
-
-# 앱 실행 시 자동 DB 초기화
-init_db()
+    cur.close()
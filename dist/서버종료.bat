@@ -1,5 +1,11 @@
 @echo off
 chcp 65001 > nul
 
+rem 처리 중인 요청을 마친 뒤 종료하도록 요청하고, 응답이 없을 때만 강제 종료
+rem 종료 비밀값은 서버가 시작할 때 DB 옆 shutdown.token에 써 둠
+if not exist "%~dp0shutdown.token" goto kill
+set /p TOKEN=<"%~dp0shutdown.token"
+curl -s -f -m 15 -X POST -H "X-Shutdown-Token: %TOKEN%" http://127.0.0.1:5000/shutdown > nul 2>&1
+if not errorlevel 1 goto :eof
+:kill
 taskkill /F /IM "데이터서버.exe"
-
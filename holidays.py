@@ -0,0 +1,336 @@
+"""대한민국 공휴일 표
+
+양력 공휴일, 음력 공휴일(설날·부처님오신날·추석), 대체공휴일을 계산해
+holidays 테이블에 미리 넣어 둔다. 분석의 휴일 제외와 달력 음영은 이 표와
+SQL로 조인하므로 직원이 공휴일마다 휴일 표시를 할 필요가 없다.
+
+음력 날짜는 인터넷 없이 계산한다. 합삭(신월)과 중기(태양 황경 30° 배수) 시각을
+천문 계산식(Meeus, Astronomical Algorithms 25·49장)으로 구해 한국 표준시(UTC+9)
+날짜로 바꾸고, 동지가 든 달을 11월로 하여 달 번호와 윤달을 정한다.
+선거일·임시공휴일처럼 미리 알 수 없는 날은 지금처럼 정산 화면에서 휴일로 표시한다.
+
+    python manage.py holidays --start 2000 --end 2040
+    python manage.py holidays --show 2025
+"""
+import datetime
+import math
+import os
+
+import rollups
+
+# 처음 표를 만들 때 채울 기본 범위 (PHARMADAY_HOLIDAY_YEARS=2000-2040 형식으로 변경 가능)
+_years = os.environ.get('PHARMADAY_HOLIDAY_YEARS', '')
+if '-' in _years:
+    FIRST_YEAR, LAST_YEAR = (int(value) for value in _years.split('-', 1))
+else:
+    FIRST_YEAR, LAST_YEAR = 2000, datetime.date.today().year + 10
+
+KST = datetime.timedelta(hours=9)
+J2000 = 2451545.0
+UNIX_EPOCH_JD = 2440587.5
+SYNODIC_MONTH = 29.530588861
+
+# (월, 일, 이름, 대체공휴일 종류, 시작 연도, 마지막 연도)
+SOLAR_HOLIDAYS = (
+    (1, 1, '신정', None, None, None),
+    (3, 1, '삼일절', 'weekend', None, None),
+    (4, 5, '식목일', None, None, 2005),
+    (5, 5, '어린이날', 'weekend', None, None),
+    (6, 6, '현충일', None, None, None),
+    (7, 17, '제헌절', None, None, 2007),
+    (8, 15, '광복절', 'weekend', None, None),
+    (10, 3, '개천절', 'weekend', None, None),
+    (10, 9, '한글날', 'weekend', None, 2005),
+    (10, 9, '한글날', 'weekend', 2013, None),
+    (12, 25, '성탄절', 'weekend', None, None),
+)
+
+# 대체공휴일 적용 시작일 (관공서의 공휴일에 관한 규정 개정 시행일)
+SUBSTITUTE_SINCE = {
+    '설날': datetime.date(2014, 1, 1),
+    '추석': datetime.date(2014, 1, 1),
+    '어린이날': datetime.date(2014, 1, 1),
+    '삼일절': datetime.date(2021, 8, 4),
+    '광복절': datetime.date(2021, 8, 4),
+    '개천절': datetime.date(2021, 8, 4),
+    '한글날': datetime.date(2021, 8, 4),
+    '부처님오신날': datetime.date(2023, 5, 4),
+    '성탄절': datetime.date(2023, 5, 4),
+}
+
+SUNDAY, SATURDAY = 6, 5
+
+
+# ---------------------------------------------------------------- 천문 계산
+
+def _sin(degrees):
+    return math.sin(math.radians(degrees))
+
+
+def _delta_t_days(year):
+    """지구 자전 보정 ΔT (TT - UT, 일 단위, Espenak·Meeus 근사식)"""
+    t = year - 2000
+    if year < 2005:
+        seconds = 63.86 + 0.3345 * t - 0.060374 * t ** 2 + 0.0017275 * t ** 3 + 0.000651814 * t ** 4 \
+            + 0.00002373599 * t ** 5
+    elif year < 2050:
+        seconds = 62.92 + 0.32217 * t + 0.005589 * t ** 2
+    else:
+        seconds = -20 + 32 * ((year - 1820) / 100) ** 2 - 0.5628 * (2150 - year)
+    return seconds / 86400
+
+
+def _kst_date(jde):
+    """역학시(JDE) → 한국 표준시 날짜"""
+    year = 2000 + (jde - J2000) / 365.25
+    jd_ut = jde - _delta_t_days(year)
+    moment = datetime.datetime(1970, 1, 1) + datetime.timedelta(days=jd_ut - UNIX_EPOCH_JD)
+    return (moment + KST).date()
+
+
+_NEW_MOON_TERMS = (
+    # (계수, E 차수, M, M', F, Ω 배수)
+    (-0.40720, 0, 0, 1, 0, 0), (0.17241, 1, 1, 0, 0, 0), (0.01608, 0, 0, 2, 0, 0),
+    (0.01039, 0, 0, 0, 2, 0), (0.00739, 1, -1, 1, 0, 0), (-0.00514, 1, 1, 1, 0, 0),
+    (0.00208, 2, 2, 0, 0, 0), (-0.00111, 0, 0, 1, -2, 0), (-0.00057, 0, 0, 1, 2, 0),
+    (0.00056, 1, 1, 2, 0, 0), (-0.00042, 0, 0, 3, 0, 0), (0.00042, 1, 1, 0, 2, 0),
+    (0.00038, 1, 1, 0, -2, 0), (-0.00024, 1, -1, 2, 0, 0), (-0.00017, 0, 0, 0, 0, 1),
+    (-0.00007, 0, 2, 1, 0, 0), (0.00004, 0, 0, 2, -2, 0), (0.00004, 0, 3, 0, 0, 0),
+    (0.00003, 0, 1, 1, -2, 0), (0.00003, 0, 0, 2, 2, 0), (-0.00003, 0, 1, 1, 2, 0),
+    (0.00003, 0, -1, 1, 2, 0), (-0.00002, 0, -1, 1, -2, 0), (-0.00002, 0, 1, 3, 0, 0),
+    (0.00002, 0, 0, 4, 0, 0),
+)
+
+_PLANETARY_TERMS = (
+    # (계수, 기준각, k 계수)
+    (0.000325, 299.77, 0.107408), (0.000165, 251.88, 0.016321), (0.000164, 251.83, 26.651886),
+    (0.000126, 349.42, 36.412478), (0.000110, 84.66, 18.206239), (0.000062, 141.74, 53.303771),
+    (0.000060, 207.14, 2.453732), (0.000056, 154.84, 7.306860), (0.000047, 34.52, 27.261239),
+    (0.000042, 207.19, 0.121824), (0.000040, 291.34, 1.844379), (0.000037, 161.72, 24.198154),
+    (0.000035, 239.56, 25.513099), (0.000023, 331.55, 3.592518),
+)
+
+
+def new_moon_jde(k):
+    """k번째 합삭 시각 (k=0은 2000년 1월 6일 합삭, 역학시 JDE)"""
+    t = k / 1236.85
+    jde = (2451550.09766 + SYNODIC_MONTH * k + 0.00015437 * t ** 2
+           - 0.000000150 * t ** 3 + 0.00000000073 * t ** 4)
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    sun = 2.5534 + 29.10535670 * k - 0.0000014 * t ** 2 - 0.00000011 * t ** 3
+    moon = (201.5643 + 385.81693528 * k + 0.0107582 * t ** 2 + 0.00001238 * t ** 3
+            - 0.000000058 * t ** 4)
+    latitude = (160.7108 + 390.67050284 * k - 0.0016118 * t ** 2 - 0.00000227 * t ** 3
+                + 0.000000011 * t ** 4)
+    node = 124.7746 - 1.56375588 * k + 0.0020672 * t ** 2 + 0.00000215 * t ** 3
+
+    for coefficient, e_power, m, m_moon, f, o in _NEW_MOON_TERMS:
+        jde += coefficient * e ** e_power * _sin(m * sun + m_moon * moon + f * latitude + o * node)
+    jde += _PLANETARY_TERMS[0][0] * _sin(299.77 + 0.107408 * k - 0.009173 * t ** 2)
+    for coefficient, base, rate in _PLANETARY_TERMS[1:]:
+        jde += coefficient * _sin(base + rate * k)
+    return jde
+
+
+def solar_longitude(jde):
+    """태양의 겉보기 황경 (도, 약 0.01° 정확도)"""
+    t = (jde - J2000) / 36525
+    mean_longitude = 280.46646 + 36000.76983 * t + 0.0003032 * t ** 2
+    anomaly = 357.52911 + 35999.05029 * t - 0.0001537 * t ** 2
+    center = ((1.914602 - 0.004817 * t - 0.000014 * t ** 2) * _sin(anomaly)
+              + (0.019993 - 0.000101 * t) * _sin(2 * anomaly) + 0.000289 * _sin(3 * anomaly))
+    node = 125.04 - 1934.136 * t
+    return (mean_longitude + center - 0.00569 - 0.00478 * _sin(node)) % 360
+
+
+def solar_term_jde(longitude, near_jde):
+    """near_jde 근처에서 태양 황경이 longitude가 되는 시각"""
+    jde = near_jde
+    for _ in range(50):
+        delta = (longitude - solar_longitude(jde) + 180) % 360 - 180
+        jde += delta / 0.98564736
+        if abs(delta) < 1e-7:
+            break
+    return jde
+
+
+def _winter_solstice(year):
+    return solar_term_jde(270, 2451545.0 + (datetime.date(year, 12, 22) - datetime.date(2000, 1, 1)).days)
+
+
+def _new_moons_between(start_jde, end_jde):
+    """[start, end] 구간을 덮는 합삭 시각 목록 (앞뒤로 한 개씩 여유)"""
+    k = math.floor((start_jde - 2451550.09766) / SYNODIC_MONTH) - 1
+    moons = []
+    while True:
+        jde = new_moon_jde(k)
+        moons.append(jde)
+        if jde > end_jde:
+            return moons
+        k += 1
+
+
+def lunar_months(year):
+    """year 음력 1~12월(윤달 포함)의 {(월, 윤달 여부): 양력 초하루}
+
+    전년 동지가 든 달(11월)부터 올해 동지가 든 달 직전까지를 한 해(세)로 보고,
+    그 사이 달이 13개면 중기가 없는 첫 달을 윤달로 둔다.
+    """
+    solstice_before = _winter_solstice(year - 1)
+    solstice_after = _winter_solstice(year)
+    moons = _new_moons_between(solstice_before - 30, solstice_after + 30)
+    starts = [_kst_date(jde) for jde in moons]
+
+    def month_index(day):
+        return max(i for i, start in enumerate(starts) if start <= day)
+
+    first = month_index(_kst_date(solstice_before))
+    last = month_index(_kst_date(solstice_after))
+    leap_year = last - first == 13
+
+    # 각 달에 중기(황경 30° 배수)가 있는지 확인
+    principal_days = []
+    jde = solstice_before
+    while jde < moons[-1]:
+        principal_days.append(_kst_date(jde))
+        jde = solar_term_jde((solar_longitude(jde) + 30) % 360, jde + 30.4)
+
+    months = {}
+    number = 11
+    leap_used = False
+    for index in range(first + 1, last):
+        start, following = starts[index], starts[index + 1]
+        has_principal = any(start <= day < following for day in principal_days)
+        if leap_year and not leap_used and not has_principal:
+            leap_used = True
+            months[(number, True)] = start
+            continue
+        number = number % 12 + 1
+        months[(number, False)] = start
+    return months
+
+
+# ---------------------------------------------------------------- 공휴일
+
+def _base_holidays(year):
+    """(날짜, 이름) 목록 - 대체공휴일 제외"""
+    result = []
+    for month, day, name, _, first, last in SOLAR_HOLIDAYS:
+        if (first is None or year >= first) and (last is None or year <= last):
+            result.append((datetime.date(year, month, day), name))
+
+    months = lunar_months(year)
+    new_year = months[(1, False)]
+    for offset in (-1, 0, 1):
+        result.append((new_year + datetime.timedelta(days=offset), '설날'))
+    result.append((months[(4, False)] + datetime.timedelta(days=7), '부처님오신날'))
+    chuseok = months[(8, False)] + datetime.timedelta(days=14)
+    for offset in (-1, 0, 1):
+        result.append((chuseok + datetime.timedelta(days=offset), '추석'))
+    return result
+
+
+def _substitute_rule(name):
+    """이름 → 대체공휴일 종류 ('weekend': 토·일요일 또는 다른 공휴일과 겹칠 때,
+    'sunday': 일요일 또는 다른 공휴일과 겹칠 때, None: 없음)"""
+    if name in ('설날', '추석'):
+        return 'sunday'
+    for _, _, holiday, rule, _, _ in SOLAR_HOLIDAYS:
+        if holiday == name:
+            return rule
+    return 'weekend' if name == '부처님오신날' else None
+
+
+def korean_holidays(year):
+    """year년 공휴일 [(날짜, 이름, 종류)] - 종류는 'public' 또는 'substitute'"""
+    names = {}
+    for day, name in _base_holidays(year):
+        names.setdefault(day, []).append(name)
+
+    # 설날·추석 연휴는 연휴가 끝난 다음 날부터 대체공휴일을 찾음
+    period_end = {}
+    for day, day_names in names.items():
+        for name in day_names:
+            if name in ('설날', '추석'):
+                period_end[name] = max(period_end.get(name, day), day)
+
+    substitutes = []
+    taken = set(names)
+    for day in sorted(names):
+        day_names = names[day]
+        eligible = []
+        for name in day_names:
+            rule = _substitute_rule(name)
+            since = SUBSTITUTE_SINCE.get(name)
+            if rule is None or since is None or day < since:
+                continue
+            weekend_hit = day.weekday() == SUNDAY or (rule == 'weekend' and day.weekday() == SATURDAY)
+            if weekend_hit or len(day_names) > 1:
+                eligible.append(name)
+        # 평일에 겹치면 하루는 그대로 쉬므로 (겹친 수 - 1)일, 주말이면 겹친 수만큼 잃음
+        weekend = day.weekday() in (SATURDAY, SUNDAY)
+        lost = len(day_names) if weekend else len(day_names) - 1
+        for name in eligible[:lost]:
+            candidate = max(day, period_end.get(name, day)) + datetime.timedelta(days=1)
+            while candidate.weekday() in (SATURDAY, SUNDAY) or candidate in taken:
+                candidate += datetime.timedelta(days=1)
+            taken.add(candidate)
+            substitutes.append((candidate, f'대체공휴일({name})', 'substitute'))
+
+    result = [(day, '·'.join(dict.fromkeys(day_names)), 'public') for day, day_names in names.items()]
+    return sorted(result + substitutes)
+
+
+# ---------------------------------------------------------------- DB
+
+def ensure_schema(cur):
+    """holidays 테이블 생성 (처음 만들 때는 기본 범위를 채움) - 새로 만들었으면 True"""
+    cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'holidays'")
+    created = cur.fetchone()[0] == 0
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS holidays (
+            date DATE PRIMARY KEY,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'public'
+        ) WITHOUT ROWID
+    ''')
+    if created:
+        fill(cur, FIRST_YEAR, LAST_YEAR)
+    return created
+
+
+def fill(cur, first_year, last_year):
+    """[first_year, last_year] 구간의 공휴일을 다시 계산해 저장하고 저장한 날 수를 반환"""
+    rows = []
+    for year in range(first_year, last_year + 1):
+        rows.extend(korean_holidays(year))
+    cur.execute('DELETE FROM holidays WHERE date >= ? AND date <= ?',
+                (datetime.date(first_year, 1, 1), datetime.date(last_year, 12, 31)))
+    # 설날 전날이 전년도 12월에 걸칠 수 있으므로 같은 날짜는 덮어씀
+    cur.executemany('INSERT OR REPLACE INTO holidays (date, name, kind) VALUES (?, ?, ?)', rows)
+    return len(rows)
+
+
+def regenerate(cur, first_year, last_year):
+    """공휴일을 다시 계산하고 이에 기대는 요약 테이블·변경 기록을 맞춤 (manage.py holidays)
+
+    달력 응답에 공휴일 이름이 들어가므로 해당 구간 정산 행을 변경 기록에 올려
+    ETag와 증분 동기화(/report/changes)가 새 내용을 받도록 한다.
+    """
+    count = fill(cur, first_year, last_year)
+    rollups.rebuild(cur)
+    bounds = (datetime.date(first_year, 1, 1), datetime.date(last_year, 12, 31))
+    cur.execute('''
+        INSERT INTO report_changes (date, version, deleted)
+        SELECT date, (SELECT version FROM report_meta WHERE id = 1) + ROW_NUMBER() OVER (ORDER BY date), 0
+        FROM daily_reports
+        WHERE date >= ? AND date <= ?
+        ON CONFLICT(date) DO UPDATE SET version = excluded.version, deleted = 0
+    ''', bounds)
+    cur.execute('''
+        UPDATE report_meta
+        SET version = version + 1 + (SELECT COUNT(*) FROM daily_reports WHERE date >= ? AND date <= ?),
+            modified_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    ''', bounds)
+    return count
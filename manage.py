@@ -0,0 +1,276 @@
+"""PharmaDay 관리 명령
+
+    python manage.py rebuild-rollups
+    python manage.py check-plans
+    python manage.py holidays --start 2000 --end 2040
+    python manage.py import history.csv
+    python manage.py export --format ndjson --start 2024-01-01 -o 2024.ndjson
+    python manage.py stores add gangnam 강남점
+    python manage.py --store gangnam import gangnam.csv
+    python manage.py stores assign kim gangnam      # 계정 소속 지정 (hq: 본사 계정)
+    python manage.py archive run                    # 지난 연도를 연도별 보관 파일로 옮김
+    python manage.py archive verify
+
+--store를 주지 않으면 본점(main) DB를 대상으로 한다.
+"""
+import argparse
+import datetime
+import io
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from db import connection
+import db
+import archive
+import bulk
+import holidays
+import queryplans
+import rollups
+import stores
+
+
+def cmd_rebuild_rollups(args):
+    with connection(args.store_id) as conn:
+        cur = conn.cursor()
+        counts = rollups.rebuild(cur)
+        cur.close()
+    for table, count in counts.items():
+        print(f'{table}: {count}행')
+
+
+def cmd_holidays(args):
+    if args.show:
+        for day, name, kind in holidays.korean_holidays(args.show):
+            print(f"{day} {'월화수목금토일'[day.weekday()]} {name}{' (대체)' if kind == 'substitute' else ''}")
+        return 0
+    if args.start > args.end:
+        print('--start가 --end보다 클 수 없습니다.', file=sys.stderr)
+        return 2
+    # 공휴일은 전국 공통이므로 모든 지점 DB에 반영
+    for store in stores.all_stores():
+        with connection(store['id']) as conn:
+            cur = conn.cursor()
+            count = holidays.regenerate(cur, args.start, args.end)
+            cur.close()
+        print(f"[{store['code']}] {args.start}~{args.end}년 공휴일 {count}일 저장 (요약 테이블 재계산 완료)")
+    return 0
+
+
+def cmd_stores(args):
+    if args.action == 'add':
+        try:
+            store_id = stores.add_store(args.code, args.name or args.code)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        print(f'{args.code} 지점을 추가했습니다 (번호 {store_id}, {db.store_path(args.code + ".db")})')
+    elif args.action == 'assign':
+        if args.code == 'hq':
+            store_id = None
+        else:
+            store_id = _store_id(args.code)
+            if store_id is None:
+                return 2
+        with connection() as conn:
+            updated = conn.execute('UPDATE users SET store_id = ? WHERE username = ?',
+                                   (store_id, args.username)).rowcount
+        if not updated:
+            print(f'없는 계정입니다: {args.username}', file=sys.stderr)
+            return 2
+        print(f"{args.username} → {'본사(전 지점)' if store_id is None else args.code}")
+    else:
+        for store in stores.all_stores():
+            print(f"{store['id']:>3} {store['code']:<16} {store['name']}")
+    return 0
+
+
+@contextmanager
+def _archive_connection(store_id):
+    # 보관 파일이 없어져도 복구 명령은 실행되도록 풀 대신 따로 연결 (없는 연도는 빼고 ATTACH)
+    db.init_db(store_id)
+    conn = db.get_connection(store_id)
+    try:
+        archive.attach(conn, missing_ok=True)
+        yield conn
+    finally:
+        conn.close()
+
+
+def _size_mb(path):
+    return os.path.getsize(path) / 1024 / 1024 if os.path.exists(path) else 0
+
+
+def cmd_archive(args):
+    store = stores.get_store(args.store_id)
+    try:
+        with _archive_connection(args.store_id) as conn:
+            if args.action == 'run':
+                hot = db.shard_path(args.store_id)
+                before_mb = _size_mb(hot)
+                results = [archive.archive_year(conn, store, year)
+                           for year in archive.closed_years(conn, args.before)]
+                results = [result for result in results if result]
+                for result in results:
+                    print(f"[{store['code']}] {result['year']}년 {result['rows']}행 → {result['file']} "
+                          f"({result['bytes'] / 1024:.0f} KB)")
+                if not results:
+                    print(f"[{store['code']}] 보관할 연도가 없습니다.")
+                elif not args.no_vacuum:
+                    # 보관 파일을 연결한 커넥션에서는 TEMP VIEW가 테이블 이름을 가리므로 따로 연결해 압축
+                    plain = db.get_connection(args.store_id)
+                    try:
+                        plain.execute('VACUUM')
+                        plain.execute('PRAGMA wal_checkpoint(TRUNCATE)')  # WAL 모드는 체크포인트 후에 파일이 줄어듦
+                    finally:
+                        plain.close()
+                    print(f"[{store['code']}] 지점 DB {before_mb:.1f} MB → {_size_mb(hot):.1f} MB")
+            elif args.action == 'attach':
+                result = archive.attach_file(conn, store, args.file)
+                print(f"[{store['code']}] {result['year']}년 보관 파일 연결 ({result['rows']}행)")
+            elif args.action == 'restore':
+                restored = archive.restore_year(conn, args.year)
+                print(f"[{store['code']}] {args.year}년 {restored}행을 지점 DB로 되돌림")
+            elif args.action == 'verify':
+                failed = False
+                for year, problems in archive.verify(conn):
+                    failed = failed or bool(problems)
+                    print(f"{'FAIL' if problems else 'ok  '} {year}" + ''.join(f'\n       {p}' for p in problems))
+                return 1 if failed else 0
+            else:
+                for item in archive.registered(conn):
+                    path = archive.archive_path(item['file'])
+                    print(f"{item['year']} {item['rows']:>6}행 {_size_mb(path):7.2f} MB "
+                          f"{item['sha256'][:12]} {item['archived_at']} {item['file']}")
+    except archive.ArchiveError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def _store_id(code):
+    for store in stores.all_stores():
+        if store['code'] == code:
+            return store['id']
+    print(f'없는 지점 코드입니다: {code} (manage.py stores list로 확인)', file=sys.stderr)
+    return None
+
+
+def cmd_check_plans(args):
+    failed = False
+    with connection(args.store_id) as conn:
+        for name, details, problems in queryplans.check(conn):
+            failed = failed or bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {name}")
+            for detail in details:
+                print(f'       {detail}')
+    return 1 if failed else 0
+
+
+def _date_arg(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError('YYYY-MM-DD 형식이어야 합니다.')
+
+
+def cmd_import(args):
+    fmt = args.format or bulk.guess_format(args.file)
+    if fmt is None:
+        print('형식을 알 수 없습니다. --format csv 또는 --format ndjson을 지정하세요.', file=sys.stderr)
+        return 2
+    if args.file == '-':
+        lines = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+    else:
+        lines = open(args.file, encoding='utf-8-sig', newline='')
+    try:
+        with connection(args.store_id) as conn:
+            result = bulk.import_records(conn, bulk.iter_records(lines, fmt), args.batch_size)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except sqlite3.IntegrityError as e:
+        # 보관된 연도가 섞인 파일 - 메시지에 거부된 묶음의 날짜 범위가 들어 있음 (앞선 묶음은 반영됨)
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        lines.close()
+    print(f"{result['imported']}건 가져옴 ({result['batches']}회 커밋, "
+          f"{result['first_date']} ~ {result['last_date']})")
+
+
+def cmd_export(args):
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        with connection(args.store_id) as conn:
+            for chunk in bulk.export_chunks(conn, args.format, args.start, args.end):
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='manage.py', description='PharmaDay 관리 명령')
+    parser.add_argument('--store', default='main', help='대상 지점 코드 (기본: main 본점)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('rebuild-rollups', help='월/주 요약 테이블을 daily_reports 기준으로 다시 계산')
+    p.set_defaults(func=cmd_rebuild_rollups)
+
+    p = commands.add_parser('check-plans', help='엔드포인트 쿼리가 전체 스캔 없이 인덱스를 타는지 점검')
+    p.set_defaults(func=cmd_check_plans)
+
+    p = commands.add_parser('holidays', help='법정 공휴일(음력·대체공휴일 포함)을 계산해 holidays 테이블에 저장')
+    p.add_argument('--start', type=int, default=holidays.FIRST_YEAR, help='시작 연도')
+    p.add_argument('--end', type=int, default=holidays.LAST_YEAR, help='마지막 연도 (포함)')
+    p.add_argument('--show', type=int, metavar='YEAR', help='저장하지 않고 해당 연도 공휴일만 출력')
+    p.set_defaults(func=cmd_holidays)
+
+    p = commands.add_parser('stores', help='지점 목록/추가, 계정 소속 지정')
+    actions = p.add_subparsers(dest='action')
+    actions.add_parser('list', help='지점 목록')
+    a = actions.add_parser('add', help='지점 추가 (DB 파일 생성)')
+    a.add_argument('code', help='지점 코드 (영문 소문자·숫자)')
+    a.add_argument('name', nargs='?', help='표시 이름')
+    a = actions.add_parser('assign', help='계정의 소속 지점 지정')
+    a.add_argument('username')
+    a.add_argument('code', help="지점 코드 ('hq'이면 본사 계정)")
+    p.set_defaults(func=cmd_stores)
+
+    p = commands.add_parser('archive', help='지난 연도 정산을 연도별 읽기 전용 파일로 보관/검사/복원')
+    actions = p.add_subparsers(dest='action')
+    actions.add_parser('list', help='보관 파일 목록')
+    a = actions.add_parser('run', help='지난 연도 보관 (기본: 올해·작년 제외)')
+    a.add_argument('--before', type=int, metavar='YEAR', help='이 연도 전까지 보관')
+    a.add_argument('--no-vacuum', action='store_true', help='보관 후 지점 DB를 압축하지 않음')
+    actions.add_parser('verify', help='보관 파일 해시·행 수·무결성 검사')
+    a = actions.add_parser('attach', help='백업에서 복원한 보관 파일을 다시 연결')
+    a.add_argument('file')
+    a = actions.add_parser('restore', help='보관을 풀고 지점 DB로 되돌림')
+    a.add_argument('year', type=int)
+    p.set_defaults(func=cmd_archive)
+
+    p = commands.add_parser('import', help='CSV/NDJSON 파일을 daily_reports에 반영 (같은 날짜는 덮어씀)')
+    p.add_argument('file', help="가져올 파일 ('-'이면 표준 입력)")
+    p.add_argument('--format', choices=bulk.FORMATS, help='파일 형식 (기본: 확장자로 추정)')
+    p.add_argument('--batch-size', type=int, default=bulk.BATCH_SIZE, help='커밋 단위 행 수')
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser('export', help='daily_reports를 CSV/NDJSON으로 내보내기')
+    p.add_argument('--format', choices=bulk.FORMATS, default='csv')
+    p.add_argument('--start', type=_date_arg, help='시작일 (포함)')
+    p.add_argument('--end', type=_date_arg, help='종료일 (미포함)')
+    p.add_argument('-o', '--output', default='-', help="저장할 파일 ('-'이면 표준 출력)")
+    p.set_defaults(func=cmd_export)
+
+    args = parser.parse_args(argv)
+    args.store_id = _store_id(args.store)
+    if args.store_id is None:
+        return 2
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""요청/SQL 계측 (선택 기능)
+
+PHARMADAY_METRICS=1 로 실행하면
+ - 라우트별 요청 처리 시간 히스토그램
+ - SQL 문장별 실행 시간(실행 + 결과 읽기) 히스토그램과 읽은 행 수
+ - 요청 안에서 SQL / 비밀번호 해시 / JSON 변환에 쓴 시간
+을 모아 /metrics (Prometheus 텍스트 형식)로 보여 주고, 느린 쿼리는
+slow_queries.log에 남긴다. 꺼져 있으면 커넥션도 기본 sqlite3 그대로 쓴다.
+"""
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('PHARMADAY_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+SLOW_QUERY_MS = float(os.environ.get('PHARMADAY_SLOW_QUERY_MS', '100'))
+
+if getattr(sys, 'frozen', False):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SLOW_QUERY_LOG = os.environ.get('PHARMADAY_SLOW_QUERY_LOG') or os.path.join(BASE_DIR, 'slow_queries.log')
+
+# 초 단위 버킷 (약국 PC 기준 1ms ~ 5s)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Histogram:
+    """라벨 조합별 누적 버킷 히스토그램"""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # labels -> [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{base.rstrip(",")}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{base.rstrip(",")}}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{{{_labels(self.label_names, labels).rstrip(",")}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ''.join(f'{name}="{_escape(value)}",' for name, value in zip(names, values))
+
+
+request_seconds = Histogram('pharmaday_request_duration_seconds', '라우트별 요청 처리 시간',
+                            ('method', 'route', 'status'))
+request_phase_seconds = Histogram('pharmaday_request_phase_seconds', '요청 안에서 단계별로 쓴 시간',
+                                  ('route', 'phase'))
+sql_seconds = Histogram('pharmaday_sql_duration_seconds', 'SQL 문장별 실행 + 결과 읽기 시간',
+                        ('statement',))
+sql_rows = Counter('pharmaday_sql_rows_total', 'SQL 문장별로 읽은 행 수', ('statement',))
+slow_queries = Counter('pharmaday_slow_queries_total', '느린 쿼리 기준을 넘은 횟수', ('statement',))
+
+slow_query_logger = logging.getLogger('pharmaday.slow_query')
+_slow_log_lock = threading.Lock()
+_slow_log_ready = False
+
+_current = threading.local()
+
+
+def _ensure_slow_log():
+    global _slow_log_ready
+    with _slow_log_lock:
+        if not _slow_log_ready:
+            handler = logging.handlers.RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=1024 * 1024,
+                                                           backupCount=3, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_query_logger.addHandler(handler)
+            slow_query_logger.setLevel(logging.WARNING)
+            slow_query_logger.propagate = False
+            _slow_log_ready = True
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_label(sql):
+    """공백을 정리한 SQL 앞부분 (파라미터는 바인딩되므로 문장 종류 수는 유한함)"""
+    text = _WHITESPACE.sub(' ', sql).strip()
+    return text if len(text) <= 120 else text[:117] + '...'
+
+
+def add_phase(phase, seconds):
+    phases = getattr(_current, 'phases', None)
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0) + seconds
+
+
+@contextmanager
+def phase(name):
+    """요청 안의 한 단계(비밀번호 해시, JSON 변환 등) 시간 기록"""
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - started)
+
+
+def _record_statement(sql, params, seconds, rows):
+    label = statement_label(sql)
+    sql_seconds.observe((label,), seconds)
+    if rows:
+        sql_rows.inc((label,), rows)
+    add_phase('sql', seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        slow_queries.inc((label,))
+        _ensure_slow_log()
+        slow_query_logger.warning('%.1fms rows=%d route=%s sql=%s params=%.200r', seconds * 1000, rows,
+                                  getattr(_current, 'route', '-'), label, params)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """문장마다 execute부터 결과를 다 읽을 때까지의 시간과 행 수를 기록"""
+
+    _pending = None  # [sql, params, 누적 초, 행 수]
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            _record_statement(*pending)
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._pending = [sql, parameters, 0.0, 0]
+        self._timed(super().execute, sql, parameters)
+        if self.description is None:
+            # 결과 행이 없는 문장(INSERT/UPDATE 등)은 바로 기록
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._pending = [sql, '(executemany)', 0.0, 0]
+        self._timed(super().executemany, sql, seq_of_parameters)
+        self._pending[3] = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._pending is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            if not rows:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._pending is not None:
+            self._pending[3] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # fetchone 한 번만 하고 닫지 않은 커서도 기록
+        self._finish()
+
+
+class TimedConnection(sqlite3.Connection):
+    """cursor()/execute()가 TimedCursor를 쓰도록 한 커넥션 (db.get_connection의 factory)"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def init_app(app):
+    """요청 전후 훅 등록 (꺼져 있으면 아무것도 하지 않음)"""
+    if not ENABLED:
+        return
+    from flask import request
+
+    @app.before_request
+    def _start_request_timer():
+        _current.started = time.perf_counter()
+        _current.route = request.url_rule.rule if request.url_rule else '(없음)'
+        _current.phases = {}
+
+    @app.after_request
+    def _record_request(response):
+        started = getattr(_current, 'started', None)
+        if started is not None:
+            # 스트리밍 응답은 본문 전송 전까지의 시간만 포함됨
+            route = _current.route
+            request_seconds.observe((request.method, route, str(response.status_code)),
+                                    time.perf_counter() - started)
+            for name, seconds in _current.phases.items():
+                request_phase_seconds.observe((route, name), seconds)
+            _current.started = None
+            _current.route = '-'
+            _current.phases = None
+        return response
+
+
+def render():
+    lines = []
+    for metric in (request_seconds, request_phase_seconds, sql_seconds, sql_rows, slow_queries):
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,90 @@
+"""서버 PC의 내부망 주소
+
+화면 하단에 보여 줄 접속 주소를 요청마다 소켓으로 알아내지 않고, 시작할 때
+한 번 계산한 뒤 백그라운드 스레드가 주기적으로 다시 확인해 메모리에 둔다.
+(와이파이 재연결 등으로 주소가 바뀌면 다음 확인 때 반영된다.)
+"""
+import ipaddress
+import logging
+import os
+import socket
+import threading
+
+REFRESH_INTERVAL = float(os.environ.get('PHARMADAY_NETINFO_INTERVAL', '60'))
+FALLBACK_ADDRESS = '127.0.0.1'
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_addresses = None
+_refresher = None
+_stop = threading.Event()
+
+
+def _route_address():
+    # UDP connect는 패킷을 보내지 않고 기본 경로의 출발 주소만 정한다
+    # (오프라인 약국망처럼 기본 경로가 없으면 OSError)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect(('8.8.8.8', 80))
+        return s.getsockname()[0]
+
+
+def _host_addresses():
+    infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET, socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+def detect_addresses():
+    """내부망 IPv4 주소 목록 (기본 경로 주소가 맨 앞, 없으면 [127.0.0.1])"""
+    found = []
+    for source in (_route_address, _host_addresses):
+        try:
+            result = source()
+        except OSError as e:
+            logger.debug('주소 확인 실패 (%s): %s', source.__name__, e)
+            continue
+        for address in ([result] if isinstance(result, str) else result):
+            if address not in found and not ipaddress.ip_address(address).is_loopback:
+                found.append(address)
+    return found or [FALLBACK_ADDRESS]
+
+
+def refresh():
+    global _addresses
+    addresses = detect_addresses()
+    with _lock:
+        changed = addresses != _addresses
+        _addresses = addresses
+    if changed:
+        logger.info('서버 주소: %s', ', '.join(addresses))
+    return addresses
+
+
+def addresses():
+    with _lock:
+        current = _addresses
+    return current if current is not None else refresh()
+
+
+def primary_address():
+    return addresses()[0]
+
+
+def _refresh_loop(interval):
+    while not _stop.wait(interval):
+        refresh()
+
+
+def start(interval=REFRESH_INTERVAL):
+    """처음 주소를 계산하고 주기적 갱신 스레드 시작 (여러 번 불러도 한 번만 실행)"""
+    global _refresher
+    refresh()
+    with _lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, args=(interval,),
+                                          name='pharmaday-netinfo', daemon=True)
+            _refresher.start()
+
+
+def stop():
+    _stop.set()
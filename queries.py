@@ -0,0 +1,156 @@
+"""정산 조회용 SQL
+
+날짜 조건은 모두 date 인덱스를 그대로 탈 수 있는 반개구간(>=, <) 형태로 작성한다.
+`python manage.py check-plans`가 여기 있는 쿼리의 실행 계획을 점검한다.
+"""
+import datetime
+
+# 달력: FullCalendar가 요청한 화면 구간 [start, end)
+# 공휴일 이름(holiday_name)은 holidays 기본키로 조인
+CALENDAR_RANGE = """
+    SELECT r.date AS date, r.total_sales, r.prescription_count, r.notes, r.is_holiday, r.is_manual_holiday,
+           h.name AS holiday_name
+    FROM daily_reports r
+    LEFT JOIN holidays h ON h.date = r.date
+    WHERE r.date >= ? AND r.date < ?
+"""
+
+# 하루치 (단건 조회, 저장 후 변경 알림용)
+REPORT_BY_DATE = """
+    SELECT r.date AS date, r.total_sales, r.prescription_count, r.notes, r.is_holiday, r.is_manual_holiday,
+           h.name AS holiday_name
+    FROM daily_reports r
+    LEFT JOIN holidays h ON h.date = r.date
+    WHERE r.date = ?
+"""
+
+CALENDAR_ALL = """
+    SELECT r.date AS date, r.total_sales, r.prescription_count, r.notes, r.is_holiday, r.is_manual_holiday,
+           h.name AS holiday_name
+    FROM daily_reports r
+    LEFT JOIN holidays h ON h.date = r.date
+"""
+
+# 달력 음영용 공휴일: [start, end)
+HOLIDAYS_RANGE = """
+    SELECT date, name, kind
+    FROM holidays
+    WHERE date >= ? AND date < ?
+    ORDER BY date
+"""
+
+# 월별 조회: [해당 월 1일, 다음 달 1일)
+MONTHLY_REPORTS = """
+    SELECT date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
+    FROM daily_reports
+    WHERE date >= ? AND date < ?
+"""
+
+# 일 단위 분석: 일요일과 (선택적으로) 토요일은 weekday 인덱스 컬럼에서 제외,
+# 법정 공휴일은 holidays 기본키 조회로 제외
+# 마지막 파라미터는 토요일 포함 시 0, 제외 시 6
+ANALYZE_DAY = """
+    SELECT date, total_sales, prescription_count, is_holiday, is_manual_holiday
+    FROM daily_reports
+    WHERE date >= ? AND date < ?
+      AND weekday NOT IN (0, ?)
+      AND NOT COALESCE(is_holiday, 0) AND NOT COALESCE(is_manual_holiday, 0)
+      AND NOT EXISTS (SELECT 1 FROM holidays h WHERE h.date = daily_reports.date)
+    ORDER BY date
+"""
+
+
+# 전년 비교·예측: 날짜별 값과 영업일 여부 (일요일·휴일·선택 시 토요일은 working = 0)
+_WORKING = """
+           weekday NOT IN (0, ?)
+           AND NOT COALESCE(is_holiday, 0) AND NOT COALESCE(is_manual_holiday, 0)
+           AND NOT EXISTS (SELECT 1 FROM holidays h WHERE h.date = daily_reports.date) AS working"""
+
+# 이번 기간 [?, ?)과 364일(52주) 전 같은 요일 기간 [?, ?)을 한 번에 (두 구간 모두 날짜 인덱스 범위 검색)
+COMPARE_DAYS = f"""
+    SELECT date, total_sales, prescription_count,{_WORKING}
+    FROM daily_reports
+    WHERE (date >= ? AND date < ?) OR (date >= ? AND date < ?)
+    ORDER BY date
+"""
+
+FORECAST_DAYS = f"""
+    SELECT date, total_sales, prescription_count,{_WORKING}
+    FROM daily_reports
+    WHERE date >= ? AND date < ?
+    ORDER BY date
+"""
+
+# 목록: 최신순 키셋 페이지 (after보다 이전 날짜, LIMIT -1이면 전체)
+REPORTS_PAGE = """
+    SELECT id, date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
+    FROM daily_reports
+    WHERE date < ?
+    ORDER BY date DESC
+    LIMIT ?
+"""
+
+# 증분 동기화: since 이후 바뀐 날짜를 버전순으로 (삭제된 날짜는 deleted=1, 값은 NULL)
+# main.daily_reports만 조인 - 보관된 연도는 바뀌지 않고 보관할 때 그 연도의 변경 기록도 지우므로
+# (archive.py) 변경 기록은 항상 지점 DB의 행을 가리킨다. 보관 VIEW를 조인하면 전체를 임시 테이블로 복사함
+REPORT_CHANGES = """
+    SELECT c.date AS date, c.version AS version, c.deleted AS deleted,
+           r.total_sales, r.prescription_count, r.notes, r.is_holiday, r.is_manual_holiday
+    FROM report_changes c
+    LEFT JOIN main.daily_reports r ON r.date = c.date AND NOT c.deleted
+    WHERE c.version > ?
+    ORDER BY c.version
+    LIMIT ?
+"""
+
+# 날짜 기준 등록/수정 (단건 PUT과 대량 가져오기가 공유)
+# 쓰기는 main.daily_reports로 (보관 파일이 연결되면 daily_reports는 조회용 TEMP VIEW - archive.py)
+UPSERT_REPORT = """
+    INSERT INTO main.daily_reports (
+      date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
+    )
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+      total_sales = excluded.total_sales,
+      prescription_count = excluded.prescription_count,
+      notes = excluded.notes,
+      is_holiday = excluded.is_holiday,
+      is_manual_holiday = excluded.is_manual_holiday
+"""
+
+DELETE_REPORT = "DELETE FROM main.daily_reports WHERE date = ?"
+
+# 내보내기: [start, end) 날짜순
+EXPORT_RANGE = """
+    SELECT date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
+    FROM daily_reports
+    WHERE date >= ? AND date < ?
+    ORDER BY date
+"""
+
+
+# 부분 수정: 새 날짜는 나머지 항목을 기본값으로 만들고, 있는 날짜는 준 항목만 바꿈
+PATCH_DEFAULTS = {'total_sales': 0, 'prescription_count': 0, 'notes': '', 'is_holiday': False, 'is_manual_holiday': False}
+
+
+def patch_report_sql(fields):
+    """fields(PATCH_DEFAULTS 키의 부분집합, 순서 유지)만 갱신하는 upsert 문
+
+    인자는 (date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday) - 빠진 항목은 기본값.
+    """
+    assignments = ',\n      '.join(f'{name} = excluded.{name}' for name in fields if name in PATCH_DEFAULTS)
+    return f"""
+    INSERT INTO main.daily_reports (
+      date, total_sales, prescription_count, notes, is_holiday, is_manual_holiday
+    )
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+      {assignments}
+"""
+
+
+def month_bounds(year, month):
+    """해당 월의 [1일, 다음 달 1일) 구간"""
+    first = datetime.date(year, month, 1)
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return first, following
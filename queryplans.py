@@ -0,0 +1,75 @@
+"""엔드포인트 쿼리 실행 계획 점검 (EXPLAIN QUERY PLAN)
+
+각 엔드포인트가 실제로 실행하는 SQL이 전체 스캔 없이 인덱스를 타는지 확인한다.
+tests/test_query_plans.py가 새 DB(보관 파일 연결 전/후)로 돌리고,
+python manage.py check-plans는 운영 DB에 같은 점검을 돌린다.
+"""
+import datetime
+import re
+
+import queries
+import rollups
+import search
+
+
+def plan_checks():
+    """(이름, SQL, 파라미터) 목록 - 각 엔드포인트가 실제로 실행하는 쿼리"""
+    day = datetime.date(2025, 1, 1)
+    following = datetime.date(2025, 2, 1)
+    checks = [
+        ('/calendar-data', queries.CALENDAR_RANGE, (day, following)),
+        ('/holidays', queries.HOLIDAYS_RANGE, (day, following)),
+        ('/report/monthly', queries.MONTHLY_REPORTS, queries.month_bounds(2025, 1)),
+        ('/report?limit=&after=', queries.REPORTS_PAGE, (day, 100)),
+        ('/report/changes?since=', queries.REPORT_CHANGES, (0, 1000)),
+        ('/report/analyze?unit=day', queries.ANALYZE_DAY, (day, following, 6)),
+        ('/report/search?q=', search.SEARCH_SQL, ('"도매"*', day, following, 50)),
+        ('/report/compare', queries.COMPARE_DAYS,
+         (0, day, following, day - datetime.timedelta(days=364), following - datetime.timedelta(days=364))),
+        ('/report/forecast', queries.FORECAST_DAYS, (0, day, following)),
+    ]
+    for unit in rollups.TABLES:
+        checks.append((f'/report/analyze?unit={unit} (요약)', rollups.rollup_sql(unit, 2),
+                       ('2025-01', '2025-12', 'weekday', 'saturday')))
+        checks.append((f'/report/analyze?unit={unit} (경계)', rollups.raw_bucket_sql(unit, 2),
+                       (day, following, 'weekday', 'saturday')))
+    return checks
+
+
+def explain(cur, sql, params):
+    """EXPLAIN QUERY PLAN의 detail 줄 목록"""
+    cur.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    return [row[3] for row in cur.fetchall()]
+
+
+def plan_problems(details):
+    """EXPLAIN QUERY PLAN 줄 중 문제가 되는 것 (전체 스캔, 임시 테이블 복사, 자동 인덱스)
+
+    보관 파일이 연결되면 daily_reports는 UNION ALL VIEW이다. 각 갈래가 인덱스로 SEARCH하고
+    바깥에서 그 CO-ROUTINE 결과를 훑는 'SCAN daily_reports'는 정상이지만, VIEW 전체를
+    MATERIALIZE하거나 AUTOMATIC 인덱스를 만드는 계획은 매번 전 기간을 읽으므로 실패로 본다.
+    """
+    coroutines = {d.split()[1] for d in details if d.startswith('CO-ROUTINE ')}
+    problems = []
+    for detail in details:
+        if detail.startswith('SCAN '):
+            # FTS5 MATCH(인덱스 식별자에 M)는 가상 테이블 색인 조회이므로 전체 스캔이 아님
+            if detail.split()[1] in coroutines or re.search(r'VIRTUAL TABLE INDEX \d+:.*M', detail):
+                continue
+            problems.append(detail)
+        elif detail.startswith('MATERIALIZE ') or 'AUTOMATIC' in detail:
+            problems.append(detail)
+    return problems
+
+
+def check(conn):
+    """[(이름, 계획 줄 목록, 문제 줄 목록)] - 문제 줄이 비어 있으면 통과"""
+    cur = conn.cursor()
+    try:
+        results = []
+        for name, sql, params in plan_checks():
+            details = explain(cur, sql, params)
+            results.append((name, details, plan_problems(details)))
+        return results
+    finally:
+        cur.close()
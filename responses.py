@@ -0,0 +1,183 @@
+"""응답 공통 처리: JSON 직렬화, 압축, 정적 파일 캐시
+
+ - JSON은 orjson이 설치되어 있으면 사용하고, 없으면 표준 json으로 같은 결과를 만든다.
+   (pip install orjson - 선택 사항)
+ - 일정 크기 이상의 텍스트 응답은 Accept-Encoding에 따라 brotli(설치 시) 또는 gzip으로
+   압축한다. 스트리밍 응답도 조각 단위로 압축하며, SSE는 압축하지 않는다.
+ - url_for('static', ...) / url_for('favicon')에는 파일 내용 해시(v=...)가 붙고,
+   해시가 붙은 요청은 브라우저가 1년간 다시 받지 않도록 캐시 헤더를 준다.
+"""
+import datetime
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성
+    brotli = None
+
+MIN_COMPRESS_SIZE = int(os.environ.get('PHARMADAY_COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'image/x-icon')
+STATIC_MAX_AGE = 365 * 24 * 3600
+UNVERSIONED_MAX_AGE = 24 * 3600
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+    _ORJSON_SORTED = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+
+def _default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__}은(는) JSON으로 바꿀 수 없습니다.')
+
+
+def dumps(obj, sort_keys=False):
+    """obj → UTF-8 JSON 바이트 (공백 없음, 한글은 그대로)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_SORTED if sort_keys else _ORJSON_OPTIONS)
+        except TypeError:
+            pass  # 64비트를 넘는 정수 등 orjson이 못 다루는 값은 표준 json으로
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys,
+                      default=_default).encode('utf-8')
+
+
+class JSONProvider(DefaultJSONProvider):
+    """jsonify()도 dumps()를 거치도록 하는 Flask JSON 공급자"""
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, sort_keys=self.sort_keys), mimetype=self.mimetype)
+
+
+# ---------------------------------------------------------------- 압축
+
+def _accepted_encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    """(조각 압축 함수, 지금까지 넣은 내용을 내보내는 함수, 마무리 함수)"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip 헤더 포함
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_stream(iterable, encoding):
+    compress, flush, finish = _compressor(encoding)
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            # 압축기는 내부에 모아 두므로 조각마다 내보내야 스트리밍 응답이 바로 전송됨
+            data = compress(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+
+
+def _is_compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') and mimetype != 'text/event-stream' or mimetype in COMPRESSIBLE_TYPES
+
+
+def compress_response(response):
+    if (response.status_code not in (200, 201) or 'Content-Encoding' in response.headers
+            or not _is_compressible(response)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < MIN_COMPRESS_SIZE:
+            return response
+        compress, _, finish = _compressor(encoding)
+        response.set_data(compress(body) + finish())
+    response.headers['Content-Encoding'] = encoding
+    response.direct_passthrough = False
+
+    # 압축본은 바이트가 다르므로 강한 ETag는 약한 ETag로 바꿈
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# ---------------------------------------------------------------- 정적 파일
+
+_fingerprints = {}
+_fingerprint_lock = threading.Lock()
+
+
+def fingerprint(path):
+    """파일 내용 해시 앞 10자리 (수정 시각이 바뀌면 다시 계산, 파일이 없으면 None)"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _fingerprint_lock:
+        cached = _fingerprints.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:10]
+    with _fingerprint_lock:
+        _fingerprints[path] = (mtime, digest)
+    return digest
+
+
+def init_app(app, favicon_path):
+    app.json = JSONProvider(app)
+
+    @app.url_defaults
+    def _add_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            path = os.path.join(app.static_folder, values['filename'])
+        elif endpoint == 'favicon' and 'v' not in values:
+            path = favicon_path
+        else:
+            return
+        digest = fingerprint(path)
+        if digest:
+            values['v'] = digest
+
+    @app.after_request
+    def _finish_response(response):
+        if request.endpoint in ('static', 'favicon') and response.status_code == 200:
+            # 해시가 붙은 주소는 내용이 바뀌면 주소도 바뀌므로 오래 캐시해도 안전
+            if request.args.get('v'):
+                response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+            else:
+                response.headers['Cache-Control'] = f'public, max-age={UNVERSIONED_MAX_AGE}'
+        return compress_response(response)
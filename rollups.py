@@ -0,0 +1,188 @@
+"""월/ISO주 단위 정산 요약 테이블
+
+daily_reports에 쓰기가 일어날 때마다 트리거가 요약 행을 증감시키므로
+분석 화면은 수년치 원본 대신 수십 개의 요약 행만 읽으면 된다.
+요일 구분(day_class)은 평일/토요일/일요일/휴일이며 휴일이 우선한다.
+휴일은 행의 휴일 표시 또는 holidays 테이블(법정 공휴일)에 있는 날이다.
+"""
+import datetime
+
+DAY_CLASSES = ('weekday', 'saturday', 'sunday', 'holiday')
+
+TABLES = {
+    'month': 'report_rollup_month',
+    'week': 'report_rollup_week',
+}
+
+
+def day_class_sql(ref):
+    return f"""(CASE
+        WHEN COALESCE({ref}.is_holiday, 0) OR COALESCE({ref}.is_manual_holiday, 0)
+             OR EXISTS (SELECT 1 FROM holidays WHERE holidays.date = {ref}.date) THEN 'holiday'
+        WHEN strftime('%w', {ref}.date) = '0' THEN 'sunday'
+        WHEN strftime('%w', {ref}.date) = '6' THEN 'saturday'
+        ELSE 'weekday' END)"""
+
+
+def period_sql(unit, ref):
+    if unit == 'month':
+        return f"strftime('%Y-%m', {ref}.date)"
+    # ISO 주: 해당 주의 목요일이 속한 연도/주차 ('YYYY-Www')
+    thursday = f"date({ref}.date, printf('%+d days', 3 - (CAST(strftime('%w', {ref}.date) AS INTEGER) + 6) % 7))"
+    return (f"(strftime('%Y', {thursday}) || '-W' || "
+            f"printf('%02d', (CAST(strftime('%j', {thursday}) AS INTEGER) - 1) / 7 + 1))")
+
+
+def period_key(unit, day):
+    if unit == 'month':
+        return day.strftime('%Y-%m')
+    iso_year, iso_week, _ = day.isocalendar()
+    return f'{iso_year:04d}-W{iso_week:02d}'
+
+
+def _add_sql(table, unit, ref):
+    return f"""
+        INSERT INTO {table} (period, day_class, day_count, total_sales, total_prescriptions)
+        VALUES ({period_sql(unit, ref)}, {day_class_sql(ref)}, 1,
+                COALESCE({ref}.total_sales, 0), COALESCE({ref}.prescription_count, 0))
+        ON CONFLICT(period, day_class) DO UPDATE SET
+            day_count = day_count + 1,
+            total_sales = total_sales + excluded.total_sales,
+            total_prescriptions = total_prescriptions + excluded.total_prescriptions;
+    """
+
+
+def _remove_sql(table, unit, ref):
+    where = f"period = {period_sql(unit, ref)} AND day_class = {day_class_sql(ref)}"
+    return f"""
+        UPDATE {table} SET
+            day_count = day_count - 1,
+            total_sales = total_sales - COALESCE({ref}.total_sales, 0),
+            total_prescriptions = total_prescriptions - COALESCE({ref}.prescription_count, 0)
+        WHERE {where};
+        DELETE FROM {table} WHERE {where} AND day_count <= 0;
+    """
+
+
+def ensure_schema(cur):
+    """요약 테이블과 유지 트리거 생성 (처음 만들거나 트리거 내용이 바뀌었으면 기존 데이터로 채움)
+
+    holidays 테이블을 참조하므로 holidays.ensure_schema() 다음에 호출해야 한다.
+    """
+    cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+                tuple(TABLES.values()))
+    created = cur.fetchone()[0] < len(TABLES)
+
+    for table in TABLES.values():
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                period TEXT NOT NULL,
+                day_class TEXT NOT NULL,
+                day_count INTEGER NOT NULL DEFAULT 0,
+                total_sales INTEGER NOT NULL DEFAULT 0,
+                total_prescriptions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (period, day_class)
+            ) WITHOUT ROWID
+        ''')
+
+    bodies = {
+        'insert': ''.join(_add_sql(table, unit, 'NEW') for unit, table in TABLES.items()),
+        'delete': ''.join(_remove_sql(table, unit, 'OLD') for unit, table in TABLES.items()),
+        'update': ''.join(_remove_sql(table, unit, 'OLD') + _add_sql(table, unit, 'NEW')
+                          for unit, table in TABLES.items()),
+    }
+    for event, body in bodies.items():
+        name = f'daily_reports_rollup_{event}'
+        sql = f'''CREATE TRIGGER {name}
+            AFTER {event.upper()} ON daily_reports
+            BEGIN
+                {body}
+            END'''
+        # 분류 규칙이 바뀐 예전 트리거는 교체하고 요약을 다시 계산
+        cur.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+        row = cur.fetchone()
+        if row is None or row[0] != sql:
+            cur.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cur.execute(sql)
+            created = True
+
+    if created:
+        rebuild(cur)
+
+
+def rebuild(cur):
+    """daily_reports 전체를 기준으로 요약 테이블을 다시 계산 (대량 반영 후 재동기화용)"""
+    counts = {}
+    for unit, table in TABLES.items():
+        cur.execute(f'DELETE FROM {table}')
+        cur.execute(f'''
+            INSERT INTO {table} (period, day_class, day_count, total_sales, total_prescriptions)
+            SELECT {period_sql(unit, 'daily_reports')}, {day_class_sql('daily_reports')}, COUNT(*),
+                   SUM(COALESCE(total_sales, 0)), SUM(COALESCE(prescription_count, 0))
+            FROM daily_reports
+            GROUP BY 1, 2
+        ''')
+        counts[table] = cur.rowcount
+    return counts
+
+
+def _full_bucket_bounds(unit, start, end):
+    """[start, end] 구간 안에 완전히 포함되는 첫 버킷 시작일과 마지막 버킷 종료일"""
+    if unit == 'month':
+        first = start if start.day == 1 else (start.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        next_day = end + datetime.timedelta(days=1)
+        last = end if next_day.day == 1 else end.replace(day=1) - datetime.timedelta(days=1)
+    else:
+        first = start + datetime.timedelta(days=(7 - start.weekday()) % 7)
+        last = end - datetime.timedelta(days=(end.weekday() + 1) % 7)
+    return first, last
+
+
+def rollup_sql(unit, class_count):
+    placeholders = ', '.join('?' * class_count)
+    return f'''
+        SELECT period, SUM(total_sales), SUM(total_prescriptions)
+        FROM {TABLES[unit]}
+        WHERE period BETWEEN ? AND ? AND day_class IN ({placeholders})
+        GROUP BY period
+    '''
+
+
+def raw_bucket_sql(unit, class_count):
+    placeholders = ', '.join('?' * class_count)
+    return f'''
+        SELECT {period_sql(unit, 'daily_reports')} AS period,
+               SUM(COALESCE(total_sales, 0)), SUM(COALESCE(prescription_count, 0))
+        FROM daily_reports
+        WHERE date >= ? AND date <= ? AND {day_class_sql('daily_reports')} IN ({placeholders})
+        GROUP BY period
+    '''
+
+
+def bucket_totals(cur, unit, start, end, day_classes):
+    """기간별 (period, sales, prescriptions) 목록
+
+    완전히 포함되는 월/주는 요약 테이블에서, 앞뒤로 걸친 일부 구간만 원본에서 집계한다.
+    """
+    classes = tuple(day_classes)
+    totals = {}
+
+    first, last = _full_bucket_bounds(unit, start, end)
+    ranges = ((start, end),)
+    if first <= last:
+        cur.execute(rollup_sql(unit, len(classes)),
+                    (period_key(unit, first), period_key(unit, last)) + classes)
+        for period, sales, prescriptions in cur.fetchall():
+            totals[period] = [sales or 0, prescriptions or 0]
+        ranges = ((start, first - datetime.timedelta(days=1)), (last + datetime.timedelta(days=1), end))
+
+    for lo, hi in ranges:
+        if lo > hi:
+            continue
+        cur.execute(raw_bucket_sql(unit, len(classes)), (lo, hi) + classes)
+        for period, sales, prescriptions in cur.fetchall():
+            bucket = totals.setdefault(period, [0, 0])
+            bucket[0] += sales or 0
+            bucket[1] += prescriptions or 0
+
+    return [(period, sales, prescriptions) for period, (sales, prescriptions) in sorted(totals.items())]
@@ -0,0 +1,89 @@
+"""정산 메모(notes) 전문 검색 (SQLite FTS5)
+
+daily_reports를 내용 테이블로 쓰는 외부 콘텐츠 FTS5 인덱스를 트리거로 맞춰 두고,
+/report/search가 순위(bm25)와 발췌(snippet)를 붙여 돌려준다.
+
+한국어는 조사가 단어 뒤에 붙으므로('도매상에서') 검색어마다 접두어 검색('도매상'*)을 하고,
+짧은 접두어도 빠르게 찾도록 2·3글자 접두어 인덱스를 둔다.
+"""
+import html
+import re
+
+TABLE = 'report_notes_fts'
+
+# snippet()이 검색어 앞뒤에 붙이는 표시 (메모 본문에 나올 수 없는 제어 문자)
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+SNIPPET_TOKENS = 12
+
+SEARCH_SQL = f"""
+    SELECT r.date AS date, r.total_sales, r.prescription_count, r.notes,
+           snippet({TABLE}, 0, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet,
+           bm25({TABLE}) AS rank
+    FROM {TABLE}
+    JOIN main.daily_reports r ON r.id = {TABLE}.rowid
+    WHERE {TABLE} MATCH ? AND r.date >= ? AND r.date < ?
+    ORDER BY rank
+    LIMIT ?
+"""
+
+_TRIGGERS = {
+    'insert': f"""
+        AFTER INSERT ON daily_reports BEGIN
+            INSERT INTO {TABLE} (rowid, notes) VALUES (NEW.id, NEW.notes);
+        END""",
+    'delete': f"""
+        AFTER DELETE ON daily_reports BEGIN
+            INSERT INTO {TABLE} ({TABLE}, rowid, notes) VALUES ('delete', OLD.id, OLD.notes);
+        END""",
+    # 메모가 바뀐 경우만 색인 갱신 (매출만 고치는 저장은 건너뜀)
+    'update': f"""
+        AFTER UPDATE ON daily_reports
+        WHEN OLD.notes IS NOT NEW.notes OR OLD.id IS NOT NEW.id BEGIN
+            INSERT INTO {TABLE} ({TABLE}, rowid, notes) VALUES ('delete', OLD.id, OLD.notes);
+            INSERT INTO {TABLE} (rowid, notes) VALUES (NEW.id, NEW.notes);
+        END""",
+}
+
+
+def ensure_schema(cur):
+    """FTS5 인덱스와 동기화 트리거 생성 (처음 만들 때는 기존 메모로 색인)"""
+    cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,))
+    created = cur.fetchone()[0] == 0
+    cur.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+            notes,
+            content = 'daily_reports',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    for event, body in _TRIGGERS.items():
+        cur.execute(f'CREATE TRIGGER IF NOT EXISTS daily_reports_fts_{event} {body}')
+    if created:
+        rebuild(cur)
+
+
+def rebuild(cur):
+    """daily_reports 기준으로 색인을 다시 만듦"""
+    cur.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('rebuild')")
+
+
+_TERM = re.compile(r'[^\s"]+')
+
+
+def match_query(text):
+    """사용자 입력 → FTS5 MATCH 식 (모든 낱말을 접두어로 AND 검색, 없으면 None)
+
+    따옴표로 감싸 FTS5 연산자(AND, NEAR, * 등)가 문법으로 해석되지 않게 한다.
+    """
+    terms = _TERM.findall(text or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def snippet_html(snippet):
+    """snippet() 결과를 HTML로 (본문은 이스케이프, 일치 부분만 <mark>)"""
+    return (html.escape(snippet or '')
+            .replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>'))
@@ -0,0 +1,238 @@
+"""PharmaDay 서버 실행
+
+기본은 waitress(순수 파이썬 멀티스레드 WSGI 서버)로 실행하고, --dev를 주면
+예전처럼 Werkzeug 개발 서버를 사용한다. 종료는 /shutdown 요청이나
+Ctrl+C로 받으며, 처리 중인 요청이 끝날 때까지 기다린 뒤 내려간다.
+
+    데이터서버.exe                  # 서버 실행 후 브라우저 열기
+    데이터서버.exe --threads 16
+    데이터서버.exe --stop           # 실행 중인 서버를 정상 종료
+    데이터서버.exe --profile-startup  # 시작 단계별 소요 시간 출력
+
+시작 순서: 모듈 import → DB 스키마 버전 확인(필요할 때만 생성/이전) → 포트 확인 →
+소켓 수신 대기(server_ready) → 브라우저 열기. 소켓이 열리는 즉시 접속을 받을 수
+있으므로 고정 시간 대기 없이 바로 브라우저를 연다.
+"""
+import argparse
+import hmac
+import logging
+import os
+import secrets
+import signal
+import socket
+import threading
+import time
+
+from db import DB_FILE, close_pool, init_db
+from changefeed import feed as change_feed
+import backup
+import netinfo
+import startup
+import stores
+import writequeue
+
+DEFAULT_HOST = os.environ.get('PHARMADAY_HOST', '0.0.0.0')
+DEFAULT_PORT = int(os.environ.get('PHARMADAY_PORT', '5000'))
+
+# 종료 요청 비밀값 - 서버가 시작할 때마다 새로 만들어 DB 옆 파일에 두고,
+# --stop과 서버종료.bat이 읽어 SHUTDOWN_HEADER로 보낸다 (다른 사이트의 폼 POST로는 보낼 수 없음)
+SHUTDOWN_TOKEN_FILE = os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), 'shutdown.token')
+SHUTDOWN_HEADER = 'X-Shutdown-Token'
+
+shutdown_requested = threading.Event()
+server_ready = threading.Event()  # 수신 소켓이 열려 접속을 받을 수 있음
+_shutdown_token = None
+
+
+def request_shutdown():
+    shutdown_requested.set()
+
+
+def _write_shutdown_token():
+    global _shutdown_token
+    _shutdown_token = secrets.token_urlsafe(32)
+    fd = os.open(SHUTDOWN_TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(_shutdown_token)
+
+
+def _remove_shutdown_token():
+    try:
+        with open(SHUTDOWN_TOKEN_FILE, encoding='ascii') as f:
+            mine = f.read().strip() == _shutdown_token
+        if mine:
+            os.remove(SHUTDOWN_TOKEN_FILE)
+    except OSError:
+        pass
+
+
+def check_shutdown_token(token):
+    """종료 요청의 비밀값이 이 프로세스가 만든 값과 같은지 (서버를 server.main으로 띄우지 않았으면 항상 거짓)"""
+    return _shutdown_token is not None and hmac.compare_digest(token or '', _shutdown_token)
+
+
+def is_port_in_use(port=DEFAULT_PORT, host=DEFAULT_HOST):
+    """다른 프로세스가 포트를 쓰고 있는지 시험 bind로 확인
+
+    닫힌 포트로 connect를 시도하면 Windows에서는 재시도 때문에 1초 이상 걸리므로
+    바로 끝나는 bind를 쓴다. Windows는 SO_REUSEADDR이면 중복 bind가 허용되므로
+    배타적으로, 그 외에는 TIME_WAIT 연결에 걸리지 않도록 재사용을 켜고 시도한다.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        else:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind((host, port))
+        except OSError:
+            return True
+        return False
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='PharmaDay 서버')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='수신 주소 (기본: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='포트 (기본: 5000)')
+    # 실시간 알림(SSE) 연결은 스레드를 계속 차지하므로 그 몫은 따로 더함 (changefeed.py)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='일반 요청 처리 스레드 수. 실시간 알림 연결용 스레드는 이와 별도로 '
+                             '지점 수 × PHARMADAY_EVENT_STREAMS(지점당 동시 연결, 기본 8)만큼 더 둠')
+    parser.add_argument('--connection-limit', type=int, default=100,
+                        help='동시에 받을 최대 연결 수 (초과분은 대기열에서 기다림)')
+    parser.add_argument('--backlog', type=int, default=64, help='수락 대기열(listen backlog) 크기')
+    parser.add_argument('--keepalive', type=int, default=30,
+                        help='유휴 keep-alive 연결을 유지할 시간(초)')
+    parser.add_argument('--shutdown-timeout', type=float, default=10,
+                        help='종료 시 처리 중인 요청을 기다릴 최대 시간(초)')
+    parser.add_argument('--dev', action='store_true', help='Werkzeug 개발 서버로 실행')
+    parser.add_argument('--no-browser', action='store_true', help='브라우저를 자동으로 열지 않음')
+    parser.add_argument('--stop', action='store_true', help='실행 중인 서버에 종료 요청')
+    parser.add_argument('--profile-startup', action='store_true', help='시작 단계별 소요 시간 출력')
+    return parser
+
+
+def stop_running_server(port):
+    import urllib.error
+    import urllib.request
+
+    try:
+        with open(SHUTDOWN_TOKEN_FILE, encoding='ascii') as f:
+            token = f.read().strip()
+    except OSError:
+        print('실행 중인 서버가 없습니다.')
+        return 1
+    req = urllib.request.Request(f'http://127.0.0.1:{port}/shutdown', data=b'', method='POST',
+                                 headers={SHUTDOWN_HEADER: token})
+    try:
+        with urllib.request.urlopen(req, timeout=5):
+            pass
+    except urllib.error.HTTPError as e:
+        print(f'서버가 종료 요청을 거부했습니다. ({e.code})')
+        return 1
+    except (urllib.error.URLError, OSError):
+        print('실행 중인 서버가 없습니다.')
+        return 1
+    print('서버에 종료를 요청했습니다.')
+    return 0
+
+
+def _drain(dispatcher, timeout):
+    # 대기열과 처리 중인 요청이 비거나 제한 시간이 지날 때까지 대기
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not dispatcher.queue and not dispatcher.active_count:
+            break
+        time.sleep(0.05)
+    dispatcher.shutdown(cancel_pending=True, timeout=max(deadline - time.monotonic(), 0.1))
+
+
+def serve(app, args):
+    if args.dev:
+        from werkzeug.serving import make_server
+
+        server = None
+        # make_server는 생성 시점에 bind/listen까지 끝냄
+        dev_server = make_server(args.host, args.port, app, threaded=True)
+        target = dev_server.serve_forever
+    else:
+        from waitress import create_server
+
+        # 동시 접속 시 잠깐 쌓이는 대기열 경고는 정상 동작이므로 숨김
+        logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+
+        # 알림 연결이 일반 요청 스레드를 잡아먹지 않도록 그 몫의 스레드를 더 둠
+        stream_threads = change_feed.reserve_threads(len(stores.all_stores()))
+
+        # create_server는 생성 시점에 bind/listen까지 끝냄
+        server = create_server(
+            app,
+            host=args.host,
+            port=args.port,
+            threads=args.threads + stream_threads,
+            connection_limit=args.connection_limit,
+            backlog=args.backlog,
+            channel_timeout=args.keepalive,
+            ident='PharmaDay',
+        )
+        target = server.run
+
+    server_ready.set()
+    startup.mark('소켓 수신 대기')
+    threading.Thread(target=target, name='pharmaday-server', daemon=True).start()
+    print(f"PharmaDay 서버 실행 중: http://127.0.0.1:{args.port} "
+          f"({'개발 서버' if args.dev else f'waitress, 스레드 {args.threads}개 + 알림 {stream_threads}개'}, "
+          f"시작 {startup.elapsed():.2f}초)")
+
+    if not args.no_browser:
+        import webbrowser
+
+        webbrowser.open(f"http://127.0.0.1:{args.port}")
+        startup.mark('브라우저 열기')
+
+    # 접속 주소 확인은 브라우저를 연 뒤에 (그 전에 온 요청은 요청 안에서 한 번 계산)
+    netinfo.start()
+    startup.mark('내부망 주소 확인')
+    backup.start()
+    if args.profile_startup:
+        print(startup.report())
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: request_shutdown())
+    while not shutdown_requested.wait(0.5):
+        pass
+
+    print('종료 요청을 받았습니다. 처리 중인 요청을 마무리합니다...')
+    change_feed.close()  # 열려 있는 실시간 알림 연결부터 끝냄
+    if server is not None:
+        # 새 연결은 받지 않고, 이미 받은 요청(종료 요청 응답 포함)은 끝까지 처리
+        server.accepting = False
+        server.pull_trigger()
+        _drain(server.task_dispatcher, args.shutdown_timeout)
+        server.close()
+    else:
+        dev_server.shutdown()
+    netinfo.stop()
+    backup.stop()
+    writequeue.stop()  # 대기열에 남은 저장을 커밋하고 끝냄
+    close_pool()
+    return 0
+
+
+def main(app, argv=None):
+    startup.mark('모듈 import')
+    args = build_parser().parse_args(argv)
+    if args.stop:
+        return stop_running_server(args.port)
+    if is_port_in_use(args.port, args.host):
+        print("이미 실행 중입니다.")
+        return 1
+    startup.mark('포트 확인')
+    init_db()
+    startup.mark('DB 스키마 확인')
+    app.config['SERVER_PORT'] = args.port
+    _write_shutdown_token()
+    try:
+        return serve(app, args)
+    finally:
+        _remove_shutdown_token()
@@ -0,0 +1,36 @@
+"""시작 단계별 소요 시간 기록 (데이터서버.exe --profile-startup)
+
+app.py가 가장 먼저 import하므로 여기서 잰 시각이 모듈 import의 시작점이다.
+(인터프리터 자체나 PyInstaller 압축 해제 시간은 포함되지 않는다.)
+"""
+import time
+import unicodedata
+
+_started = time.perf_counter()
+_last = _started
+_steps = []
+
+
+def mark(name):
+    """직전 기록 이후 걸린 시간을 name 단계로 기록"""
+    global _last
+    now = time.perf_counter()
+    _steps.append((name, now - _last))
+    _last = now
+
+
+def elapsed():
+    return time.perf_counter() - _started
+
+
+def _pad(text, width):
+    # 한글은 콘솔에서 두 칸을 차지하므로 표시 폭 기준으로 맞춤
+    used = sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+    return text + ' ' * max(width - used, 1)
+
+
+def report():
+    lines = ['시작 단계별 소요 시간:']
+    for name, seconds in _steps + [('합계', _last - _started)]:
+        lines.append(f'  {_pad(name, 20)}{seconds * 1000:8.1f} ms')
+    return '\n'.join(lines)
@@ -0,0 +1,76 @@
+"""지점(약국) 목록과 지점 간 병렬 조회
+
+지점마다 정산 DB 파일을 따로 두어 한 지점의 저장이 다른 지점을 막지 않고
+파일 크기도 지점 수와 무관하게 유지된다. 계정과 지점 목록은 본점 DB(중앙)에 있다.
+
+    python manage.py stores add gangnam 강남점
+    python manage.py stores list
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+
+# 지점 간 병렬 조회 스레드 수 (SQLite는 쿼리 실행 중 GIL을 놓으므로 파일별로 동시에 읽힘)
+FAN_OUT_WORKERS = int(os.environ.get('PHARMADAY_STORE_WORKERS', '4'))
+
+_CODE = re.compile(r'^[a-z0-9_-]{1,32}$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def all_stores():
+    """[{id, code, name}] 번호순"""
+    with db.connection() as conn:
+        rows = conn.execute('SELECT id, code, name FROM stores ORDER BY id').fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_store(store_id):
+    with db.connection() as conn:
+        row = conn.execute('SELECT id, code, name FROM stores WHERE id = ?', (store_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def add_store(code, name):
+    """지점을 등록하고 DB 파일을 만든 뒤 번호를 반환 (코드는 영문 소문자·숫자·-·_)"""
+    if not _CODE.match(code):
+        raise ValueError('지점 코드는 영문 소문자, 숫자, -, _ 로 32자 이내여야 합니다.')
+    with db.connection() as conn:
+        if conn.execute('SELECT 1 FROM stores WHERE code = ?', (code,)).fetchone():
+            raise ValueError(f'이미 있는 지점 코드입니다: {code}')
+        cur = conn.execute('INSERT INTO stores (code, name, db_file) VALUES (?, ?, ?)',
+                           (code, name, f'{code}.db'))
+        store_id = cur.lastrowid
+    db.init_db(store_id)
+    return store_id
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix='pharmaday-store')
+        return _executor
+
+
+def fan_out(fn, store_ids=None):
+    """fn(store_id)를 지점별로 병렬 실행해 {store_id: 결과} 반환 (하나라도 실패하면 그 예외를 올림)"""
+    if store_ids is None:
+        store_ids = [store['id'] for store in all_stores()]
+    futures = {store_id: _pool().submit(fn, store_id) for store_id in store_ids}
+    return {store_id: future.result() for store_id, future in futures.items()}
+
+
+def merge_totals(results):
+    """지점별 (키, 매출, 처방건수) 행 목록들을 키(날짜 또는 기간)별로 합쳐 키순으로 반환"""
+    totals = {}
+    for rows in results:
+        for row in rows:
+            bucket = totals.setdefault(row[0], [0, 0])
+            bucket[0] += row[1] or 0
+            bucket[1] += row[2] or 0
+    return [(key, sales, prescriptions) for key, (sales, prescriptions) in sorted(totals.items())]
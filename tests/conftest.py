@@ -0,0 +1,48 @@
+"""테스트는 임시 폴더의 새 DB로 실행 (모듈이 import될 때 경로를 읽으므로 먼저 환경 변수를 지정)"""
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMP_DIR = tempfile.mkdtemp(prefix='pharmaday-test-')
+
+os.environ['PHARMADAY_DB'] = os.path.join(TEMP_DIR, 'pharmaday.db')
+os.environ['PHARMADAY_STORES_DIR'] = os.path.join(TEMP_DIR, 'stores')
+os.environ['PHARMADAY_ARCHIVE_DIR'] = os.path.join(TEMP_DIR, 'archive')
+os.environ['PHARMADAY_SLOW_QUERY_LOG'] = os.path.join(TEMP_DIR, 'slow_queries.log')
+sys.path.insert(0, ROOT)
+
+_store_codes = itertools.count(1)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    import db
+
+    db.close_pool()
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def store_id():
+    """다른 테스트의 데이터와 섞이지 않도록 테스트마다 새 지점(빈 DB 파일)을 만듦"""
+    import stores
+
+    return stores.add_store(f't{next(_store_codes)}', '테스트 지점')
+
+
+@pytest.fixture
+def client(store_id):
+    """store_id 지점으로 로그인된 테스트 클라이언트 (로그인 시도 제한을 거치지 않도록 세션을 직접 설정)"""
+    from app import app
+
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['user_id'] = 1
+        session['username'] = '1'
+        session['is_hq'] = False
+        session['store_id'] = store_id
+    return test_client
@@ -0,0 +1,19 @@
+import auth
+
+
+def test_username_throttle_is_per_ip(monkeypatch):
+    """한 IP에서 아이디 시도를 다 써도 다른 IP의 같은 아이디 로그인은 막히지 않음"""
+    monkeypatch.setattr(auth, 'ip_throttle', auth.TokenBucket(10 ** 6, 0))
+    monkeypatch.setattr(auth, 'username_throttle', auth.TokenBucket(*auth.USERNAME_LIMIT))
+    capacity = auth.USERNAME_LIMIT[0]
+
+    for _ in range(capacity):
+        assert auth.check_throttle('10.0.0.9', 'Pharmacist')[0]
+    allowed, retry_after = auth.check_throttle('10.0.0.9', 'pharmacist')
+    assert not allowed and retry_after > 0
+
+    assert auth.check_throttle('10.0.0.5', 'pharmacist')[0]
+
+    # 성공한 IP의 버킷만 비움
+    auth.login_succeeded('10.0.0.5', 'pharmacist')
+    assert not auth.check_throttle('10.0.0.9', 'pharmacist')[0]
@@ -0,0 +1,35 @@
+"""조회 캐시 - 다른 프로세스의 쓰기(버전 변경) 후에는 다시 계산"""
+import datetime
+
+import bulk
+import db
+from cache import ResultCache, report_cache
+
+
+def test_version_mismatch_is_a_miss():
+    cache = ResultCache()
+    cache.put('key', b'old', version=(1,))
+    assert cache.get('key', (1,)) == b'old'
+    assert cache.get('key', (2,)) is None
+    assert cache.get('key', (1,)) is None  # 버전이 다른 항목은 지워짐
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stale']) == (1, 2, 1)
+
+
+def test_monthly_and_analyze_see_writes_from_outside_the_app(client, store_id):
+    client.put('/report/2025-10-01', json={'total_sales': 100})
+    monthly = '/report/monthly?year=2025&month=10'
+    analyze = '/report/analyze?start=2025-10-01&end=2025-10-31&unit=month'
+    assert client.get(monthly).get_json()['2025-10-01']['total_sales'] == 100
+    assert client.get(analyze).get_json()['summary']['total_sales'] == 100
+    hits = report_cache.stats()['hits']
+    assert client.get(monthly).status_code == 200
+    assert report_cache.stats()['hits'] == hits + 1
+
+    # manage.py import처럼 app의 캐시 무효화를 거치지 않는 쓰기
+    with db.connection(store_id) as conn:
+        bulk.import_records(conn, iter([(1, {'date': '2025-10-01', 'total_sales': 700}),
+                                        (2, {'date': '2025-10-02', 'total_sales': 50})]))
+    assert client.get(monthly).get_json()['2025-10-01']['total_sales'] == 700
+    assert client.get(analyze).get_json()['summary']['total_sales'] == 750
+    assert datetime.date(2025, 10, 2).isoformat() in client.get(monthly).get_json()
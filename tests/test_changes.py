@@ -0,0 +1,56 @@
+"""GET /report/changes 증분 동기화 - 버전 증가와 삭제 기록(툼스톤)"""
+
+
+def _changes(client, since, limit=None):
+    url = f'/report/changes?since={since}' + (f'&limit={limit}' if limit else '')
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_writes_and_deletes_appear_after_since(client):
+    assert client.put('/report/2025-03-03', json={'total_sales': 100, 'prescription_count': 1}).status_code == 200
+    assert client.put('/report/2025-03-04', json={'total_sales': 200, 'prescription_count': 2}).status_code == 200
+
+    first = _changes(client, 0)
+    assert [change['date'] for change in first['changes']] == ['2025-03-03', '2025-03-04']
+    assert first['changes'][1]['total_sales'] == 200 and not first['changes'][1]['deleted']
+    since = first['next_since']
+    assert since == first['version']
+
+    assert client.delete('/report/2025-03-03').status_code == 200
+    assert client.put('/report/2025-03-04', json={'total_sales': 250, 'prescription_count': 2}).status_code == 200
+
+    delta = _changes(client, since)
+    assert [(change['date'], change['deleted']) for change in delta['changes']] == [
+        ('2025-03-03', True), ('2025-03-04', False)]
+    assert 'total_sales' not in delta['changes'][0]
+    assert delta['changes'][1]['total_sales'] == 250
+    assert delta['version'] > since
+
+    # 변경이 없으면 빈 목록, 서버보다 앞선 버전이면 reset
+    assert _changes(client, delta['next_since'])['changes'] == []
+    assert _changes(client, delta['version'] + 10)['reset'] is True
+
+
+def test_recreated_date_replaces_tombstone_and_pages_by_version(client):
+    for day in range(1, 6):
+        client.put(f'/report/2025-04-0{day}', json={'total_sales': day})
+    client.delete('/report/2025-04-02')
+    client.put('/report/2025-04-02', json={'total_sales': 22})
+
+    # 날짜마다 최신 기록 하나만 남고, limit 단위 페이지를 이어 받으면 전체와 같음
+    full = _changes(client, 0)['changes']
+    assert sorted(change['date'] for change in full) == [f'2025-04-0{day}' for day in range(1, 6)]
+    assert not any(change['deleted'] for change in full)
+
+    pages, since = [], 0
+    while True:
+        page = _changes(client, since, limit=2)
+        pages += page['changes']
+        since = page['next_since']
+        if not page['has_more']:
+            break
+    assert pages == full
+    versions = [change['version'] for change in full]
+    assert versions == sorted(versions) and len(set(versions)) == len(versions)
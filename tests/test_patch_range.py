@@ -0,0 +1,69 @@
+"""PATCH /report/range - 항목 조합별 묶음 쓰기, 전부 반영 또는 전부 거부"""
+import archive
+import db
+import stores
+
+
+def _saved(store_id):
+    with db.connection(store_id) as conn:
+        rows = conn.execute('SELECT date, total_sales, prescription_count, notes, is_manual_holiday '
+                            'FROM daily_reports ORDER BY date').fetchall()
+    return {str(row['date']): (row['total_sales'], row['prescription_count'], row['notes'],
+                               bool(row['is_manual_holiday'])) for row in rows}
+
+
+def test_mixed_field_groups_update_only_given_fields(client, store_id):
+    client.put('/report/2025-07-01', json={'total_sales': 100, 'prescription_count': 10, 'notes': '기존'})
+    client.put('/report/2025-07-03', json={'total_sales': 300, 'prescription_count': 30, 'notes': '유지'})
+
+    response = client.patch('/report/range', json={'changes': [
+        {'date': '2025-07-01', 'total_sales': 111},                               # 매출만
+        {'date': '2025-07-02', 'total_sales': 222, 'prescription_count': 22},     # 새 날짜
+        {'date': '2025-07-03', 'prescription_count': 33},                         # 처방만
+        {'date': '2025-07-04', 'notes': '재고 조사', 'is_manual_holiday': True},  # 다른 조합
+        {'date': '2025-07-01', 'notes': '같은 날짜 두 번'},                        # 앞 항목과 합쳐짐
+    ]})
+    assert response.status_code == 200, response.get_json()
+    assert {item['date']: item['status'] for item in response.get_json()['results']} == {
+        '2025-07-01': 'updated', '2025-07-02': 'created', '2025-07-03': 'updated', '2025-07-04': 'created'}
+    assert _saved(store_id) == {
+        '2025-07-01': (111, 10, '같은 날짜 두 번', False),
+        '2025-07-02': (222, 22, '', False),
+        '2025-07-03': (300, 33, '유지', False),
+        '2025-07-04': (0, 0, '재고 조사', True),
+    }
+
+
+def test_set_applies_to_every_day_and_keeps_other_fields(client, store_id):
+    client.put('/report/2025-08-05', json={'total_sales': 500, 'notes': '메모'})
+    response = client.patch('/report/range', json={'start': '2025-08-04', 'end': '2025-08-06',
+                                                    'set': {'is_manual_holiday': True}})
+    assert response.status_code == 200
+    assert _saved(store_id) == {
+        '2025-08-04': (0, 0, '', True),
+        '2025-08-05': (500, 0, '메모', True),
+        '2025-08-06': (0, 0, '', True),
+    }
+
+
+def test_invalid_item_rejects_whole_request(client, store_id):
+    client.put('/report/2025-09-01', json={'total_sales': 1})
+    response = client.patch('/report/range', json={'changes': [
+        {'date': '2025-09-01', 'total_sales': 999},
+        {'date': '2025-09-02', 'total_sales': 'abc'},
+        {'date': '2025-13-01', 'total_sales': 1},
+    ]})
+    assert response.status_code == 400
+    assert [error['index'] for error in response.get_json()['errors']] == [1, 2]
+    assert _saved(store_id) == {'2025-09-01': (1, 0, '', False)}
+
+
+def test_archived_date_rolls_back_whole_range(client, store_id):
+    client.put('/report/2023-12-30', json={'total_sales': 1})
+    with db.connection(store_id) as conn:
+        assert archive.archive_year(conn, stores.get_store(store_id), 2023)
+
+    response = client.patch('/report/range', json={'start': '2023-12-31', 'end': '2024-01-02',
+                                                    'set': {'total_sales': 7}})
+    assert response.status_code == 409
+    assert _saved(store_id) == {'2023-12-30': (1, 0, '', False)}
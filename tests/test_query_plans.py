@@ -0,0 +1,113 @@
+"""엔드포인트 쿼리가 전체 스캔 없이 인덱스를 타는지 (보관 파일 연결 전/후)"""
+import datetime
+
+import pytest
+
+import archive
+import bulk
+import db
+import queryplans
+import stores
+
+FIRST_DAY = datetime.date(2021, 1, 1)
+LAST_DAY = datetime.date(2025, 12, 31)
+ARCHIVED_YEARS = (2021, 2022, 2023)
+
+# 지점 DB의 행만 읽는 쿼리 (보관 연도는 변경 기록도 없고 전문 검색 대상도 아님)
+MAIN_ONLY = ('/report/changes?since=', '/report/search?q=')
+
+CHECKS = queryplans.plan_checks()
+
+
+def _records():
+    day = FIRST_DAY
+    line_no = 0
+    while day <= LAST_DAY:
+        line_no += 1
+        sunday = day.weekday() == 6
+        yield line_no, {
+            'date': day.isoformat(),
+            'total_sales': 0 if sunday else 2_000_000 + day.day * 1000,
+            'prescription_count': 0 if sunday else 100 + day.day,
+            'notes': '도매상 입고' if day.day == 1 else '',
+            'is_holiday': sunday,
+            'is_manual_holiday': False,
+        }
+        day += datetime.timedelta(days=1)
+
+
+def _seeded(store_id):
+    with db.connection(store_id) as conn:
+        bulk.import_records(conn, _records())
+    return store_id
+
+
+@pytest.fixture(scope='module')
+def hot_conn():
+    with db.connection(_seeded(db.DEFAULT_STORE_ID)) as conn:
+        yield conn
+
+
+@pytest.fixture(scope='module')
+def archived_conn():
+    store_id = _seeded(stores.add_store('archived', '보관 점검'))
+    store = stores.get_store(store_id)
+    with db.connection(store_id) as conn:
+        for year in ARCHIVED_YEARS:
+            assert archive.archive_year(conn, store, year)
+    # 새로 빌린 커넥션이 보관 파일을 ATTACH하고 VIEW를 만든 상태로 점검
+    with db.connection(store_id) as conn:
+        yield conn
+
+
+@pytest.fixture(params=['hot_conn', 'archived_conn'])
+def conn(request):
+    return request.getfixturevalue(request.param)
+
+
+def _plan(conn, sql, params):
+    cur = conn.cursor()
+    try:
+        return queryplans.explain(cur, sql, params)
+    finally:
+        cur.close()
+
+
+@pytest.mark.parametrize('name, sql, params', CHECKS, ids=[check[0] for check in CHECKS])
+def test_plan_uses_indexes(conn, name, sql, params):
+    details = _plan(conn, sql, params)
+    assert queryplans.plan_problems(details) == [], '\n'.join(details)
+    assert any(detail.startswith('SEARCH ') for detail in details), '\n'.join(details)
+
+
+@pytest.mark.parametrize('name, sql, params', CHECKS, ids=[check[0] for check in CHECKS])
+def test_archive_branches_use_date_index(archived_conn, name, sql, params):
+    details = _plan(archived_conn, sql, params)
+    branches = [detail for detail in details if 'archive_' in detail]
+    if name in MAIN_ONLY:
+        assert branches == [], '\n'.join(details)
+    elif any('daily_reports' in detail for detail in details):
+        # 보관 연도마다 그 파일의 날짜 인덱스로 내려가야 함
+        for year in ARCHIVED_YEARS:
+            alias = f'archive_{year}.daily_reports'
+            assert any(detail.startswith(f'SEARCH {alias} USING INDEX') for detail in branches), '\n'.join(details)
+
+
+def test_plan_problems_flags_view_materialization():
+    details = [
+        'MATERIALIZE daily_reports',
+        'COMPOUND QUERY',
+        'SCAN main.daily_reports',
+        'SEARCH r USING AUTOMATIC COVERING INDEX (date=?) LEFT-JOIN',
+    ]
+    assert queryplans.plan_problems(details) == details[:1] + details[2:]
+
+
+def test_plan_problems_accepts_coroutine_scan():
+    details = [
+        'CO-ROUTINE daily_reports',
+        'SEARCH main.daily_reports USING INDEX idx_daily_reports_date_weekday (date>? AND date<?)',
+        'SCAN daily_reports',
+        'SCAN report_notes_fts VIRTUAL TABLE INDEX 0:M1',
+    ]
+    assert queryplans.plan_problems(details) == []
@@ -0,0 +1,43 @@
+"""스트리밍 응답 압축 - 조각마다 바로 내보내는지"""
+import zlib
+
+import pytest
+
+import responses
+
+
+def _chunks(produced):
+    for index in range(3):
+        produced.append(index)
+        yield f'{{"row":{index}}}\n' * 50
+
+
+def test_gzip_stream_sends_each_chunk_before_the_next_is_produced():
+    produced = []
+    stream = responses._compress_stream(_chunks(produced), 'gzip')
+    decoder = zlib.decompressobj(31)
+
+    first = next(stream)
+    assert produced == [0]  # 다음 조각을 만들기 전에 첫 조각이 나옴
+    assert decoder.decompress(first).decode() == '{"row":0}\n' * 50
+
+    body = first + b''.join(stream)
+    assert zlib.decompress(body, 31).decode() == ''.join('{"row":%d}\n' % i * 50 for i in range(3))
+
+
+def test_brotli_stream_sends_each_chunk_before_the_next_is_produced():
+    brotli = pytest.importorskip('brotli')
+    produced = []
+    stream = responses._compress_stream(_chunks(produced), 'br')
+    first = next(stream)
+    assert produced == [0]
+    body = first + b''.join(stream)
+    assert brotli.decompress(body).decode() == ''.join('{"row":%d}\n' % i * 50 for i in range(3))
+
+
+def test_streamed_report_list_is_compressed(client):
+    for day in range(1, 10):
+        client.put(f'/report/2025-11-0{day}', json={'total_sales': day, 'notes': '메모' * 50})
+    response = client.get('/report', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(zlib.decompress(response.get_data(), 31).decode()) > 0
@@ -0,0 +1,66 @@
+"""월/주 요약 테이블이 트리거로 원본과 같은 합계를 유지하는지"""
+import datetime
+
+import db
+import queries
+import rollups
+
+
+def _expected(conn, unit):
+    """원본 행에서 직접 계산한 {(period, day_class): (일수, 매출, 처방)}"""
+    rows = conn.execute(f'''
+        SELECT {rollups.period_sql(unit, 'daily_reports')}, {rollups.day_class_sql('daily_reports')},
+               COUNT(*), SUM(COALESCE(total_sales, 0)), SUM(COALESCE(prescription_count, 0))
+        FROM daily_reports GROUP BY 1, 2
+    ''').fetchall()
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+def _stored(conn, unit):
+    rows = conn.execute(f'SELECT period, day_class, day_count, total_sales, total_prescriptions '
+                        f'FROM {rollups.TABLES[unit]}').fetchall()
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+def _assert_in_sync(conn):
+    for unit in rollups.TABLES:
+        assert _stored(conn, unit) == _expected(conn, unit), unit
+
+
+def test_rollups_follow_inserts_updates_and_deletes(store_id):
+    # 월말·주말·설날 연휴·일요일이 섞인 구간
+    first = datetime.date(2024, 1, 26)
+    with db.connection(store_id) as conn:
+        for offset in range(20):
+            day = first + datetime.timedelta(days=offset)
+            conn.execute(queries.UPSERT_REPORT, (day, 1_000_000 + offset * 1000, 100 + offset, '', False, False))
+        _assert_in_sync(conn)
+
+        # 값 수정, 임시 휴무 지정, 월을 넘기는 날짜 변경, 삭제
+        conn.execute(queries.UPSERT_REPORT, (datetime.date(2024, 1, 31), 5, 1, '수정', False, False))
+        conn.execute(queries.UPSERT_REPORT, (datetime.date(2024, 2, 1), 0, 0, '', False, True))
+        conn.execute('UPDATE main.daily_reports SET date = ? WHERE date = ?',
+                     (datetime.date(2024, 3, 4), datetime.date(2024, 1, 29)))
+        conn.execute(queries.DELETE_REPORT, (datetime.date(2024, 2, 5),))
+        conn.execute(queries.DELETE_REPORT, (datetime.date(2024, 2, 14),))
+        _assert_in_sync(conn)
+
+        # 지운 날짜만 있던 버킷 행은 남지 않음
+        conn.execute('DELETE FROM main.daily_reports WHERE date >= ?', (datetime.date(2024, 3, 1),))
+        assert not [key for key in _stored(conn, 'month') if key[0] == '2024-03']
+        _assert_in_sync(conn)
+
+
+def test_bucket_totals_matches_raw_sum_for_partial_ranges(store_id):
+    first = datetime.date(2024, 4, 1)
+    with db.connection(store_id) as conn:
+        for offset in range(90):
+            day = first + datetime.timedelta(days=offset)
+            conn.execute(queries.UPSERT_REPORT, (day, 10_000 + offset, offset, '', False, False))
+        start, end = datetime.date(2024, 4, 17), datetime.date(2024, 6, 11)
+        for unit in rollups.TABLES:
+            cur = conn.cursor()
+            totals = rollups.bucket_totals(cur, unit, start, end, ('weekday', 'saturday'))
+            cur.execute(rollups.raw_bucket_sql(unit, 2), (start, end, 'weekday', 'saturday'))
+            assert totals == sorted(tuple(row) for row in cur.fetchall()), unit
+            cur.close()
@@ -0,0 +1,77 @@
+"""묶음 커밋 쓰기 대기열 - 같은 날짜는 마지막 저장만, 거부된 날짜만 되돌림"""
+import datetime
+import sqlite3
+
+import pytest
+
+import archive
+import db
+import queries
+import stores
+import writequeue
+
+
+def _params(day, sales):
+    return (day, sales, 1, '', False, False)
+
+
+@pytest.fixture
+def writer(store_id):
+    writer = writequeue._Writer(store_id)
+    yield writer
+    writer.stop()
+    writer.thread.join()
+
+
+def test_same_date_in_one_batch_keeps_last_write(writer, store_id, monkeypatch):
+    # 첫 요청 뒤 모으는 시간을 늘려 세 요청이 한 묶음에 들어가게 함
+    monkeypatch.setattr(writequeue, 'WRITE_BATCH_MS', 300)
+    day, other = datetime.date(2025, 5, 1), datetime.date(2025, 5, 2)
+    first = writer.submit(day, queries.UPSERT_REPORT, _params(day, 100))
+    second = writer.submit(day, queries.UPSERT_REPORT, _params(day, 200))
+    third = writer.submit(other, queries.UPSERT_REPORT, _params(other, 300))
+
+    # 앞선 요청도 같은 커밋 뒤에 마지막 값으로 응답
+    assert first.result(timeout=5)['total_sales'] == 200
+    assert second.result(timeout=5)['total_sales'] == 200
+    assert third.result(timeout=5)['total_sales'] == 300
+    with db.connection(store_id) as conn:
+        rows = conn.execute('SELECT date, total_sales FROM daily_reports ORDER BY date').fetchall()
+        version, _ = db.get_reports_version(conn.cursor())
+    assert [(row['date'], row['total_sales']) for row in rows] == [(day, 200), (other, 300)]
+    assert version == 2  # 덮어쓴 저장은 DB에 한 번만 기록
+
+
+def test_archived_date_fails_only_that_item(writer, store_id):
+    archived_day, day = datetime.date(2022, 6, 1), datetime.date(2025, 6, 1)
+    with db.connection(store_id) as conn:
+        conn.execute(queries.UPSERT_REPORT, _params(archived_day, 1))
+        conn.commit()
+        assert archive.archive_year(conn, stores.get_store(store_id), 2022)
+
+    rows = writer._commit([
+        (datetime.date(2025, 5, 31), writequeue._Pending(queries.UPSERT_REPORT, _params(datetime.date(2025, 5, 31), 10))),
+        (archived_day, writequeue._Pending(queries.UPSERT_REPORT, _params(archived_day, 20))),
+        (day, writequeue._Pending(queries.UPSERT_REPORT, _params(day, 30))),
+    ])
+    assert rows[0]['total_sales'] == 10
+    assert isinstance(rows[1], sqlite3.IntegrityError) and archive.ARCHIVED_MESSAGE in str(rows[1])
+    assert rows[2]['total_sales'] == 30
+
+    with db.connection(store_id) as conn:
+        saved = {row['date']: row['total_sales'] for row in conn.execute('SELECT date, total_sales FROM daily_reports')}
+    assert saved == {archived_day: 1, datetime.date(2025, 5, 31): 10, day: 30}
+
+
+def test_rejected_item_raises_from_its_future(writer, store_id):
+    archived_day = datetime.date(2021, 3, 2)
+    with db.connection(store_id) as conn:
+        conn.execute(queries.UPSERT_REPORT, _params(archived_day, 1))
+        conn.commit()
+        assert archive.archive_year(conn, stores.get_store(store_id), 2021)
+
+    rejected = writer.submit(archived_day, queries.UPSERT_REPORT, _params(archived_day, 9))
+    accepted = writer.submit(datetime.date(2025, 1, 2), queries.UPSERT_REPORT, _params(datetime.date(2025, 1, 2), 5))
+    with pytest.raises(sqlite3.IntegrityError):
+        rejected.result(timeout=5)
+    assert accepted.result(timeout=5)['total_sales'] == 5
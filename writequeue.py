@@ -0,0 +1,173 @@
+"""정산 저장 묶음 커밋 (선택 기능)
+
+PHARMADAY_WRITE_BATCH_MS=밀리초 로 실행하면 PUT/DELETE /report/<date>가 직접 커밋하지
+않고 지점별 쓰기 스레드의 대기열에 넣는다. 쓰기 스레드는 첫 요청이 들어온 뒤 그 시간만큼
+더 모았다가 한 트랜잭션으로 커밋하고, 같은 날짜에 여러 번 들어온 저장은 마지막 것만 쓴다.
+
+ - 응답은 그 묶음이 디스크에 기록(fsync)된 뒤에 나간다 (쓰기 커넥션은 synchronous=FULL).
+ - 카운터 여러 대가 동시에 저장해도 SQLite 쓰기 잠금을 두고 다투지 않고 fsync도 묶음당 한 번이다.
+ - 대신 저장 한 건의 응답은 최대 그 시간만큼 늦어진다. 0(기본)이면 예전처럼 요청마다 커밋한다.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import db
+import queries
+
+WRITE_BATCH_MS = float(os.environ.get('PHARMADAY_WRITE_BATCH_MS', '0'))
+ENABLED = WRITE_BATCH_MS > 0
+MAX_BATCH = 500           # 한 트랜잭션에 넣는 최대 날짜 수
+ACK_TIMEOUT = 30          # 응답을 기다리는 최대 시간(초)
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    """날짜 하나에 대기 중인 마지막 쓰기와 그 결과를 기다리는 요청들"""
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.waiters = []
+
+
+class _Writer:
+    """지점 DB 하나의 쓰기 스레드"""
+
+    def __init__(self, store_id):
+        self.store_id = store_id
+        self.cond = threading.Condition()
+        self.pending = {}   # 날짜 -> _Pending (처음 들어온 순서 유지)
+        self.stopping = False
+        self.conn = None
+        self.thread = threading.Thread(target=self._loop, name=f'pharmaday-writer-{store_id}', daemon=True)
+        self.thread.start()
+
+    def submit(self, date, sql, params):
+        future = Future()
+        with self.cond:
+            if self.stopping:
+                raise RuntimeError('서버가 종료 중이라 저장할 수 없습니다.')
+            item = self.pending.get(date)
+            if item is None:
+                item = self.pending[date] = _Pending(sql, params)
+                self.cond.notify()
+            else:
+                # 아직 커밋 전이면 덮어씀 - 앞선 요청도 같은 커밋이 끝날 때 함께 응답
+                item.sql, item.params = sql, params
+            item.waiters.append(future)
+        return future
+
+    def _take(self):
+        with self.cond:
+            while not self.pending and not self.stopping:
+                self.cond.wait()
+            if not self.pending:
+                return None
+        # 첫 요청 이후 잠시 더 모음 (종료 중이면 바로 비움)
+        if not self.stopping:
+            time.sleep(WRITE_BATCH_MS / 1000)
+        with self.cond:
+            dates = list(self.pending)[:MAX_BATCH]
+            return [(date, self.pending.pop(date)) for date in dates]
+
+    def _loop(self):
+        while True:
+            batch = self._take()
+            if batch is None:
+                break
+            try:
+                rows = self._commit(batch)
+            except BaseException as e:
+                logger.exception('묶음 저장 실패 (%d건)', len(batch))
+                for _, item in batch:
+                    for future in item.waiters:
+                        future.set_exception(e)
+                continue
+            for (_, item), row in zip(batch, rows):
+                for future in item.waiters:
+                    if isinstance(row, Exception):
+                        future.set_exception(row)
+                    else:
+                        future.set_result(row)
+        if self.conn is not None:
+            self.conn.close()
+
+    def _commit(self, batch):
+        """묶음을 한 트랜잭션으로 쓰고 날짜별 REPORT_BY_DATE 행(삭제면 None) 목록을 반환
+
+        제약 위반(보관된 연도 등)은 그 날짜만 SAVEPOINT로 되돌리고 예외를 결과 자리에 넣는다.
+        """
+        if self.conn is None:
+            db.init_db(self.store_id)
+            self.conn = db.get_connection(self.store_id)
+            self.conn.execute('PRAGMA synchronous=FULL')  # 커밋마다 WAL을 fsync해야 응답 후 정전에도 남음
+        conn = self.conn
+        rows = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for date, item in batch:
+                conn.execute('SAVEPOINT report_write')
+                try:
+                    conn.execute(item.sql, item.params)
+                except sqlite3.IntegrityError as e:
+                    conn.execute('ROLLBACK TO report_write')
+                    rows.append(e)
+                else:
+                    rows.append(conn.execute(queries.REPORT_BY_DATE, (date,)).fetchone())
+                conn.execute('RELEASE report_write')
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        return rows
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def _writer(store_id):
+    with _writers_lock:
+        writer = _writers.get(store_id)
+        if writer is None:
+            writer = _writers[store_id] = _Writer(store_id)
+        return writer
+
+
+def _wait(future):
+    return future.result(timeout=ACK_TIMEOUT)
+
+
+def upsert(store_id, date, params):
+    """UPSERT_REPORT를 대기열로 저장하고 커밋 후 그 날짜의 REPORT_BY_DATE 행을 반환
+
+    params는 queries.UPSERT_REPORT 인자 순서 그대로. 같은 날짜가 뒤이어 삭제되면 None.
+    """
+    return _wait(_writer(store_id).submit(date, queries.UPSERT_REPORT, params))
+
+
+def delete(store_id, date):
+    """날짜 하나를 대기열로 삭제하고 커밋될 때까지 기다림"""
+    _wait(_writer(store_id).submit(date, queries.DELETE_REPORT, (date,)))
+
+
+def stop():
+    """대기 중인 저장을 모두 커밋한 뒤 쓰기 스레드를 끝냄"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
+    for writer in writers:
+        writer.thread.join()